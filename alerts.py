@@ -0,0 +1,311 @@
+# alerts.py - Rule-based alerts on spike events with queued, non-blocking delivery
+
+import os
+import json
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from typing import Dict, Iterable, List
+import numpy as np
+import pandas as pd
+import requests
+import config
+from spike_store import SpikeStore
+from logs import get_logger
+from metrics import ALERTS_RAISED
+
+logger = get_logger(__name__)
+
+
+class AlertRule:
+    """
+    Match spike events by type, metric, direction and magnitude
+
+    A rule fires at most once per (type, direction) within its cooldown
+    window, measured in event time so a burst of consecutive spikes
+    produces a single alert.
+    """
+
+    def __init__(self, name: str, types: List[str] = None, metrics: List[str] = None,
+                 directions: List[str] = None, min_change_pct: float = 0.0,
+                 cooldown_minutes: float = None, severity: str = 'warning'):
+        self.name = name
+        self.types = set(types) if types else None
+        self.metrics = set(metrics) if metrics else None
+        self.directions = set(directions) if directions else None
+        self.min_change_pct = min_change_pct
+        cooldown = config.ALERT_COOLDOWN_MINUTES if cooldown_minutes is None else cooldown_minutes
+        self.cooldown = pd.Timedelta(minutes=cooldown)
+        self.severity = severity
+
+    @classmethod
+    def from_dict(cls, spec: Dict) -> 'AlertRule':
+        return cls(**spec)
+
+    def matches(self, event: Dict) -> bool:
+        return ((self.types is None or event['type'] in self.types) and
+                (self.metrics is None or event['metric'] in self.metrics) and
+                (self.directions is None or event['direction'] in self.directions) and
+                abs(event['change_pct']) >= self.min_change_pct)
+
+
+class Sink:
+    """
+    Delivery target running on its own thread behind a bounded queue
+
+    send() never blocks: when the queue is full the alert is dropped and
+    counted, so a slow webhook or mail server cannot stall the pipeline.
+    """
+
+    name = 'sink'
+
+    def __init__(self, queue_size: int = None):
+        self.queue = queue.Queue(maxsize=queue_size or config.ALERT_QUEUE_SIZE)
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.latencies = []
+        self._thread = threading.Thread(target=self._run, name=f'alert-{self.name}', daemon=True)
+        self._thread.start()
+
+    def send(self, alert: Dict) -> bool:
+        try:
+            self.queue.put_nowait(alert)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            alert = self.queue.get()
+            if alert is None:
+                break
+            try:
+                self.deliver(alert)
+                self.delivered += 1
+                self.latencies.append(time.perf_counter() - alert['_queued_at'])
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"⚠️  Alert delivery via {self.name} failed: {e}")
+
+    def deliver(self, alert: Dict) -> None:
+        raise NotImplementedError
+
+    def close(self, timeout: float = None) -> None:
+        """Deliver what is queued, then stop the worker"""
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def metrics(self) -> Dict:
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'latency_ms_p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'latency_ms_p95': float(np.percentile(latencies, 95)) if len(latencies) else None,
+            'latency_ms_max': float(latencies.max()) if len(latencies) else None
+        }
+
+
+def _public(alert: Dict) -> Dict:
+    return {key: value for key, value in alert.items() if not key.startswith('_')}
+
+
+class StdoutSink(Sink):
+    name = 'stdout'
+
+    def deliver(self, alert: Dict) -> None:
+        print(f"🚨 {alert['message']}")
+
+
+class FileSink(Sink):
+    """Append alerts to a JSON-lines file"""
+
+    name = 'file'
+
+    def __init__(self, path: str = None, queue_size: int = None):
+        self.path = path or config.ALERT_LOG_FILE
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        super().__init__(queue_size)
+
+    def deliver(self, alert: Dict) -> None:
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(_public(alert), default=str) + '\n')
+
+
+class WebhookSink(Sink):
+    """POST each alert as JSON"""
+
+    name = 'webhook'
+
+    def __init__(self, url: str = None, timeout: float = None, queue_size: int = None):
+        self.url = url or config.ALERT_WEBHOOK_URL
+        self.timeout = timeout or config.ALERT_WEBHOOK_TIMEOUT
+        self.session = requests.Session()
+        super().__init__(queue_size)
+
+    def deliver(self, alert: Dict) -> None:
+        response = self.session.post(self.url, data=json.dumps(_public(alert), default=str),
+                                     headers={'Content-Type': 'application/json'}, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class SMTPSink(Sink):
+    """Mail each alert through an SMTP relay (a local debugging server by default)"""
+
+    name = 'smtp'
+
+    def __init__(self, host: str = None, port: int = None, sender: str = None,
+                 recipients: List[str] = None, queue_size: int = None):
+        self.host = host or config.ALERT_SMTP_HOST
+        self.port = port or config.ALERT_SMTP_PORT
+        self.sender = sender or config.ALERT_EMAIL_FROM
+        self.recipients = recipients or config.ALERT_EMAIL_TO
+        super().__init__(queue_size)
+
+    def deliver(self, alert: Dict) -> None:
+        message = EmailMessage()
+        message['Subject'] = alert['message']
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content(json.dumps(_public(alert), indent=2, default=str))
+        with smtplib.SMTP(self.host, self.port, timeout=config.ALERT_WEBHOOK_TIMEOUT) as smtp:
+            smtp.send_message(message)
+
+
+SINKS = {
+    'stdout': StdoutSink,
+    'file': FileSink,
+    'webhook': WebhookSink,
+    'smtp': SMTPSink
+}
+
+
+class AlertEngine:
+    """
+    Evaluate rules against spike events and fan alerts out to sinks
+
+    Events already alerted on are remembered in a state file, so re-running
+    the analysis over an overlapping window only alerts on new spikes.
+    """
+
+    def __init__(self, rules: Iterable[AlertRule] = None, sinks: Iterable[Sink] = None,
+                 token_id: str = None, state_file: str = None):
+        self.rules = list(rules) if rules is not None else [AlertRule.from_dict(spec) for spec in config.ALERT_RULES]
+        self.sinks = list(sinks) if sinks is not None else [SINKS[name]() for name in config.ALERT_SINKS]
+        self.token_id = token_id or config.TOKEN_ID
+        self.state_file = state_file if state_file is not None else config.ALERT_STATE_FILE
+        self.seen = {}
+        self.last_fired = {}
+        self.evaluated = 0
+        self.suppressed = 0
+        self.eval_seconds = 0.0
+        self._load_state()
+
+    def _load_state(self):
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                state = json.load(f)
+            self.seen = state.get('seen', {})
+            self.last_fired = {key: pd.Timestamp(value) for key, value in state.get('last_fired', {}).items()}
+
+    def save_state(self) -> None:
+        """Persist seen events and cooldowns, forgetting events past the retention window"""
+        if not self.state_file:
+            return
+        cutoff = pd.Timestamp.now() - pd.Timedelta(days=config.ALERT_STATE_RETENTION_DAYS)
+        self.seen = {key: ts for key, ts in self.seen.items() if pd.Timestamp(ts) >= cutoff}
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        with open(self.state_file, 'w') as f:
+            json.dump({'seen': self.seen,
+                       'last_fired': {key: str(ts) for key, ts in self.last_fired.items()}}, f, indent=2)
+
+    @staticmethod
+    def event_key(event: Dict) -> str:
+        return f"{pd.Timestamp(event['timestamp']).isoformat()}|{event['type']}|{event['direction']}"
+
+    def _message(self, rule: AlertRule, event: Dict) -> str:
+        return (f"[{rule.severity.upper()}] {self.token_id.upper()} {event['type'].replace('_', ' ')} spike "
+                f"{event['direction']} {event['change_pct']:+.1f}% at "
+                f"{pd.Timestamp(event['timestamp']).strftime('%Y-%m-%d %H:%M')} ({rule.name})")
+
+    def process(self, spikes_df: SpikeStore) -> List[Dict]:
+        """
+        Evaluate rules against spike events and enqueue the resulting alerts
+
+        Args:
+            spikes_df: Spike events from DataProcessor.identify_spikes
+
+        Returns:
+            List of alerts that were raised
+        """
+        alerts = []
+        spikes = SpikeStore.of(spikes_df)
+        if spikes.empty:
+            return alerts
+
+        started = time.perf_counter()
+        for event in spikes.records():
+            key = self.event_key(event)
+            if key in self.seen:
+                continue
+            self.seen[key] = pd.Timestamp(event['timestamp']).isoformat()
+            self.evaluated += 1
+
+            event_time = pd.Timestamp(event['timestamp'])
+            for rule in self.rules:
+                if not rule.matches(event):
+                    continue
+                cooldown_key = f"{rule.name}|{event['type']}|{event['direction']}"
+                last = self.last_fired.get(cooldown_key)
+                if last is not None and event_time - last < rule.cooldown:
+                    self.suppressed += 1
+                    continue
+                self.last_fired[cooldown_key] = event_time
+
+                alert = {
+                    'rule': rule.name,
+                    'severity': rule.severity,
+                    'token': self.token_id,
+                    'message': self._message(rule, event),
+                    'event': event,
+                    'raised_at': pd.Timestamp.now().isoformat(),
+                    '_queued_at': time.perf_counter()
+                }
+                for sink in self.sinks:
+                    sink.send(alert)
+                ALERTS_RAISED.inc(rule=rule.name, severity=rule.severity)
+                alerts.append(alert)
+        self.eval_seconds += time.perf_counter() - started
+        return alerts
+
+    def close(self, timeout: float = None) -> Dict:
+        """
+        Drain the sinks, save state and report delivery metrics
+
+        Args:
+            timeout: Seconds to wait for each sink to drain
+
+        Returns:
+            Dict with evaluation counts and per-sink delivery and latency metrics
+        """
+        timeout = config.ALERT_DRAIN_TIMEOUT if timeout is None else timeout
+        for sink in self.sinks:
+            sink.close(timeout)
+        self.save_state()
+        return self.metrics()
+
+    def metrics(self) -> Dict:
+        return {
+            'evaluated': self.evaluated,
+            'suppressed': self.suppressed,
+            'eval_ms': self.eval_seconds * 1000,
+            'sinks': {sink.name: sink.metrics() for sink in self.sinks}
+        }
@@ -0,0 +1,237 @@
+# backfill.py - Resumable bulk download of long market histories into the rollup store
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+import requests
+import config
+from data_fetcher import DataFetcher
+from rollup import RollupPyramid
+from logs import get_logger
+from metrics import API_RETRIES
+
+logger = get_logger(__name__)
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+
+class RateLimiter:
+    """
+    Spread requests evenly under a per-minute budget
+
+    Each call reserves the next free slot under a lock and then sleeps
+    outside it, so threads queue up without holding each other back.
+    """
+
+    def __init__(self, per_minute: float = None):
+        self.interval = 60.0 / (per_minute or config.BACKFILL_RATE_LIMIT)
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self.lock:
+            slot = max(time.monotonic(), self.next_slot)
+            self.next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def plan_chunks(start: pd.Timestamp, end: pd.Timestamp, chunk_days: int) -> List[Tuple[int, int]]:
+    """
+    Split [start, end] into chunks aligned to a fixed grid
+
+    Chunks sit on multiples of the chunk length since the epoch, so the
+    same chunk has the same bounds whatever range asked for it, and a
+    checkpoint stays valid when a later backfill widens the range.
+
+    Args:
+        start: Range start
+        end: Range end
+        chunk_days: Chunk length in days
+
+    Returns:
+        List of (start_ms, end_ms) pairs, end exclusive
+    """
+    chunk_ms = chunk_days * MS_PER_DAY
+    start_ms = int(pd.Timestamp(start).value // 1_000_000)
+    end_ms = int(pd.Timestamp(end).value // 1_000_000)
+    first = start_ms // chunk_ms * chunk_ms
+    return [(chunk_start, chunk_start + chunk_ms) for chunk_start in range(first, end_ms + 1, chunk_ms)]
+
+
+class Checkpoint:
+    """Chunks already stitched into the store, kept in a small JSON file"""
+
+    def __init__(self, path: str, resolution: str, chunk_days: int):
+        self.path = path
+        self.resolution = resolution
+        self.chunk_days = chunk_days
+        self.completed = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            # A different chunk grid makes the recorded chunks meaningless
+            if state.get('resolution') == resolution and state.get('chunk_days') == chunk_days:
+                self.completed = set(state.get('completed', []))
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'resolution': self.resolution, 'chunk_days': self.chunk_days,
+                       'completed': sorted(self.completed)}, f)
+        os.replace(tmp_path, self.path)
+
+
+class Backfill:
+    """
+    Download a long history in chunks and stitch it into a rollup pyramid
+
+    Chunks are fetched on a thread pool behind a shared rate limiter, with
+    at most twice the worker count in flight. Each finished chunk is
+    appended to the pyramid straight away, which drops samples it already
+    holds. The store is flushed and the checkpoint advanced every
+    config.BACKFILL_SAVE_EVERY chunks; a flush writes only the partitions
+    the chunks touched and then drops them from memory, so memory is the
+    partitions open since the last flush plus a few chunk payloads. An
+    interrupted backfill resumes from the last flush.
+    """
+
+    def __init__(self, token_id: str = None, resolution: str = None, data_dir: str = None,
+                 workers: int = None, rate_limit: float = None):
+        self.token_id = token_id or config.TOKEN_ID
+        self.resolution = resolution or config.BACKFILL_RESOLUTION
+        self.chunk_days = config.BACKFILL_CHUNK_DAYS[self.resolution]
+        self.data_dir = data_dir or config.DATA_DIR
+        self.workers = workers or config.BACKFILL_WORKERS
+        self.limiter = RateLimiter(rate_limit)
+        self.fetcher = DataFetcher(self.token_id)
+        self._local = threading.local()
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.checkpoint = Checkpoint(os.path.join(self.data_dir, f"{self.token_id}_backfill_{self.resolution}.json"),
+                                     self.resolution, self.chunk_days)
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _fetch_chunk(self, chunk: Tuple[int, int]) -> Optional[Dict]:
+        """Download one chunk, retrying with exponential backoff"""
+        chunk_start, chunk_end = chunk
+        # Stop just short of the next chunk so the range stays within the granularity tier
+        end_s = min(chunk_end - 1000, int(time.time() * 1000)) // 1000
+        for attempt in range(config.BACKFILL_RETRIES):
+            self.limiter.acquire()
+            payload = self.fetcher.fetch_market_chart_range(chunk_start // 1000, end_s, self._session(),
+                                                            config.BACKFILL_TIMEOUT)
+            if payload is not None:
+                return payload
+            if attempt + 1 < config.BACKFILL_RETRIES:
+                API_RETRIES.inc(endpoint='market_chart_range')
+                time.sleep(min(60, 2 ** attempt))
+        return None
+
+    def run(self, start, end=None) -> Dict:
+        """
+        Backfill [start, end] into the token's rollup pyramid
+
+        Args:
+            start: Range start (anything pd.Timestamp accepts)
+            end: Range end (default: now)
+
+        Returns:
+            Dict with chunk counts, samples stitched and the pyramid span
+        """
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.now(tz='UTC').tz_localize(None)
+        chunks = plan_chunks(pd.Timestamp(start), end, self.chunk_days)
+        pending = [chunk for chunk in chunks if chunk[0] not in self.checkpoint.completed]
+        summary = {'chunks': len(chunks), 'skipped': len(chunks) - len(pending),
+                   'fetched': 0, 'failed': 0, 'samples': 0}
+        logger.info(f"📦 Backfilling {self.token_id.upper()} {pd.Timestamp(start):%Y-%m-%d} → {end:%Y-%m-%d} "
+                    f"({len(chunks)} chunks of {self.chunk_days}d, {summary['skipped']} already done)")
+        if not pending:
+            return summary
+
+        pyramid = RollupPyramid.load(self.data_dir, self.token_id)
+        unsaved = []
+        queue = iter(pending)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = {}
+
+            def submit_next():
+                chunk = next(queue, None)
+                if chunk is not None:
+                    in_flight[pool.submit(self._fetch_chunk, chunk)] = chunk
+
+            for _ in range(self.workers * 2):
+                submit_next()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = in_flight.pop(future)
+                    submit_next()
+                    payload = future.result()
+                    label = f"{pd.to_datetime(chunk[0], unit='ms'):%Y-%m-%d}"
+                    if payload is None:
+                        summary['failed'] += 1
+                        logger.warning(f"  ✗ {label}: failed after {config.BACKFILL_RETRIES} attempts")
+                        continue
+
+                    samples = len(payload.get('prices', []))
+                    pyramid.append(payload)
+                    summary['fetched'] += 1
+                    summary['samples'] += samples
+                    logger.info(f"  ✓ {label}: {samples} samples "
+                                f"({summary['fetched'] + summary['failed']}/{len(pending)})")
+
+                    # The chunk still open at "now" is fetched again next time
+                    if chunk[1] <= time.time() * 1000:
+                        unsaved.append(chunk[0])
+                    if len(unsaved) >= config.BACKFILL_SAVE_EVERY:
+                        self._flush(pyramid, unsaved)
+
+        self._flush(pyramid, unsaved)
+        summary['span'] = pyramid.span()
+        return summary
+
+    def _flush(self, pyramid: RollupPyramid, unsaved: List[int]) -> None:
+        """Save the store, then record the chunks it now contains"""
+        pyramid.save(self.data_dir)
+        pyramid.release()
+        self.checkpoint.completed.update(unsaved)
+        self.checkpoint.save()
+        unsaved.clear()
+
+
+def run_backfill(start, end=None, resolution: str = None, token_id: str = None,
+                 data_dir: str = None, workers: int = None) -> Dict:
+    """
+    Backfill a token's history and print a summary
+
+    Args:
+        start: Range start
+        end: Range end (default: now)
+        resolution: Target granularity ('5m', '1h' or '1d'), which sets the chunk length
+        token_id: Token to backfill
+        data_dir: Directory holding the rollup pyramid
+        workers: Concurrent downloads
+
+    Returns:
+        Backfill summary
+    """
+    started = time.perf_counter()
+    summary = Backfill(token_id, resolution, data_dir, workers).run(start, end)
+    span = summary.get('span')
+    logger.info(f"\n✓ Backfill finished in {time.perf_counter() - started:.1f}s: {summary['fetched']} chunks fetched, "
+                f"{summary['skipped']} skipped, {summary['failed']} failed, {summary['samples']:,} samples")
+    if span:
+        logger.info(f"  - Store now covers {span[0]:%Y-%m-%d %H:%M} → {span[1]:%Y-%m-%d %H:%M}")
+    if summary['failed']:
+        logger.warning("  - Re-run the same command to retry the failed chunks")
+    return summary
@@ -0,0 +1,195 @@
+# batch.py - Run the analysis over a grid of tokens and parameter sets
+
+import os
+import json
+import itertools
+import contextlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+import pandas as pd
+import config
+from data_fetcher import DataFetcher
+from logs import get_logger
+from metrics import REGISTRY, RUNS
+
+logger = get_logger(__name__)
+
+GRID_KEYS = {
+    'tokens': 'token',
+    'days': 'days',
+    'price_thresholds': 'price_threshold',
+    'volume_thresholds': 'volume_threshold'
+}
+
+SUMMARY_COLUMNS = ['token', 'days', 'price_threshold', 'volume_threshold', 'rows',
+                   'total_spikes', 'price_spikes', 'volume_spikes', 'price_change_pct',
+                   'volatility', 'status', 'error', 'output_dir']
+
+
+def _job(entry: Dict) -> Dict:
+    """Fill in defaults for one grid entry"""
+    return {
+        'token': entry.get('token') or config.TOKEN_ID,
+        'days': int(entry.get('days') or config.DEFAULT_DAYS),
+        'price_threshold': float(entry.get('price_threshold') or config.PRICE_SPIKE_THRESHOLD),
+        'volume_threshold': float(entry.get('volume_threshold') or config.VOLUME_SPIKE_THRESHOLD),
+        'resolution': entry.get('resolution') or config.DEFAULT_RESOLUTION,
+        'render_tier': entry.get('render_tier') or config.BATCH_RENDER_TIER,
+        'export_charts': bool(entry.get('export_charts', config.BATCH_EXPORT_CHARTS))
+    }
+
+
+def expand_grid(grid) -> List[Dict]:
+    """
+    Expand a grid specification into a list of jobs
+    
+    Args:
+        grid: Either a list of job dicts, or a dict of lists (tokens, days,
+            price_thresholds, volume_thresholds) whose cartesian product is taken
+        
+    Returns:
+        List of job dicts with token, days, price_threshold, volume_threshold and resolution
+    """
+    if isinstance(grid, list):
+        return [_job(entry) for entry in grid]
+    
+    axes = {field: grid.get(key) or [None] for key, field in GRID_KEYS.items()}
+    jobs = [_job(dict(zip(axes, values))) for values in itertools.product(*axes.values())]
+    for key in ('resolution', 'render_tier', 'export_charts'):
+        if key in grid:
+            for job in jobs:
+                job[key] = grid[key]
+    return jobs
+
+
+def load_grid(path: str) -> List[Dict]:
+    """Read a grid specification from a JSON file"""
+    with open(path) as f:
+        return expand_grid(json.load(f))
+
+
+def job_dir(output_dir: str, job: Dict) -> str:
+    """Output directory of one job"""
+    name = f"d{job['days']}_p{job['price_threshold']:g}_v{job['volume_threshold']:g}_{job['resolution']}"
+    return os.path.join(output_dir, job['token'], name)
+
+
+def _run_job(job: Dict, market_data: Dict, current_data: Dict, output_dir: str) -> Dict:
+    """Process one job in a worker; console output goes to the job's run.log"""
+    # Imported here so the parent does not pay for matplotlib before forking
+    from main import run_analysis
+    
+    directory = job_dir(output_dir, job)
+    os.makedirs(directory, exist_ok=True)
+    row = dict(job, output_dir=directory, status='ok', error='')
+    # Workers run many jobs; each job's metrics dump covers that job alone
+    REGISTRY.reset()
+    
+    with open(os.path.join(directory, 'run.log'), 'w') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            result = run_analysis(market_data, current_data, job['days'], job['price_threshold'],
+                                  job['volume_threshold'], job['resolution'], token_id=job['token'],
+                                  data_dir=os.path.join(directory, 'data'),
+                                  reports_dir=os.path.join(directory, 'reports'),
+                                  charts_dir=os.path.join(directory, 'visualizations'),
+                                  render_tier=job['render_tier'],
+                                  export_charts=job['export_charts'], export_workers=1)
+        except Exception as e:
+            logger.exception(f"Error: {e}")
+            RUNS.inc(status='failed')
+            return dict(row, status='failed', error=str(e))
+        finally:
+            REGISTRY.dump(os.path.join(directory, 'reports'), job['token'].lower())
+    
+    if result is None:
+        return dict(row, status='empty')
+    
+    df, spikes_df, stats = result
+    types = spikes_df.counts('type')
+    return dict(row,
+                rows=len(df),
+                total_spikes=len(spikes_df),
+                price_spikes=types['price'],
+                volume_spikes=types['volume'],
+                price_change_pct=stats['price']['change_30d'],
+                volatility=stats['price']['volatility'])
+
+
+def fetch_payloads(jobs: List[Dict]):
+    """
+    Fetch every distinct (token, days) market chart and each token's current data once
+    
+    Returns:
+        (market payloads keyed on (token, days), current data keyed on token)
+    """
+    market, current = {}, {}
+    for token in sorted({job['token'] for job in jobs}):
+        fetcher = DataFetcher(token)
+        for days in sorted({job['days'] for job in jobs if job['token'] == token}):
+            market[(token, days)] = fetcher.fetch_market_chart(days)
+        current[token] = fetcher.fetch_current_data()
+    return market, current
+
+
+def run_batch(jobs: List[Dict], output_dir: str = None, workers: int = None) -> pd.DataFrame:
+    """
+    Run every job across a process pool
+    
+    Args:
+        jobs: Job dicts as returned by expand_grid
+        output_dir: Root directory for per-job outputs
+        workers: Number of worker processes
+        
+    Returns:
+        DataFrame with one summary row per job
+    """
+    output_dir = output_dir or config.BATCH_OUTPUT_DIR
+    workers = workers or config.BATCH_WORKERS or os.cpu_count()
+    os.makedirs(output_dir, exist_ok=True)
+    
+    logger.info(f"📊 Fetching {len({(j['token'], j['days']) for j in jobs})} market payloads for {len(jobs)} jobs...")
+    market, current = fetch_payloads(jobs)
+    
+    rows = []
+    logger.info(f"\n⚙️  Running {len(jobs)} jobs on {workers} workers...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for job in jobs:
+            payload = market.get((job['token'], job['days']))
+            if not payload:
+                rows.append(dict(job, output_dir=job_dir(output_dir, job), status='failed',
+                                 error='market data unavailable'))
+                continue
+            futures[pool.submit(_run_job, job, payload, current.get(job['token']), output_dir)] = job
+        
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                row = dict(job, output_dir=job_dir(output_dir, job), status='failed', error=str(e))
+            logger.log(logging.INFO if row['status'] == 'ok' else logging.WARNING,
+                       f"  {'✓' if row['status'] == 'ok' else '✗'} {row['token']} {row['days']}d "
+                       f"p={row['price_threshold']:g} v={row['volume_threshold']:g}: {row['status']}")
+            rows.append(row)
+    
+    summary = pd.DataFrame(rows).reindex(columns=SUMMARY_COLUMNS)
+    summary = summary.sort_values(['token', 'days', 'price_threshold', 'volume_threshold'], ignore_index=True)
+    summary_path = os.path.join(output_dir, 'batch_summary.csv')
+    summary.to_csv(summary_path, index=False)
+    logger.info(f"\n✓ Batch summary saved to {summary_path}")
+    return summary
+
+
+def print_summary(summary: pd.DataFrame) -> None:
+    """Print the consolidated summary table"""
+    print("\n" + "=" * 60)
+    print(" " * 20 + "BATCH SUMMARY")
+    print("=" * 60)
+    columns = ['token', 'days', 'price_threshold', 'volume_threshold', 'total_spikes',
+               'price_spikes', 'volume_spikes', 'price_change_pct', 'status']
+    with pd.option_context('display.width', 120, 'display.max_rows', None, 'display.float_format', '{:.2f}'.format):
+        print(summary[columns].to_string(index=False))
+    print("=" * 60 + "\n")
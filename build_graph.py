@@ -0,0 +1,228 @@
+# build_graph.py - Content-keyed dependency graph over derived artifacts
+
+import os
+import json
+import pickle
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from market_series import MarketSeries
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Part of every node key; bump when a change to the analysis code should
+# invalidate results cached by earlier versions
+GRAPH_VERSION = 1
+
+
+def fingerprint(value: Any) -> str:
+    """
+    Content hash of a graph input
+
+    Frames are hashed by their values, column names and attrs, series and
+    arrays by their bytes, and anything else by its JSON form.
+
+    Args:
+        value: DataFrame, MarketSeries, ndarray, dict/list of those, or None
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    def update(item):
+        if isinstance(item, pd.DataFrame):
+            digest.update(json.dumps([list(map(str, item.columns)), item.attrs], sort_keys=True, default=str).encode())
+            digest.update(pd.util.hash_pandas_object(item, index=False).to_numpy().tobytes())
+        elif isinstance(item, MarketSeries):
+            for array in (item.timestamps, item.price, item.volume, item.market_cap):
+                digest.update(np.ascontiguousarray(array).view('uint8'))
+        elif isinstance(item, np.ndarray):
+            digest.update(np.ascontiguousarray(item).view('uint8'))
+        elif isinstance(item, dict) and any(isinstance(v, (pd.DataFrame, MarketSeries, np.ndarray)) for v in item.values()):
+            for key in sorted(item):
+                digest.update(str(key).encode())
+                update(item[key])
+        else:
+            digest.update(json.dumps(item, sort_keys=True, default=str).encode())
+
+    update(value)
+    return digest.hexdigest()
+
+
+def _paths(value) -> List[str]:
+    """Output paths returned by an artifact node's build function"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [path for path in value if path]
+
+
+def _stat(path: str) -> Optional[List[int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class Node:
+    """One derived value or artifact and how to build it"""
+
+    def __init__(self, name: str, build: Callable, inputs: Sequence[str] = (), params: Dict = None,
+                 artifact: bool = False):
+        self.name = name
+        self.build = build
+        self.inputs = list(inputs)
+        self.params = params or {}
+        # Artifacts write files and return their paths; other nodes return a
+        # value that is pickled so a later run can reuse it
+        self.artifact = artifact
+
+
+class BuildGraph:
+    """
+    Rebuild only the nodes whose inputs changed since the last run
+
+    A node's key hashes its name, parameters and its inputs' keys, and
+    source keys hash their content, so a key changes exactly when something
+    upstream did. Keys are computed without building anything. A node is
+    cached when the manifest holds the same key and its files are still the
+    ones it wrote (same size and mtime). Nodes are built on demand: a
+    cached node's value is only unpickled when something downstream has to
+    be rebuilt, and a run whose inputs are all unchanged reads nothing but
+    the manifest.
+    """
+
+    def __init__(self, directory: str, name: str, force: bool = False):
+        """
+        Args:
+            directory: Directory for the manifest and pickled values
+            name: Graph name, used as the file prefix
+            force: Rebuild every node regardless of the manifest
+        """
+        self.directory = directory
+        self.name = name
+        self.force = force
+        self.manifest_path = os.path.join(directory, f'{name}_manifest.json')
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path) as f:
+                    self.manifest = json.load(f).get('nodes', {})
+            except (OSError, ValueError):
+                self.manifest = {}
+        self.nodes = {}
+        self.values = {}
+        self.keys = {}
+        self.status = {}
+
+    def source(self, name: str, value: Any, key: str = None) -> None:
+        """Register an input value; its key is its content hash unless given"""
+        self.values[name] = value
+        self.keys[name] = key or fingerprint(value)
+
+    def node(self, name: str, build: Callable, inputs: Sequence[str] = (), params: Dict = None,
+             artifact: bool = False) -> None:
+        """
+        Register a node
+
+        Args:
+            name: Node name
+            build: Called with the input values in order
+            inputs: Names of sources or nodes this one is derived from
+            params: Settings that change the result (thresholds, output directory, ...)
+            artifact: build writes files and returns their path(s)
+        """
+        self.nodes[name] = Node(name, build, inputs, params, artifact)
+
+    def key(self, name: str) -> str:
+        if name not in self.keys:
+            node = self.nodes[name]
+            payload = [GRAPH_VERSION, name, node.params, [self.key(input_name) for input_name in node.inputs]]
+            self.keys[name] = hashlib.blake2b(json.dumps(payload, sort_keys=True, default=str).encode(),
+                                              digest_size=16).hexdigest()
+        return self.keys[name]
+
+    def _value_path(self, name: str) -> str:
+        return os.path.join(self.directory, f'{self.name}_{name}.pkl')
+
+    def _cached(self, name: str) -> bool:
+        entry = self.manifest.get(name)
+        if self.force or not entry or entry.get('key') != self.key(name):
+            return False
+        if any(_stat(path) != stat for path, stat in entry.get('outputs', {}).items()):
+            return False
+        return self.nodes[name].artifact or os.path.exists(self._value_path(name))
+
+    def get(self, name: str) -> Any:
+        """Value of a source or node, building it and its stale inputs as needed"""
+        if name in self.values:
+            return self.values[name]
+        node = self.nodes[name]
+        if self._cached(name):
+            entry = self.manifest[name]
+            if node.artifact:
+                value = list(entry.get('outputs', {}))
+                self.status[name] = 'cached'
+            else:
+                try:
+                    with open(self._value_path(name), 'rb') as f:
+                        value = pickle.load(f)
+                    self.status[name] = 'cached'
+                except Exception as e:
+                    logger.warning(f"⚠️  Rebuilding {name}: cached value unreadable ({e})")
+                    value = self._build(node)
+        else:
+            value = self._build(node)
+        self.values[name] = value
+        return value
+
+    def _build(self, node: Node) -> Any:
+        value = node.build(*[self.get(input_name) for input_name in node.inputs])
+        entry = {'key': self.key(node.name), 'inputs': node.inputs}
+        if node.artifact:
+            entry['outputs'] = {path: _stat(path) for path in _paths(value)}
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._value_path(node.name)
+            with open(f'{path}.tmp', 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f'{path}.tmp', path)
+        self.manifest[node.name] = entry
+        self.status[node.name] = 'built'
+        return value
+
+    def build(self, targets: Sequence[str]) -> Dict[str, Any]:
+        """
+        Bring the targets up to date and save the manifest
+
+        Args:
+            targets: Node names to build
+
+        Returns:
+            Values of the targets
+        """
+        values = {name: self.get(name) for name in targets}
+        self.save()
+        return values
+
+    def save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self.manifest_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': GRAPH_VERSION, 'nodes': self.manifest}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def summary(self) -> Dict[str, List[str]]:
+        """
+        Nodes split into built and cached, in registration order
+
+        Nodes the run never had to read count as cached: everything that
+        depends on them was up to date.
+        """
+        built = [name for name in self.nodes if self.status.get(name) == 'built']
+        return {'cached': [name for name in self.nodes if name not in built], 'built': built}
@@ -0,0 +1,117 @@
+# chart_exporter.py - Export the dashboard's Plotly charts as standalone HTML/JSON
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+import pandas as pd
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+import config
+from dashboard_charts import CHART_BUILDERS, DEFAULT_CHART_OPTIONS
+from spike_store import SpikeStore
+from shared_frame import attach_frame
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+PLOTLYJS_FILENAME = 'plotly.min.js'
+
+# Set in each worker by _init_worker so the frames are sent once per
+# process instead of once per chart
+_frames = {}
+
+
+def _init_worker(df: pd.DataFrame, spikes_df: SpikeStore, frame_path: str = None) -> None:
+    _frames['df'] = attach_frame(frame_path) if frame_path else df
+    _frames['spikes'] = spikes_df
+
+
+def _export_chart(chart_id: str, options: Dict, output_dir: str, prefix: str, formats: List[str]) -> List[str]:
+    """Build one chart and write it in every requested format"""
+    fig = CHART_BUILDERS[chart_id](_frames['df'], _frames['spikes'], **options)
+    paths = []
+    if 'html' in formats:
+        path = os.path.join(output_dir, f'{prefix}_{chart_id}.html')
+        # A .js path makes plotly emit a <script src> instead of inlining ~4 MB
+        fig.write_html(path, include_plotlyjs=PLOTLYJS_FILENAME, full_html=True)
+        paths.append(path)
+    if 'json' in formats:
+        path = os.path.join(output_dir, f'{prefix}_{chart_id}.json')
+        pio.write_json(fig, path)
+        paths.append(path)
+    return paths
+
+
+def write_plotlyjs(output_dir: str) -> str:
+    """Write the shared plotly.js bundle next to the HTML charts, once"""
+    path = os.path.join(output_dir, PLOTLYJS_FILENAME)
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+    return path
+
+
+def write_index(output_dir: str, prefix: str, chart_ids: List[str]) -> str:
+    """Write an index page linking every exported HTML chart"""
+    path = os.path.join(output_dir, f'{prefix}_charts.html')
+    links = '\n'.join(f'    <li><a href="{prefix}_{chart_id}.html">{chart_id.replace("_", " ").title()}</a></li>'
+                      for chart_id in chart_ids)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>{prefix.upper()} Charts</title></head>\n"
+                f"<body>\n  <h1>{prefix.upper()} Charts</h1>\n  <ul>\n{links}\n  </ul>\n</body>\n</html>\n")
+    return path
+
+
+def export_charts(df: pd.DataFrame, spikes_df: SpikeStore, output_dir: str = None,
+                  chart_ids: List[str] = None, formats: List[str] = None, workers: int = None,
+                  token_id: str = None, options: Dict = None, frame_path: str = None) -> List[str]:
+    """
+    Export dashboard charts without a Streamlit session
+
+    Charts are built and serialized across a process pool. HTML files
+    reference one shared plotly.min.js in the output directory.
+
+    Args:
+        df: Processed market data
+        spikes_df: Spike events
+        output_dir: Directory for the exported files
+        chart_ids: Charts to export (default: config.CHART_EXPORT_IDS)
+        formats: Any of 'html' and 'json' (default: config.CHART_EXPORT_FORMATS)
+        workers: Number of worker processes; 1 exports in this process
+        token_id: Token name used as the file prefix
+        options: Per-chart option overrides, keyed by chart id
+        frame_path: df as published by ReportGenerator.publish_market_data;
+            pool workers map it instead of receiving df pickled
+
+    Returns:
+        List of written file paths
+    """
+    output_dir = output_dir or config.CHART_EXPORT_DIR
+    formats = formats or config.CHART_EXPORT_FORMATS
+    workers = workers or config.CHART_EXPORT_WORKERS or os.cpu_count()
+    prefix = (token_id or config.TOKEN_ID).lower()
+    chart_ids = [chart_id for chart_id in (chart_ids or config.CHART_EXPORT_IDS)
+                 if chart_id != 'spike_timeline' or not spikes_df.empty]
+    os.makedirs(output_dir, exist_ok=True)
+
+    paths = []
+    if 'html' in formats:
+        paths.append(write_plotlyjs(output_dir))
+
+    tasks = [(chart_id, {**DEFAULT_CHART_OPTIONS.get(chart_id, {}), **(options or {}).get(chart_id, {})},
+              output_dir, prefix, formats) for chart_id in chart_ids]
+    if workers == 1 or len(tasks) < 2:
+        _init_worker(df, spikes_df)
+        for task in tasks:
+            paths.extend(_export_chart(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                 initializer=_init_worker,
+                                 initargs=(None if frame_path else df, spikes_df, frame_path)) as pool:
+            for result in pool.map(_export_chart, *zip(*tasks)):
+                paths.extend(result)
+
+    if 'html' in formats:
+        paths.append(write_index(output_dir, prefix, chart_ids))
+    logger.info(f"✓ Exported {len(chart_ids)} interactive charts to {output_dir}/")
+    return paths
@@ -22,4 +22,161 @@ HEADERS = {
 # Visualization Settings
 FIGURE_SIZE = (14, 12)
 DPI = 300
-CHART_STYLE = 'seaborn-v0_8-darkgrid'
\ No newline at end of file
+CHART_STYLE = 'seaborn-v0_8-darkgrid'
+
+# Market Chart Granularity
+# None lets CoinGecko return the finest granularity for the requested range
+# (5-minute for 1 day, hourly up to 90 days, daily beyond that)
+MARKET_CHART_INTERVAL = None
+
+# Market Chart Streaming
+# Parse market_chart bodies chunk by chunk into numeric arrays instead of
+# building the whole JSON document in memory
+STREAM_MARKET_CHART = True
+STREAM_CHUNK_BYTES = 1 << 20
+# Report each parse's peak memory (tracemalloc). Tracing is process-wide and
+# slows every allocation; only one parse is measured at a time and parses that
+# overlap another go unmeasured.
+STREAM_TRACE_MEMORY = False
+
+# Rollup Pyramid Settings
+ROLLUP_LEVELS = ['5m', '1h', '1d', '1w']
+DEFAULT_RESOLUTION = '1d'  # '5m', '1h', '1d', '1w' or 'auto'
+ROLLUP_MAX_ROWS = 1000  # row budget used when picking a level for a range
+
+# Statistics Cache
+STATS_CACHE_SIZE = 128  # memoized (dataset version, range) entries
+
+# Dashboard Figure Cache
+FIGURE_CACHE_MAX_ENTRIES = 64
+FIGURE_CACHE_MAX_MB = 256
+
+# Dashboard Dataset Snapshots
+SNAPSHOT_ARROW_STRINGS = True  # store string columns in Arrow buffers when pyarrow is installed
+SNAPSHOT_MAX_VERSIONS = 2  # dataset versions kept in memory (current plus the one being replaced)
+RANGE_CACHE_ENTRIES = 32  # processed level ranges kept, shared by all sessions
+SESSION_ACTIVE_SECONDS = 600  # sessions seen within this window count as active
+
+# Spike Timeline Rendering
+SPIKE_WEBGL_THRESHOLD = 200  # switch spike markers to WebGL above this many points
+
+# Batch Runner
+BATCH_OUTPUT_DIR = "./batch"
+BATCH_WORKERS = None  # process pool size; None uses the CPU count
+BATCH_RENDER_TIER = 'web'  # chart tier for batch jobs (see RENDER_TIERS below)
+BATCH_EXPORT_CHARTS = False  # also export interactive charts for every job
+
+# Historical Backfill
+# Chunk length per target resolution; CoinGecko returns 5-minute data for
+# ranges up to 1 day, hourly up to 90 days and daily beyond
+BACKFILL_CHUNK_DAYS = {'5m': 1, '1h': 90, '1d': 365}
+BACKFILL_RESOLUTION = '1h'
+BACKFILL_WORKERS = 4  # concurrent chunk downloads
+BACKFILL_RATE_LIMIT = 25  # requests per minute across all workers
+BACKFILL_RETRIES = 4  # attempts per chunk, with exponential backoff
+BACKFILL_TIMEOUT = 30  # seconds per request
+BACKFILL_SAVE_EVERY = 10  # chunks stitched between store flushes and checkpoints
+
+# Threshold Sensitivity Sweep
+SWEEP_PRICE_THRESHOLDS = [1, 2, 3, 5, 7.5, 10, 15, 20, 30]  # percentage
+SWEEP_VOLUME_THRESHOLDS = [10, 25, 50, 75, 100, 150, 200, 300]  # percentage
+
+# Correlation Analytics
+CORRELATION_COLUMNS = ['price', 'volume', 'price_change_pct', 'volume_change_pct']
+CORRELATION_WINDOW = 30  # bars in the rolling correlation window
+# Extra CoinGecko ids fetched each run and correlated with TOKEN_ID's returns and volumes
+BASKET_TOKENS = []
+
+# Alerts
+ALERTS_ENABLED = True
+ALERT_SINKS = ['stdout', 'file']  # any of 'stdout', 'file', 'webhook', 'smtp'
+ALERT_RULES = [
+    {'name': 'large_price_move', 'metrics': ['price'], 'min_change_pct': 15.0, 'severity': 'critical'},
+    {'name': 'price_with_volume', 'types': ['price_and_volume'], 'severity': 'warning'},
+    {'name': 'volume_surge', 'metrics': ['volume'], 'min_change_pct': 100.0, 'severity': 'info'}
+]
+ALERT_COOLDOWN_MINUTES = 60  # per rule, type and direction, in event time
+ALERT_QUEUE_SIZE = 1000  # per sink; alerts beyond this are dropped, not waited on
+ALERT_DRAIN_TIMEOUT = 10  # seconds to wait for sinks at shutdown
+ALERT_STATE_FILE = "./data/alert_state.json"
+ALERT_STATE_RETENTION_DAYS = 400
+ALERT_LOG_FILE = "./reports/kaito_alerts.jsonl"
+ALERT_WEBHOOK_URL = None
+ALERT_WEBHOOK_TIMEOUT = 5  # seconds
+ALERT_SMTP_HOST = "localhost"  # e.g. python -m aiosmtpd -n -l localhost:1025
+ALERT_SMTP_PORT = 1025
+ALERT_EMAIL_FROM = "alerts@localhost"
+ALERT_EMAIL_TO = ["analyst@localhost"]
+
+# Chart Render Tiers
+# template=True reuses one prebuilt figure per process and updates its data
+# in place; template=False rebuilds the figure and trims it with a tight bbox
+RENDER_TIERS = {
+    'thumbnail': {'dpi': 40, 'format': 'png', 'template': True},
+    'web': {'dpi': 100, 'format': 'webp', 'template': True},
+    'print': {'dpi': DPI, 'format': 'png', 'template': False}
+}
+RENDER_TIER = 'print'
+RENDER_FORMATS = ['png', 'webp', 'svg']
+
+# Interactive Chart Export
+CHART_EXPORT_DIR = "./reports/charts"
+CHART_EXPORT_FORMATS = ['html', 'json']
+CHART_EXPORT_IDS = ['price_volume', 'bollinger', 'volatility', 'correlation', 'spike_timeline',
+                    'volume', 'volume_price_scatter', 'price_change_distribution', 'sensitivity']
+CHART_EXPORT_WORKERS = None  # process pool size; None uses the CPU count
+
+# Logging & Metrics
+LOG_LEVEL = 'INFO'  # progress messages below this level are dropped
+LOG_FORMAT = 'text'  # 'text' for plain messages or 'json' for one JSON object per line
+METRICS_DUMP = True  # write reports/<token>_metrics.json and .prom after each run
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9108
+DAEMON_INTERVAL_MINUTES = 15
+
+# Incremental Builds
+# Derived data, charts and reports are rebuilt only when the content of their
+# inputs or their settings changed since the last run
+BUILD_CACHE = True
+BUILD_DIR = '.build'  # manifest and cached intermediate values, under DATA_DIR
+
+# Raw Payload Archive
+# Every CoinGecko response body is kept, compressed, for --replay
+ARCHIVE_ENABLED = True
+ARCHIVE_DIR = "./data/archive"
+ARCHIVE_CODEC = 'zstd'  # 'zstd' (needs the zstandard package, else zlib is used) or 'zlib'
+ARCHIVE_LEVEL = 3  # compression level, valid for both codecs
+ARCHIVE_SEGMENT_BYTES = 64 * 1024 * 1024  # start a new segment file past this size
+REPLAY_OUTPUT_DIR = "./replay"  # root for the data, reports and charts of --replay runs
+
+# Numeric Kernels
+KERNEL_BACKEND = 'auto'  # 'numba', 'numpy', or 'auto' for numba when it is installed
+
+# Dashboard Data Service
+# With DATA_SERVICE_URL set (e.g. 'http://127.0.0.1:8765') the dashboard reads
+# its data from `python main.py --serve-data` instead of parsing the files itself
+DATA_SERVICE_URL = None
+DATA_SERVICE_HOST = '127.0.0.1'
+DATA_SERVICE_PORT = 8765
+DATA_SERVICE_POLL_SECONDS = 2  # how often the service looks for a newer backend run
+DATA_SERVICE_CACHE_ENTRIES = 64  # serialized responses (service) and decoded frames (client) kept
+DATA_SERVICE_TIMEOUT = 10  # client request timeout in seconds
+
+# Concurrent Fetch
+# The market chart and coin detail requests run in parallel; the detail only
+# feeds the current-market section, so the run goes on without it once its
+# time budget is spent
+FETCH_TIMEOUT = 30  # seconds per market_chart request
+CURRENT_DATA_TIMEOUT = 5  # seconds the run waits for the coin detail
+
+# Exchange Day
+# IANA zone whose calendar days key the data: daily grouping, spike merging,
+# report periods and dashboard date filters. Rollup bars stay UTC-aligned.
+EXCHANGE_TIMEZONE = 'UTC'
+
+# Shared Market Frame
+# Also publish the processed market frame as a memory-mapped column file
+# (data/<token>_market_data.mmap). Chart export workers, the data service and
+# dashboard replicas map it and share one physical copy instead of each
+# parsing the CSV.
+SHARED_FRAME = True
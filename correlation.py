@@ -0,0 +1,401 @@
+# correlation.py - Correlation matrices from running co-moments
+
+from collections import deque
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+import config
+
+
+# Relative spread below which a column counts as constant (pandas returns NaN there)
+FLAT_TOLERANCE = 1e-12
+
+
+def _block_moments(values: np.ndarray):
+    """
+    Per-pair count, mean, centered second moment and co-moment of a block of rows
+
+    Entry [i, j] only covers rows where both column i and column j are
+    present, which gives pandas' pairwise-complete semantics; mean[i, j]
+    and m2[i, j] describe column i over those rows. Values are centered on
+    their column mean before summing, so the sums are deviations rather
+    than raw levels and nothing cancels on a drifting series.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype='float64'))
+    valid = ~np.isnan(values)
+    present = valid.astype('float64')
+    count = present.T @ present
+    column_count = present.sum(axis=0)
+    center = np.where(column_count > 0, np.where(valid, values, 0.0).sum(axis=0) / np.maximum(column_count, 1), 0.0)
+    centered = np.where(valid, values - center, 0.0)
+    total = centered.T @ present
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(count > 0, total / count, 0.0)
+    mean = center[:, np.newaxis] + offset
+    m2 = np.maximum((centered * centered).T @ present - offset * total, 0.0)
+    cross = centered.T @ centered - offset * total.T
+    return count, mean, m2, cross
+
+
+class CoMoments:
+    """
+    Pairwise co-moments for k columns
+
+    Adding or removing a row (or a block of rows) merges its moments into
+    the running ones with Chan et al.'s pairwise update, O(k²) per call;
+    the matrix is read off at any time without revisiting the data. The
+    state is means and centered moments rather than raw sums, so a long
+    drifting series keeps full precision.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.count = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.cross = np.zeros((k, k))
+
+    def add(self, values) -> None:
+        """Add one observation (length k, NaN for missing) or a block of rows"""
+        count, mean, m2, cross = _block_moments(values)
+        total = self.count + count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(total > 0, self.count * count / total, 0.0)
+            delta = mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * np.where(total > 0, count / total, 0.0), 0.0)
+        self.m2 = self.m2 + m2 + delta * delta * weight
+        self.cross = self.cross + cross + delta * delta.T * weight
+        self.count = total
+
+    def remove(self, values) -> None:
+        """Remove observations previously added"""
+        count, mean, m2, cross = _block_moments(values)
+        rest = self.count - count
+        kept = rest > 0.5
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rest_mean = np.where(kept, (self.count * self.mean - count * mean) / np.where(kept, rest, 1.0), 0.0)
+            weight = np.where(kept, rest * count / np.where(self.count > 0, self.count, 1.0), 0.0)
+        delta = mean - rest_mean
+        self.m2 = np.where(kept, np.maximum(self.m2 - m2 - delta * delta * weight, 0.0), 0.0)
+        self.cross = np.where(kept, self.cross - cross - delta * delta.T * weight, 0.0)
+        self.mean = rest_mean
+        self.count = np.where(kept, rest, 0.0)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns: List[str] = None) -> 'CoMoments':
+        columns = list(columns or df.columns)
+        moments = cls(columns)
+        if len(df):
+            moments.add(df[columns].to_numpy(dtype='float64', na_value=np.nan))
+        return moments
+
+    def matrix(self, min_periods: int = 2) -> np.ndarray:
+        """
+        Pearson correlation matrix from the current moments
+
+        Args:
+            min_periods: Pairs with fewer common observations are NaN
+
+        Returns:
+            k x k array
+        """
+        return _correlation(self.count, self.mean, self.m2, self.cross, min_periods)
+
+    def frame(self, min_periods: int = 2) -> pd.DataFrame:
+        return pd.DataFrame(self.matrix(min_periods), index=self.columns, columns=self.columns)
+
+
+def _correlation(count, mean, m2, cross, min_periods: int = 2) -> np.ndarray:
+    """Correlation from pairwise moments; works on (k, k) or stacked (..., k, k) arrays"""
+    m2_j = np.swapaxes(m2, -1, -2)
+    # Centered moments of a constant column are rounding noise, not spread
+    tolerance = count * (FLAT_TOLERANCE * mean) ** 2
+    flat = ~(m2 > tolerance) | ~(m2_j > np.swapaxes(tolerance, -1, -2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.clip(cross / np.sqrt(m2 * m2_j), -1.0, 1.0)
+    corr[(count < max(min_periods, 2)) | flat] = np.nan
+    return corr
+
+
+class RollingCorrelation:
+    """
+    Correlation over the last `window` observations, updated one row at a time
+
+    Each update adds the new row and removes the one leaving the window,
+    so the cost per observation is O(k²) regardless of history length.
+    The moments are re-summed from the held rows every `window` updates,
+    so rounding from removals never accumulates.
+    """
+
+    def __init__(self, columns: List[str], window: int = None):
+        self.window = window or config.CORRELATION_WINDOW
+        self.moments = CoMoments(columns)
+        self.rows = deque()
+        self.updates = 0
+
+    @property
+    def columns(self) -> List[str]:
+        return self.moments.columns
+
+    def push(self, values) -> None:
+        """Add one observation without computing the matrix"""
+        row = np.asarray(values, dtype='float64')
+        self.moments.add(row)
+        self.rows.append(row)
+        if len(self.rows) > self.window:
+            self.moments.remove(self.rows.popleft())
+        self.updates += 1
+        if self.updates >= self.window:
+            self.reset(self.rows)
+
+    def update(self, values) -> np.ndarray:
+        """
+        Add one observation and return the updated matrix
+
+        Args:
+            values: Length-k sequence in column order, NaN for missing
+
+        Returns:
+            k x k correlation matrix over the window
+        """
+        self.push(values)
+        return self.moments.matrix()
+
+    def replace_last(self, values) -> None:
+        """Swap the newest observation for a revised one (e.g. a bar still filling)"""
+        row = np.asarray(values, dtype='float64')
+        self.moments.remove(self.rows.pop())
+        self.moments.add(row)
+        self.rows.append(row)
+
+    def reset(self, rows) -> None:
+        """Start over from the last `window` of the given rows"""
+        rows = [np.asarray(row, dtype='float64') for row in rows][-self.window:]
+        self.moments = CoMoments(self.columns)
+        if rows:
+            self.moments.add(np.vstack(rows))
+        self.rows = deque(rows)
+        self.updates = 0
+
+    def matrix(self) -> np.ndarray:
+        return self.moments.matrix()
+
+    def frame(self) -> pd.DataFrame:
+        return self.moments.frame()
+
+
+class CorrelationTracker:
+    """
+    Full-period and trailing-window correlations kept current across refreshes
+
+    The daemon and the dashboard recompute over a frame that mostly repeats
+    the previous one: bars drop off the front, the last bar is revised and
+    new bars arrive. update() applies only those rows to the running
+    moments. A frame that does not extend the previous one, or one where
+    most rows changed, is summed afresh, as are the full-period moments
+    once as many rows have been applied as the frame holds.
+    """
+
+    def __init__(self, columns: List[str] = None, window: int = None):
+        self.columns = list(columns or config.CORRELATION_COLUMNS)
+        self.window = window or config.CORRELATION_WINDOW
+        self.timestamps = np.empty(0, dtype='int64')
+        self.values = np.empty((0, len(self.columns)))
+        self.moments = CoMoments(self.columns)
+        self.rolling = {}
+        self.applied = 0
+
+    def _rebuild(self) -> None:
+        self.moments = CoMoments(self.columns)
+        if len(self.values):
+            self.moments.add(self.values)
+        for rolling in self.rolling.values():
+            rolling.reset(self.values[-rolling.window:])
+        self.applied = 0
+
+    def update(self, df: pd.DataFrame) -> 'CorrelationTracker':
+        """
+        Bring the moments up to date with a frame
+
+        Args:
+            df: Frame with a timestamp column and the tracked columns
+
+        Returns:
+            self
+        """
+        timestamps = df['timestamp'].to_numpy().astype('datetime64[ns]').astype('int64')
+        values = df[self.columns].to_numpy(dtype='float64', na_value=np.nan)
+        previous, old_values = self.timestamps, self.values
+        self.timestamps, self.values = timestamps, values
+
+        # The new frame must start inside the old one and repeat its tail
+        lo = int(np.searchsorted(previous, timestamps[0])) if len(timestamps) else len(previous)
+        overlap = len(previous) - lo
+        extends = (0 < overlap <= len(timestamps) and previous[lo] == timestamps[0]
+                   and np.array_equal(previous[lo:], timestamps[:overlap]))
+        if extends:
+            same = (old_values[lo:] == values[:overlap]) | (np.isnan(old_values[lo:]) & np.isnan(values[:overlap]))
+            changed = np.flatnonzero(~same.all(axis=1))
+            # Only the last shared bar may have been revised
+            extends = not len(changed) or changed[0] == overlap - 1
+        appended = values[overlap:] if extends else values
+        revised = extends and bool(len(changed))
+        self.applied += lo + 2 * revised + len(appended)
+        if not extends or self.applied > len(values):
+            self._rebuild()
+            return self
+
+        if lo:
+            self.moments.remove(old_values[:lo])
+        if revised:
+            self.moments.remove(old_values[-1])
+            self.moments.add(values[overlap - 1])
+        if len(appended):
+            self.moments.add(appended)
+        for rolling in self.rolling.values():
+            if len(appended) >= rolling.window or (lo and len(values) <= rolling.window):
+                rolling.reset(values[-rolling.window:])
+                continue
+            if revised:
+                rolling.replace_last(values[overlap - 1])
+            for row in appended:
+                rolling.push(row)
+        return self
+
+    def frame(self, window: int = None) -> pd.DataFrame:
+        """
+        Correlation matrix over the whole frame, or over its last `window` rows
+
+        A window's running moments are started the first time it is asked for
+        and kept up to date from then on.
+        """
+        if not window:
+            return self.moments.frame()
+        if window not in self.rolling:
+            self.rolling[window] = RollingCorrelation(self.columns, window)
+            self.rolling[window].reset(self.values[-window:])
+        return self.rolling[window].frame()
+
+    def summary(self) -> Dict:
+        """The running moments in correlation_summary's layout"""
+        return _summary(self.columns, len(self.values), self.window,
+                        self.frame().to_numpy(), self.frame(self.window).to_numpy())
+
+
+def _summary(columns: List[str], rows: int, window: int, full_period: np.ndarray, rolling: np.ndarray) -> Dict:
+    def nested(matrix):
+        return {row: {column: (None if np.isnan(value) else float(value))
+                      for column, value in zip(columns, values)}
+                for row, values in zip(columns, matrix)}
+
+    return {
+        'columns': columns,
+        'rows': rows,
+        'window': window,
+        'full_period': nested(full_period),
+        'rolling': nested(rolling)
+    }
+
+
+def correlation_matrix(df: pd.DataFrame, columns: List[str] = None) -> pd.DataFrame:
+    """
+    Full-period correlation matrix, equivalent to df[columns].corr()
+
+    Args:
+        df: Frame holding the columns
+        columns: Columns to correlate (default: config.CORRELATION_COLUMNS)
+
+    Returns:
+        Square DataFrame indexed and labelled by column
+    """
+    return CoMoments.from_frame(df, columns or config.CORRELATION_COLUMNS).frame()
+
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of each row and the window - 1 rows before it, added directly rather than as prefix differences"""
+    sums = values.copy()
+    for lag in range(1, min(window, len(values))):
+        sums[lag:] += values[:-lag]
+    return sums
+
+
+def rolling_correlation(df: pd.DataFrame, columns: List[str] = None, window: int = None) -> np.ndarray:
+    """
+    Correlation matrix at every row over the trailing window
+
+    Two passes over the window offsets: the first gives every window's
+    pairwise means, the second sums deviations from them, so the result
+    does not degrade on a drifting series the way differences of running
+    sums do. Costs O(rows x window x k²).
+
+    Args:
+        df: Frame holding the columns
+        columns: Columns to correlate (default: config.CORRELATION_COLUMNS)
+        window: Trailing window in rows (default: config.CORRELATION_WINDOW)
+
+    Returns:
+        (rows, k, k) array; rows with less than two observations are NaN
+    """
+    columns = columns or config.CORRELATION_COLUMNS
+    window = window or config.CORRELATION_WINDOW
+    values = df[columns].to_numpy(dtype='float64', na_value=np.nan)
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    pairs = (valid[:, :, np.newaxis] & valid[:, np.newaxis, :]).astype('float64')
+
+    count = _window_sums(pairs, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = _window_sums(filled[:, :, np.newaxis] * pairs, window) / count
+    mean = np.nan_to_num(mean)
+
+    m2 = np.zeros_like(count)
+    cross = np.zeros_like(count)
+    for lag in range(min(window, len(values))):
+        deviation = (filled[:len(values) - lag, :, np.newaxis] - mean[lag:]) * pairs[:len(values) - lag]
+        m2[lag:] += deviation * deviation
+        cross[lag:] += deviation * np.swapaxes(deviation, 1, 2)
+    return _correlation(count, mean, m2, cross)
+
+
+def basket_frame(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Align several tokens' returns and volume changes on timestamp
+
+    Args:
+        frames: Processed market data keyed by token id; all at one resolution
+
+    Returns:
+        Wide frame with '<token> return' and '<token> volume' columns
+    """
+    series = {}
+    for token_id, df in frames.items():
+        indexed = df.set_index('timestamp')
+        series[f'{token_id} return'] = indexed['price_change_pct']
+        series[f'{token_id} volume'] = indexed['volume_change_pct']
+    return pd.DataFrame(series).sort_index()
+
+
+def correlation_summary(df: pd.DataFrame, columns: List[str] = None, window: int = None) -> Dict:
+    """
+    Full-period and latest rolling correlation in a JSON-friendly layout
+
+    Args:
+        df: Frame holding the columns
+        columns: Columns to correlate (default: config.CORRELATION_COLUMNS)
+        window: Rolling window in rows (default: config.CORRELATION_WINDOW)
+
+    Returns:
+        Dict with the columns, the window and both matrices as nested dicts
+    """
+    columns = list(columns or config.CORRELATION_COLUMNS)
+    window = window or config.CORRELATION_WINDOW
+    return _summary(columns, len(df), window, CoMoments.from_frame(df, columns).matrix(),
+                    CoMoments.from_frame(df.iloc[-window:], columns).matrix())
+
+
+def summary_frame(summary: Dict, key: str = 'full_period') -> pd.DataFrame:
+    """Rebuild a matrix from a correlation_summary (e.g. one read back from the JSON report)"""
+    columns = summary['columns']
+    return pd.DataFrame([[summary[key][row][column] for column in columns] for row in columns],
+                        index=columns, columns=columns, dtype='float64')
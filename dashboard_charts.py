@@ -0,0 +1,520 @@
+# dashboard_charts.py - Plotly figure builders shared by the dashboard and chart exporter
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.express as px
+from plotly.subplots import make_subplots
+import numpy as np
+import config
+from data_processor import DataProcessor
+from rollup import period_label
+from correlation import correlation_matrix
+from kernels import rolling_moments
+from spike_store import SpikeStore, SPIKE_DIRECTIONS, SPIKE_TYPES
+
+# Create price chart with volume
+def create_price_volume_chart(df, spikes_df):
+    """Create interactive price and volume chart"""
+    fig = make_subplots(
+        rows=2, cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.05,
+        row_heights=[0.7, 0.3],
+        subplot_titles=('Price Movement', 'Trading Volume')
+    )
+    
+    # Price line
+    fig.add_trace(
+        go.Scatter(
+            x=df['timestamp'],
+            y=df['price'],
+            mode='lines',
+            name='Price',
+            line=dict(color='#1f77b4', width=2),
+            hovertemplate='Date: %{x}<br>Price: $%{y:.4f}<extra></extra>'
+        ),
+        row=1, col=1
+    )
+    
+    # Moving average
+    if 'price_ma7' in df.columns:
+        unit = period_label(df.attrs.get('resolution', '1d'))
+        fig.add_trace(
+            go.Scatter(
+                x=df['timestamp'],
+                y=df['price_ma7'],
+                mode='lines',
+                name=f'7-{unit} MA',
+                line=dict(color='orange', width=1, dash='dash'),
+                hovertemplate=f'Date: %{{x}}<br>7-{unit} MA: $%{{y:.4f}}<extra></extra>'
+            ),
+            row=1, col=1
+        )
+    
+    # Add price spikes within the plotted range
+    spikes = SpikeStore.of(spikes_df)
+    start, end = df['timestamp'].min(), df['timestamp'].max()
+    
+    # Up spikes
+    up_spikes = spikes.select(metric='price', direction='up', start=start, end=end)
+    if not up_spikes.empty:
+        fig.add_trace(
+            go.Scatter(
+                x=up_spikes['timestamp'],
+                y=up_spikes['value'],
+                mode='markers',
+                name='Price Spike Up',
+                marker=dict(color='green', size=12, symbol='triangle-up'),
+                hovertemplate='Date: %{x}<br>Price: $%{y:.4f}<br>Change: +%{text}<extra></extra>',
+                text=[f"{x:.1f}%" for x in up_spikes['change_pct']]
+            ),
+            row=1, col=1
+        )
+    
+    # Down spikes
+    down_spikes = spikes.select(metric='price', direction='down', start=start, end=end)
+    if not down_spikes.empty:
+        fig.add_trace(
+            go.Scatter(
+                x=down_spikes['timestamp'],
+                y=down_spikes['value'],
+                mode='markers',
+                name='Price Spike Down',
+                marker=dict(color='red', size=12, symbol='triangle-down'),
+                hovertemplate='Date: %{x}<br>Price: $%{y:.4f}<br>Change: %{text}<extra></extra>',
+                text=[f"{x:.1f}%" for x in down_spikes['change_pct']]
+            ),
+            row=1, col=1
+        )
+    
+    # Volume bars
+    colors = ['green' if df['volume'].iloc[i] > df['volume'].iloc[i-1] else 'red' 
+              for i in range(1, len(df))]
+    colors = ['gray'] + colors
+    
+    fig.add_trace(
+        go.Bar(
+            x=df['timestamp'],
+            y=df['volume'],
+            name='Volume',
+            marker_color=colors,
+            opacity=0.7,
+            hovertemplate='Date: %{x}<br>Volume: $%{y:,.0f}<extra></extra>'
+        ),
+        row=2, col=1
+    )
+    
+    # Update layout
+    fig.update_xaxes(title_text="Date", row=2, col=1)
+    fig.update_yaxes(title_text="Price (USD)", row=1, col=1)
+    fig.update_yaxes(title_text="Volume (USD)", row=2, col=1)
+    
+    fig.update_layout(
+        height=700,
+        showlegend=True,
+        hovermode='x unified',
+        template='plotly_white'
+    )
+    
+    return fig
+
+# Create volatility chart
+def create_volatility_chart(df):
+    """Create volatility analysis chart"""
+    # Calculate rolling volatility
+    returns = df['price'].pct_change().to_numpy()
+    volatility_7d = rolling_moments(returns, 7)[1] * np.sqrt(7) * 100
+    volatility_14d = rolling_moments(returns, 14)[1] * np.sqrt(14) * 100
+    # Windows count bars, so the label follows the bar size
+    unit = period_label(df.attrs.get('resolution', '1d'))
+    
+    fig = go.Figure()
+    
+    fig.add_trace(
+        go.Scatter(
+            x=df['timestamp'],
+            y=volatility_7d,
+            mode='lines',
+            name=f'7-{unit} Volatility',
+            line=dict(color='blue', width=2),
+            hovertemplate=f'Date: %{{x}}<br>7-{unit} Vol: %{{y:.2f}}%<extra></extra>'
+        )
+    )
+    
+    fig.add_trace(
+        go.Scatter(
+            x=df['timestamp'],
+            y=volatility_14d,
+            mode='lines',
+            name=f'14-{unit} Volatility',
+            line=dict(color='red', width=2),
+            hovertemplate=f'Date: %{{x}}<br>14-{unit} Vol: %{{y:.2f}}%<extra></extra>'
+        )
+    )
+    
+    fig.update_layout(
+        title='Price Volatility Analysis',
+        xaxis_title='Date',
+        yaxis_title='Volatility (%)',
+        height=400,
+        template='plotly_white',
+        hovermode='x unified'
+    )
+    
+    return fig
+
+# Create distribution charts
+def create_distribution_charts(df):
+    """Create price and volume distribution charts"""
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=('Daily Price Changes Distribution', 'Daily Volume Distribution')
+    )
+    
+    # Price changes histogram
+    fig.add_trace(
+        go.Histogram(
+            x=df['price_change_pct'].dropna(),
+            nbinsx=20,
+            name='Price Changes',
+            marker_color='lightblue',
+            showlegend=False
+        ),
+        row=1, col=1
+    )
+    
+    # Volume histogram
+    fig.add_trace(
+        go.Histogram(
+            x=df['volume'] / 1e6,  # Convert to millions
+            nbinsx=20,
+            name='Volume',
+            marker_color='lightgreen',
+            showlegend=False
+        ),
+        row=1, col=2
+    )
+    
+    fig.update_xaxes(title_text="Daily Change (%)", row=1, col=1)
+    fig.update_xaxes(title_text="Volume (Million USD)", row=1, col=2)
+    fig.update_yaxes(title_text="Frequency", row=1, col=1)
+    fig.update_yaxes(title_text="Frequency", row=1, col=2)
+    
+    fig.update_layout(
+        height=400,
+        template='plotly_white'
+    )
+    
+    return fig
+
+# Create correlation heatmap
+def create_matrix_heatmap(corr_data, title='Correlation Matrix', height=400):
+    """Draw a correlation matrix DataFrame as an annotated heatmap"""
+    fig = go.Figure(data=go.Heatmap(
+        z=corr_data,
+        x=corr_data.columns,
+        y=corr_data.columns,
+        colorscale='RdBu',
+        zmid=0,
+        zmin=-1,
+        zmax=1,
+        text=corr_data.round(3),
+        texttemplate='%{text}',
+        textfont={"size": 12},
+        hoverongaps=False
+    ))
+    
+    fig.update_layout(
+        title=title,
+        height=height,
+        template='plotly_white'
+    )
+    
+    return fig
+
+def create_correlation_matrix(df, window=None, tracker=None):
+    """
+    Create correlation matrix heatmap over the whole frame or its last `window` bars
+    
+    A CorrelationTracker kept between calls applies only the rows that
+    changed since its last frame instead of re-summing this one.
+    """
+    if tracker is not None:
+        corr_data = tracker.update(df).frame(window)
+    elif window:
+        corr_data = correlation_matrix(df.iloc[-window:])
+    else:
+        corr_data = correlation_matrix(df)
+    title = f'Correlation Matrix (last {window} bars)' if window else 'Correlation Matrix'
+    return create_matrix_heatmap(corr_data, title)
+
+# Create price chart with Bollinger Bands
+def create_bollinger_chart(df, spikes_df=None, window=20):
+    """Create price chart with Bollinger Bands"""
+    fig = go.Figure()
+    
+    # Price line
+    fig.add_trace(
+        go.Scatter(
+            x=df['timestamp'],
+            y=df['price'],
+            mode='lines',
+            name='Price',
+            line=dict(color='blue', width=2)
+        )
+    )
+    
+    # Bollinger Bands
+    bb_middle, bb_std = rolling_moments(df['price'].to_numpy(), window)
+    
+    fig.add_trace(
+        go.Scatter(
+            x=df['timestamp'],
+            y=bb_middle + (2 * bb_std),
+            mode='lines',
+            name='Upper Band',
+            line=dict(color='gray', width=1, dash='dash')
+        )
+    )
+    
+    fig.add_trace(
+        go.Scatter(
+            x=df['timestamp'],
+            y=bb_middle - (2 * bb_std),
+            mode='lines',
+            name='Lower Band',
+            line=dict(color='gray', width=1, dash='dash'),
+            fill='tonexty',
+            fillcolor='rgba(128, 128, 128, 0.2)'
+        )
+    )
+    
+    fig.update_layout(
+        title='Price with Bollinger Bands',
+        xaxis_title='Date',
+        yaxis_title='Price (USD)',
+        height=500,
+        template='plotly_white',
+        hovermode='x unified'
+    )
+    
+    return fig
+
+# Create price change histogram
+def create_price_change_distribution(df, spikes_df=None):
+    """Create price change distribution histogram"""
+    return px.histogram(
+        df['price_change_pct'].dropna(),
+        nbins=30,
+        title='Daily Price Change Distribution',
+        labels={'value': 'Price Change (%)', 'count': 'Frequency'}
+    )
+
+# Create volume chart
+def create_volume_chart(df, spikes_df=None):
+    """Create color-coded volume chart with moving average"""
+    fig = go.Figure()
+    
+    # Volume bars with color coding
+    colors = ['green' if df['volume'].iloc[i] > df['volume'].iloc[i-1] else 'red' 
+              for i in range(1, len(df))]
+    colors = ['gray'] + colors
+    
+    fig.add_trace(
+        go.Bar(
+            x=df['timestamp'],
+            y=df['volume'],
+            marker_color=colors,
+            name='Volume',
+            hovertemplate='Date: %{x}<br>Volume: $%{y:,.0f}<extra></extra>'
+        )
+    )
+    
+    # Add moving average
+    if 'volume_ma7' in df.columns:
+        fig.add_trace(
+            go.Scatter(
+                x=df['timestamp'],
+                y=df['volume_ma7'],
+                mode='lines',
+                name=f"7-{period_label(df.attrs.get('resolution', '1d'))} MA",
+                line=dict(color='orange', width=2)
+            )
+        )
+    
+    fig.update_layout(
+        title='Trading Volume Analysis',
+        xaxis_title='Date',
+        yaxis_title='Volume (USD)',
+        height=500,
+        template='plotly_white',
+        hovermode='x unified'
+    )
+    
+    return fig
+
+# Create volume vs price scatter
+def create_volume_price_scatter(df, spikes_df=None):
+    """Create volume vs price scatter plot"""
+    return px.scatter(
+        df,
+        x='volume',
+        y='price',
+        color='price_change_pct',
+        color_continuous_scale='RdYlGn',
+        title='Volume vs Price Correlation',
+        labels={'volume': 'Volume (USD)', 'price': 'Price (USD)', 'price_change_pct': 'Price Change %'}
+    )
+
+# Spike marker styles by direction
+SPIKE_STYLES = {
+    'up': {'color': 'green', 'symbol': 'triangle-up'},
+    'down': {'color': 'red', 'symbol': 'triangle-down'}
+}
+
+def build_spike_traces(spikes_df, start=None, end=None, webgl_threshold=None,
+                       mode='markers+text', marker_size=15, showlegend=False):
+    """
+    Build spike marker traces, at most one per (type, direction)
+    
+    Args:
+        spikes_df: Spike events
+        start: Drop spikes before this time
+        end: Drop spikes after this time
+        webgl_threshold: Use Scattergl once this many spikes are drawn
+        mode: Scatter mode for the markers
+        marker_size: Marker size in pixels
+        showlegend: Show one legend entry per trace
+        
+    Returns:
+        List of Plotly traces
+    """
+    spikes = SpikeStore.of(spikes_df)
+    total = spikes.count(start=start, end=end)
+    if total == 0:
+        return []
+    
+    webgl_threshold = config.SPIKE_WEBGL_THRESHOLD if webgl_threshold is None else webgl_threshold
+    scatter = go.Scattergl if total > webgl_threshold else go.Scatter
+    
+    traces = []
+    for spike_type in sorted(SPIKE_TYPES):
+        for direction in sorted(SPIKE_DIRECTIONS):
+            group = spikes.select(spike_type=spike_type, direction=direction, start=start, end=end)
+            if group.empty:
+                continue
+            style = SPIKE_STYLES[direction]
+            traces.append(
+                scatter(
+                    x=group['timestamp'],
+                    y=group['price'],
+                    mode=mode,
+                    marker=dict(
+                        color=[style['color']] * len(group),
+                        symbol=[style['symbol']] * len(group),
+                        size=marker_size
+                    ),
+                    text=[f"{x:.1f}%" for x in group['change_pct'].to_numpy()],
+                    textposition='top center',
+                    name=f"{spike_type.replace('_', ' & ')} spike {direction}",
+                    hovertemplate='Date: %{x}<br>Price: $%{y:.4f}<br>Change: %{text}<extra></extra>',
+                    showlegend=showlegend
+                )
+            )
+    return traces
+
+# Create spike timeline
+def create_spike_timeline(df, spikes_df):
+    """Create spike events timeline over the price line"""
+    fig_timeline = go.Figure()
+    
+    # Add price line as background
+    fig_timeline.add_trace(
+        go.Scatter(
+            x=df['timestamp'],
+            y=df['price'],
+            mode='lines',
+            name='Price',
+            line=dict(color='lightgray', width=1),
+            showlegend=False
+        )
+    )
+    
+    # Add spike markers, clipped to the plotted range
+    fig_timeline.add_traces(
+        build_spike_traces(spikes_df, df['timestamp'].min(), df['timestamp'].max())
+    )
+    
+    fig_timeline.update_layout(
+        title='Spike Events on Price Timeline',
+        xaxis_title='Date',
+        yaxis_title='Price (USD)',
+        height=500,
+        template='plotly_white'
+    )
+    
+    return fig_timeline
+
+SENSITIVITY_METRICS = {
+    'total_spikes': 'Total spike events',
+    'price_spikes': 'Price spikes',
+    'volume_spikes': 'Volume-only spikes',
+    'price_and_volume': 'Price and volume spikes',
+    'price_up': 'Upward price spikes',
+    'price_down': 'Downward price spikes'
+}
+
+def create_sensitivity_heatmap(df, spikes_df=None, metric='total_spikes'):
+    """Spike counts over a grid of candidate price and volume thresholds"""
+    grid = DataProcessor().threshold_sweep(df, config.SWEEP_PRICE_THRESHOLDS, config.SWEEP_VOLUME_THRESHOLDS)
+    table = grid.pivot(index='price_threshold', columns='volume_threshold', values=metric)
+    labels = lambda values: [f"{value:g}%" for value in values]
+    
+    fig = go.Figure(data=go.Heatmap(
+        z=table.to_numpy(),
+        x=labels(table.columns),
+        y=labels(table.index),
+        colorscale='Viridis',
+        text=table.to_numpy(),
+        texttemplate='%{text}',
+        hovertemplate='Price > %{y}<br>Volume > %{x}<br>Count: %{z}<extra></extra>'
+    ))
+    
+    # Mark the configured thresholds when they lie on the grid
+    current_x, current_y = f"{config.VOLUME_SPIKE_THRESHOLD:g}%", f"{config.PRICE_SPIKE_THRESHOLD:g}%"
+    if current_x in fig.data[0].x and current_y in fig.data[0].y:
+        fig.add_trace(go.Scatter(
+            x=[current_x], y=[current_y], mode='markers', name='Current thresholds',
+            marker=dict(symbol='square-open', size=28, color='red', line=dict(width=3))
+        ))
+    
+    fig.update_layout(
+        title=f'Threshold Sensitivity: {SENSITIVITY_METRICS[metric]}',
+        xaxis_title='Volume Threshold',
+        yaxis_title='Price Threshold',
+        height=450,
+        template='plotly_white',
+        showlegend=False
+    )
+    
+    return fig
+
+# Options each chart is rendered with unless a section overrides them
+DEFAULT_CHART_OPTIONS = {
+    'bollinger': {'window': 20},
+    'correlation': {'window': None},
+    'sensitivity': {'metric': 'total_spikes'}
+}
+
+# Chart builders by id; each takes (df, spikes_df, **options)
+CHART_BUILDERS = {
+    'price_volume': create_price_volume_chart,
+    'volatility': lambda df, spikes_df=None: create_volatility_chart(df),
+    'correlation': lambda df, spikes_df=None, window=None: create_correlation_matrix(df, window),
+    'bollinger': create_bollinger_chart,
+    'price_change_distribution': create_price_change_distribution,
+    'volume': create_volume_chart,
+    'volume_price_scatter': create_volume_price_scatter,
+    'spike_timeline': create_spike_timeline,
+    'sensitivity': create_sensitivity_heatmap
+}
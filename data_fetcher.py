@@ -1,49 +1,235 @@
 import requests
+import threading
 import time
-from typing import Dict, Optional
+import tracemalloc
+from typing import Dict, Optional, Tuple, Union
 import config
+from market_series import MarketSeries
+from payload_archive import PayloadArchive, default_archive
+from logs import get_logger
+from metrics import API_LATENCY, API_REQUESTS, STAGE_SECONDS
 
-class DataFetcher:
+logger = get_logger(__name__)
+
+def _span(data: Dict) -> Tuple[Optional[int], Optional[int]]:
+    """First and last price timestamp of a market_chart payload"""
+    prices = data.get('prices') if isinstance(data, dict) else None
+    if not prices:
+        return None, None
+    timestamps = [point[0] for point in prices]
+    return min(timestamps), max(timestamps)
+
+class _MemoryTrace:
+    """
+    Peak-memory measurement of one streamed parse at a time
+    
+    tracemalloc's counters and peak are process-wide, so concurrent parses
+    would reset and stop each other's measurement. A parse starting while
+    another is in flight is not measured, and a measurement that another
+    parse overlapped is discarded.
+    """
+    
     def __init__(self):
+        self._lock = threading.Lock()
+        self._parses = 0
+        self._started = False
+        self._baseline = 0
+        self._overlapped = False
+    
+    def begin(self) -> bool:
+        """Register a parse; True if this parse owns the measurement"""
+        with self._lock:
+            self._parses += 1
+            if self._parses > 1:
+                self._overlapped = True
+                return False
+            self._overlapped = False
+            self._started = not tracemalloc.is_tracing()
+            if self._started:
+                tracemalloc.start()
+            self._baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            return True
+    
+    def end(self, owner: bool) -> Optional[int]:
+        """Unregister a parse; the owner gets its peak in bytes, or None if overlapped"""
+        with self._lock:
+            self._parses -= 1
+            if not owner:
+                return None
+            peak = tracemalloc.get_traced_memory()[1] - self._baseline
+            if self._started:
+                tracemalloc.stop()
+            return None if self._overlapped else peak
+
+_memory_trace = _MemoryTrace()
+
+class DataFetcher:
+    def __init__(self, token_id: str = None, archive: PayloadArchive = None):
+        """
+        Args:
+            token_id: CoinGecko token id (default: config.TOKEN_ID)
+            archive: Archive receiving every raw response (default: default_archive())
+        """
         self.base_url = config.COINGECKO_BASE_URL
-        self.token_id = config.TOKEN_ID
+        self.token_id = token_id or config.TOKEN_ID
         self.headers = config.HEADERS
+        self.archive = archive or default_archive()
+        self.trace_memory = config.STREAM_TRACE_MEMORY
+    
+    def _archive(self, endpoint: str, response: requests.Response, params: Dict,
+                 start_ms: int = None, end_ms: int = None) -> None:
+        """Keep a fully read response body; archive failures never fail the fetch"""
+        if self.archive is None:
+            return
+        try:
+            self.archive.append(self.token_id, endpoint, response.content, params, start_ms, end_ms)
+        except OSError as e:
+            logger.warning(f"⚠️  Could not archive {endpoint} response: {e}")
+    
+    def _get(self, name: str, url: str, session: requests.Session = None, **kwargs) -> requests.Response:
+        """GET a CoinGecko endpoint, recording latency and outcome under `name`"""
+        started = time.perf_counter()
+        try:
+            response = (session or requests).get(url, headers=self.headers, **kwargs)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            status = getattr(e.response, 'status_code', None)
+            API_REQUESTS.inc(endpoint=name, outcome=f'http_{status}' if status else 'error')
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, endpoint=name)
+        API_REQUESTS.inc(endpoint=name, outcome='ok')
+        return response
         
-    def fetch_market_chart(self, days: int = 30) -> Optional[Dict]:
+    def fetch_market_chart(self, days: int = 30, stream: bool = None,
+                           timeout: float = None) -> Optional[Union[Dict, MarketSeries]]:
         """
         Fetch historical market data from CoinGecko
         
         Args:
             days: Number of days to fetch
+            stream: Parse the body incrementally into a MarketSeries
+                (default: config.STREAM_MARKET_CHART)
+            timeout: Request timeout in seconds (default: config.FETCH_TIMEOUT)
             
         Returns:
-            Dict with prices, volumes, and market caps or None if error
+            Dict with prices, volumes, and market caps (MarketSeries when
+            streaming) or None if error
         """
+        stream = config.STREAM_MARKET_CHART if stream is None else stream
         endpoint = f"{self.base_url}/coins/{self.token_id}/market_chart"
         params = {
             'vs_currency': config.VS_CURRENCY,
-            'days': days,
-            'interval': 'daily'
+            'days': days
         }
+        if config.MARKET_CHART_INTERVAL:
+            params['interval'] = config.MARKET_CHART_INTERVAL
         
-        print(f"Fetching {days}-day market data for {self.token_id.upper()}...")
+        logger.info(f"Fetching {days}-day market data for {self.token_id.upper()}...")
         
         try:
-            response = requests.get(endpoint, params=params, headers=self.headers)
-            response.raise_for_status()
+            response = self._get('market_chart', endpoint, params=params, stream=stream,
+                                 timeout=timeout or config.FETCH_TIMEOUT)
+            
+            if stream:
+                return self._stream_series(response, params)
+            
+            with STAGE_SECONDS.time(stage='parse'):
+                data = response.json()
+            self._archive('market_chart', response, params, *_span(data))
+            logger.info(f"✓ Successfully fetched {len(data.get('prices', []))} data points",
+                        extra={'points': len(data.get('prices', []))})
+            return data
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"✗ Error fetching market data: {e}")
+            return None
+        except ValueError as e:
+            logger.error(f"✗ Error parsing market data: {e}")
+            return None
+    
+    def _stream_series(self, response: requests.Response, params: Dict = None) -> Optional[MarketSeries]:
+        """
+        Parse a streamed market_chart response and report its peak memory
+        
+        The body is compressed into the archive as it is parsed, so it is
+        still read only once.
+        
+        Args:
+            response: Response opened with stream=True
+            params: Request parameters, recorded with the archived body
+            
+        Returns:
+            MarketSeries, or None if the body held no prices
+        """
+        tracing = self.trace_memory and _memory_trace.begin()
+        
+        chunks = response.iter_content(chunk_size=config.STREAM_CHUNK_BYTES)
+        recording = self.archive.recording(self.token_id, 'market_chart', params) if self.archive else None
+        if recording:
+            chunks = recording.tee(chunks)
+        try:
+            with response, STAGE_SECONDS.time(stage='parse'):
+                series = MarketSeries.from_stream(chunks, int(response.headers.get('Content-Length') or 0))
+        finally:
+            peak = _memory_trace.end(tracing) if self.trace_memory else None
+        
+        if not len(series):
+            logger.error("✗ Market data response held no prices")
+            return None
+        if recording:
+            try:
+                recording.commit(series.timestamps.min(), series.timestamps.max())
+            except OSError as e:
+                logger.warning(f"⚠️  Could not archive market_chart response: {e}")
+        memory = f", peak {peak / 1e6:.1f} MB" if peak is not None else ""
+        logger.info(f"✓ Successfully fetched {len(series)} data points "
+                    f"(streamed into {series.nbytes / 1e6:.1f} MB{memory})",
+                    extra={'points': len(series), 'series_bytes': series.nbytes, 'peak_bytes': peak})
+        return series
+    
+    def fetch_market_chart_range(self, start: int, end: int, session: requests.Session = None,
+                                 timeout: float = None) -> Optional[Dict]:
+        """
+        Fetch market data between two UNIX timestamps from CoinGecko
+        
+        Granularity follows the range length (5-minute up to 1 day, hourly
+        up to 90 days, daily beyond), so long histories are fetched in chunks.
+        
+        Args:
+            start: Range start in seconds since the epoch
+            end: Range end in seconds since the epoch
+            session: Optional session reused across requests
+            timeout: Request timeout in seconds
             
+        Returns:
+            Dict with prices, volumes, and market caps or None if error
+        """
+        endpoint = f"{self.base_url}/coins/{self.token_id}/market_chart/range"
+        params = {
+            'vs_currency': config.VS_CURRENCY,
+            'from': int(start),
+            'to': int(end)
+        }
+        
+        try:
+            response = self._get('market_chart_range', endpoint, session, params=params, timeout=timeout)
             data = response.json()
-            print(f"✓ Successfully fetched {len(data.get('prices', []))} data points")
+            self._archive('market_chart_range', response, params, *_span(data))
             return data
             
         except requests.exceptions.RequestException as e:
-            print(f"✗ Error fetching market data: {e}")
+            logger.error(f"✗ Error fetching market data range: {e}")
             return None
     
-    def fetch_current_data(self) -> Optional[Dict]:
+    def fetch_current_data(self, timeout: float = None) -> Optional[Dict]:
         """
         Fetch current token information
         
+        Args:
+            timeout: Request timeout in seconds (default: config.CURRENT_DATA_TIMEOUT)
+        
         Returns:
             Dict with current token data or None if error
         """
@@ -56,17 +242,19 @@ class DataFetcher:
             'developer_data': 'false'
         }
         
-        print(f"Fetching current data for {self.token_id.upper()}...")
+        logger.info(f"Fetching current data for {self.token_id.upper()}...")
         
         try:
-            response = requests.get(endpoint, params=params, headers=self.headers)
-            response.raise_for_status()
+            response = self._get('coin', endpoint, params=params,
+                                 timeout=timeout or config.CURRENT_DATA_TIMEOUT)
+            data = response.json()
+            self._archive('coin', response, params)
             
-            print("✓ Successfully fetched current market data")
-            return response.json()
+            logger.info("✓ Successfully fetched current market data")
+            return data
             
         except requests.exceptions.RequestException as e:
-            print(f"✗ Error fetching current data: {e}")
+            logger.error(f"✗ Error fetching current data: {e}")
             return None
     
     def test_connection(self) -> bool:
@@ -79,11 +267,10 @@ class DataFetcher:
         endpoint = f"{self.base_url}/ping"
         
         try:
-            response = requests.get(endpoint, headers=self.headers)
-            response.raise_for_status()
-            print("✓ CoinGecko API connection successful")
+            self._get('ping', endpoint)
+            logger.info("✓ CoinGecko API connection successful")
             return True
             
         except requests.exceptions.RequestException as e:
-            print(f"✗ CoinGecko API connection failed: {e}")
+            logger.error(f"✗ CoinGecko API connection failed: {e}")
             return False
\ No newline at end of file
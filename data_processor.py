@@ -1,13 +1,109 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+import copy
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import config
+from market_series import MarketSeries, day_dates, day_keys
+from rollup import LEVEL_LABELS, LEVEL_MS, infer_resolution
+from correlation import CorrelationTracker, correlation_summary
+from spike_store import SpikeStore, spike_frame
+from kernels import bar_changes, spike_flags
+from logs import get_logger
+from metrics import CACHE_REQUESTS, ROWS_PROCESSED, SPIKES_DETECTED
+
+logger = get_logger(__name__)
+
+# Bars in the price_ma7/volume_ma7 moving averages
+MA_WINDOW = 7
+# Earlier bars a range needs for its first derived values to match the full
+# level's: the moving average reads six, the per-bar change one
+WARMUP_BARS = MA_WINDOW - 1
+
+def dataset_version(df: pd.DataFrame, columns: List[str] = None) -> str:
+    """
+    Content hash of a frame's values
+    
+    Computed from the column arrays on every call rather than kept in
+    df.attrs: pandas carries attrs over to copies and to frames with
+    changed columns, so a stored hash would outlive the data it described.
+    
+    Args:
+        df: Market data DataFrame
+        columns: Columns to hash (default: all of them)
+        
+    Returns:
+        Hex digest of the columns' values and names and the bar resolution
+    """
+    columns = [name for name in (columns or df.columns) if name in df.columns]
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((list(map(str, columns)), df.attrs.get('resolution'), len(df))).encode())
+    for name in columns:
+        values = df[name].to_numpy()
+        if values.dtype.kind in 'biufmM':
+            digest.update(np.ascontiguousarray(values).view('uint8'))
+        else:
+            digest.update(pd.util.hash_pandas_object(df[name], index=False).to_numpy().view('uint8'))
+    return digest.hexdigest()
+
+def aggregate_series(values: np.ndarray) -> Dict:
+    """
+    Moments and extrema of a series from one sweep per reduction
+    
+    Sums are taken around the first value so the variance does not lose
+    precision to cancellation. NaNs are dropped, matching pandas.
+    
+    Args:
+        values: Numeric array
+        
+    Returns:
+        Dict with count, sum, mean, std, min, max, argmax, median, first and last
+    """
+    values = np.asarray(values, dtype='float64')
+    positions = None
+    shift = values[0] if len(values) else 0.0
+    centered = values - shift
+    total = centered.sum()
+    if np.isnan(total):
+        positions = np.flatnonzero(~np.isnan(values))
+        values = values[positions]
+        shift = values[0] if len(values) else 0.0
+        centered = values - shift
+        total = centered.sum()
+    
+    count = len(values)
+    if count == 0:
+        nan = float('nan')
+        return {'count': 0, 'sum': 0.0, 'mean': nan, 'std': nan, 'min': nan, 'max': nan,
+                'argmax': 0, 'median': nan, 'first': nan, 'last': nan}
+    
+    sumsq = np.dot(centered, centered)
+    mean_offset = total / count
+    variance = (sumsq - total * mean_offset) / (count - 1) if count > 1 else float('nan')
+    argmax = int(centered.argmax())
+    
+    return {
+        'count': count,
+        'sum': total + shift * count,
+        'mean': shift + mean_offset,
+        'std': float(np.sqrt(max(variance, 0.0))) if count > 1 else float('nan'),
+        'min': float(values.min()),
+        'max': float(values[argmax]),
+        'argmax': int(positions[argmax]) if positions is not None else argmax,
+        'median': float(np.median(values)),
+        'first': float(values[0]),
+        'last': float(values[-1])
+    }
 
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, correlations: CorrelationTracker = None):
         self.price_threshold = config.PRICE_SPIKE_THRESHOLD
         self.volume_threshold = config.VOLUME_SPIKE_THRESHOLD
+        # Running correlation moments carried between runs (daemon); None sums each frame afresh
+        self.correlations = correlations
+        self._stats_cache = OrderedDict()
     
     def process_market_data(self, raw_data: Dict) -> pd.DataFrame:
         """
@@ -22,158 +118,341 @@ class DataProcessor:
         if not raw_data:
             return pd.DataFrame()
         
-        # Extract price data
-        prices = raw_data.get('prices', [])
-        df = pd.DataFrame(prices, columns=['timestamp', 'price'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        
-        # Add volume data
-        volumes = raw_data.get('total_volumes', [])
-        if volumes:
-            volume_df = pd.DataFrame(volumes, columns=['timestamp', 'volume'])
-            volume_df['timestamp'] = pd.to_datetime(volume_df['timestamp'], unit='ms')
-            df = df.merge(volume_df, on='timestamp', how='left')
-        
-        # Add market cap data
-        market_caps = raw_data.get('market_caps', [])
-        if market_caps:
-            mcap_df = pd.DataFrame(market_caps, columns=['timestamp', 'market_cap'])
-            mcap_df['timestamp'] = pd.to_datetime(mcap_df['timestamp'], unit='ms')
-            df = df.merge(mcap_df, on='timestamp', how='left')
-        
-        # Calculate daily changes
-        df['price_change'] = df['price'].diff()
-        df['price_change_pct'] = df['price'].pct_change() * 100
-        df['volume_change_pct'] = df['volume'].pct_change() * 100
-        
-        # Add date column
-        df['date'] = df['timestamp'].dt.date
-        
-        # Add moving averages
-        df['price_ma7'] = df['price'].rolling(window=7, min_periods=1).mean()
-        df['volume_ma7'] = df['volume'].rolling(window=7, min_periods=1).mean()
-        
-        print(f"✓ Processed {len(df)} days of market data")
+        # Columns arrive aligned on the price timestamps, so no merge is needed
+        series = MarketSeries.from_market_chart(raw_data)
+        df = series.to_frame()
+        
+        df = self._add_derived_columns(df)
+        df.attrs['resolution'] = infer_resolution(df['timestamp'])
+        
+        ROWS_PROCESSED.inc(len(df), stage='market')
+        logger.info(f"✓ Processed {len(df)} rows of market data", extra={'rows': len(df)})
         return df
     
-    def identify_spikes(self, df: pd.DataFrame) -> pd.DataFrame:
+    def process_rollup(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convert one level of a RollupPyramid to the processed layout
+        
+        Args:
+            bars: OHLCV bars from RollupPyramid.level
+            
+        Returns:
+            Processed DataFrame with price taken from each bar's close
+        """
+        if bars.empty:
+            return pd.DataFrame()
+        
+        df = pd.DataFrame({
+            'timestamp': bars['timestamp'],
+            'price': bars['close'],
+            'volume': bars['volume'],
+            'market_cap': bars['market_cap'],
+            'open': bars['open'],
+            'high': bars['high'],
+            'low': bars['low']
+        })
+        df = self._add_derived_columns(df)
+        df.attrs['resolution'] = bars.attrs.get('resolution') or infer_resolution(df['timestamp'])
+        
+        ROWS_PROCESSED.inc(len(df), stage='rollup')
+        logger.info(f"✓ Processed {len(df)} {LEVEL_LABELS.get(df.attrs['resolution'], '').lower()} bars of market data",
+                    extra={'rows': len(df), 'resolution': df.attrs['resolution']})
+        return df
+    
+    def process_level_range(self, pyramid, resolution: str, start=None, end=None) -> pd.DataFrame:
+        """
+        Process only the bars of one pyramid level inside [start, end]
+
+        Reads the partitions covering the range plus WARMUP_BARS earlier
+        bars, so the derived columns equal those of the processed level.
+
+        Args:
+            pyramid: RollupPyramid to read
+            resolution: Level name
+            start: Range start (inclusive)
+            end: Range end (inclusive)
+
+        Returns:
+            Processed DataFrame of the range
+        """
+        bars = pyramid.level(resolution, start, end, warmup=WARMUP_BARS)
+        df = self.process_rollup(bars)
+        if bars.attrs['warmup'] and not df.empty:
+            df = df.iloc[bars.attrs['warmup']:].reset_index(drop=True)
+        return df
+    
+    def _add_derived_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add per-bar changes, day key, date and moving average columns"""
+        # Per-bar changes and moving averages come out of one kernel pass
+        columns = bar_changes(df['price'].to_numpy(), df['volume'].to_numpy(), window=MA_WINDOW)
+        df['price_change'] = columns['price_change']
+        df['price_change_pct'] = columns['price_change_pct']
+        df['volume_change_pct'] = columns['volume_change_pct']
+        
+        # Add the exchange-day key once; grouping, spike merging and range
+        # filters all use it, and the datetime64 date is derived from it
+        ts_ms = df['timestamp'].to_numpy().astype('datetime64[ms]').astype('int64')
+        df['day_key'] = day_keys(ts_ms)
+        df['date'] = day_dates(df['day_key'].to_numpy())
+        
+        df['price_ma7'] = columns['price_ma']
+        df['volume_ma7'] = columns['volume_ma']
+        
+        return df
+    
+    def identify_spikes(self, df: pd.DataFrame) -> SpikeStore:
         """
         Identify significant price and volume spikes
         
+        A volume spike on a day that also has price spikes marks those as
+        price_and_volume instead of being reported on its own.
+        
         Args:
             df: Processed market data
             
         Returns:
-            DataFrame with spike events
-        """
-        spikes = []
-        
-        # Price spikes
-        price_spikes = df[abs(df['price_change_pct']) > self.price_threshold].copy()
-        
-        for _, row in price_spikes.iterrows():
-            spikes.append({
-                'timestamp': row['timestamp'],
-                'date': row['date'],
-                'type': 'price',
-                'metric': 'price',
-                'direction': 'up' if row['price_change_pct'] > 0 else 'down',
-                'change_pct': row['price_change_pct'],
-                'absolute_change': row['price_change'],
-                'value': row['price'],
-                'volume': row['volume']
-            })
-        
-        # Volume spikes
-        volume_spikes = df[df['volume_change_pct'] > self.volume_threshold].copy()
-        
-        for _, row in volume_spikes.iterrows():
-            # Check if we already have a price spike for this date
-            existing = any(s['date'] == row['date'] for s in spikes)
-            
-            if existing:
-                # Update existing spike
-                for s in spikes:
-                    if s['date'] == row['date']:
-                        s['type'] = 'price_and_volume'
-                        s['volume_change_pct'] = row['volume_change_pct']
-            else:
-                spikes.append({
-                    'timestamp': row['timestamp'],
-                    'date': row['date'],
-                    'type': 'volume',
-                    'metric': 'volume',
-                    'direction': 'up',
-                    'change_pct': row['volume_change_pct'],
-                    'absolute_change': row['volume'] - df['volume'].shift(1).loc[row.name],
-                    'value': row['volume'],
-                    'price': row['price']
-                })
-        
-        spike_df = pd.DataFrame(spikes)
-        if not spike_df.empty:
-            spike_df = spike_df.sort_values('timestamp')
-            print(f"✓ Identified {len(spike_df)} spike events")
-            print(f"  - Price spikes: {len(spike_df[spike_df['metric'] == 'price'])}")
-            print(f"  - Volume spikes: {len(spike_df[spike_df['metric'] == 'volume'])}")
+            SpikeStore of the spike events
+        """
+        price = df['price'].to_numpy(dtype='float64')
+        volume = df['volume'].to_numpy(dtype='float64')
+        price_change_pct = df['price_change_pct'].to_numpy(dtype='float64')
+        volume_change_pct = df['volume_change_pct'].to_numpy(dtype='float64')
+        day_column = 'day_key' if 'day_key' in df.columns else 'date'
+        days = df[day_column].to_numpy()
+        price_rows, volume_rows = (np.flatnonzero(flags) for flags in spike_flags(
+            price_change_pct, volume_change_pct, self.price_threshold, self.volume_threshold))
+        
+        # Volume spikes merge into the price spikes of the same day; the
+        # day's last volume spike supplies their volume change
+        merged = np.isin(days[volume_rows], days[price_rows])
+        merging = volume_rows[merged]
+        last_merge = dict(zip(days[merging], volume_change_pct[merging]))
+        price_days = days[price_rows]
+        price_volume_pct = np.array([last_merge.get(day, np.nan) for day in price_days], dtype='float64')
+        standalone = volume_rows[~merged]
+        
+        previous_volume = np.concatenate([[np.nan], volume[:-1]])
+        rows = np.concatenate([price_rows, standalone])
+        n_price = len(price_rows)
+        events = {
+            'timestamp': df['timestamp'].to_numpy()[rows],
+            'date': df['date'].to_numpy()[rows],
+            'type': np.where(np.concatenate([~np.isnan(price_volume_pct), np.zeros(len(standalone), bool)]),
+                             'price_and_volume', np.repeat(['price', 'volume'], [n_price, len(standalone)])),
+            'metric': np.repeat(['price', 'volume'], [n_price, len(standalone)]),
+            'direction': np.concatenate([np.where(price_change_pct[price_rows] > 0, 'up', 'down'),
+                                         np.full(len(standalone), 'up')]),
+            'change_pct': np.concatenate([price_change_pct[price_rows], volume_change_pct[standalone]]),
+            'absolute_change': np.concatenate([df['price_change'].to_numpy(dtype='float64')[price_rows],
+                                               volume[standalone] - previous_volume[standalone]]),
+            'value': np.concatenate([price[price_rows], volume[standalone]]),
+            'price': price[rows],
+            'volume': volume[rows],
+            'volume_change_pct': np.concatenate([price_volume_pct, volume_change_pct[standalone]])
+        }
+        
+        store = SpikeStore(spike_frame(events))
+        if not store.empty:
+            for spike_type, count in store.counts('type').items():
+                if count:
+                    SPIKES_DETECTED.inc(count, type=spike_type)
+            logger.info(f"✓ Identified {len(store)} spike events", extra={'spikes': len(store)})
+            logger.info(f"  - Price spikes: {store.count(metric='price')}")
+            logger.info(f"  - Volume spikes: {store.count(metric='volume')}")
         else:
-            print("✓ No significant spikes detected with current thresholds")
+            logger.info("✓ No significant spikes detected with current thresholds", extra={'spikes': 0})
         
-        return spike_df
+        return store
     
-    def calculate_statistics(self, df: pd.DataFrame, current_data: Dict = None) -> Dict:
+    def threshold_sweep(self, df: pd.DataFrame, price_thresholds, volume_thresholds) -> pd.DataFrame:
+        """
+        Spike counts identify_spikes would report for every threshold pair
+        
+        Each candidate threshold only moves a cut point through the sorted
+        changes, so the one-dimensional counts come from searchsorted. The
+        overlap counts depend on both thresholds: a price spike merges when
+        its day's largest volume change clears the volume threshold, and a
+        volume spike stands alone when its day's largest absolute price
+        change stays under the price threshold. Both are dominance counts,
+        answered for the whole grid by a 2D histogram of threshold bins and
+        a reversed cumulative sum.
+        
+        Args:
+            df: Processed market data
+            price_thresholds: Candidate price spike thresholds (percent)
+            volume_thresholds: Candidate volume spike thresholds (percent)
+            
+        Returns:
+            DataFrame with one row per (price_threshold, volume_threshold) pair
+        """
+        price_thresholds = np.unique(np.asarray(price_thresholds, dtype='float64'))
+        volume_thresholds = np.unique(np.asarray(volume_thresholds, dtype='float64'))
+        n_price, n_volume = len(price_thresholds), len(volume_thresholds)
+        
+        # NaN changes (first row) never exceed a threshold
+        price_change = df['price_change_pct'].to_numpy(dtype='float64')
+        volume_change = np.nan_to_num(df['volume_change_pct'].to_numpy(dtype='float64'), nan=-np.inf)
+        abs_change = np.nan_to_num(np.abs(price_change), nan=-np.inf)
+        
+        def exceeding(values, thresholds):
+            ordered = np.sort(values)
+            return len(ordered) - np.searchsorted(ordered, thresholds, side='right')
+        
+        price_spikes = exceeding(abs_change, price_thresholds)
+        price_up = exceeding(np.where(price_change > 0, abs_change, -np.inf), price_thresholds)
+        volume_events = exceeding(volume_change, volume_thresholds)
+        
+        day_column = 'day_key' if 'day_key' in df.columns else 'date'
+        days = df[day_column]
+        day_max_volume = pd.Series(volume_change, index=df.index).groupby(days).transform('max').to_numpy()
+        day_max_price = pd.Series(abs_change, index=df.index).groupby(days).transform('max').to_numpy()
+        
+        def dominance(x, x_thresholds, y, y_thresholds):
+            # Bin b counts thresholds strictly below the value, so a row
+            # exceeds threshold i exactly when i < b
+            bins_x = np.searchsorted(x_thresholds, x, side='left')
+            bins_y = np.searchsorted(y_thresholds, y, side='left')
+            hist = np.zeros((len(x_thresholds) + 1, len(y_thresholds) + 1), dtype='int64')
+            np.add.at(hist, (bins_x, bins_y), 1)
+            counts = hist[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+            return counts[1:, 1:]
+        
+        # Price spikes whose day also has a volume spike
+        overlap = dominance(abs_change, price_thresholds, day_max_volume, volume_thresholds)
+        # Volume spikes on days that already have a price spike are merged away
+        merged_volume = dominance(day_max_price, price_thresholds, volume_change, volume_thresholds)
+        standalone_volume = volume_events[np.newaxis, :] - merged_volume
+        
+        grid_price = np.repeat(price_thresholds, n_volume)
+        grid = pd.DataFrame({
+            'price_threshold': grid_price,
+            'volume_threshold': np.tile(volume_thresholds, n_price),
+            'price_spikes': np.repeat(price_spikes, n_volume),
+            'price_up': np.repeat(price_up, n_volume),
+            'price_down': np.repeat(price_spikes - price_up, n_volume),
+            'volume_spikes': standalone_volume.ravel(),
+            'volume_events': np.tile(volume_events, n_price),
+            'price_and_volume': overlap.ravel()
+        })
+        grid['total_spikes'] = grid['price_spikes'] + grid['volume_spikes']
+        return grid
+    
+    def calculate_statistics(self, df: pd.DataFrame, current_data: Dict = None, version: str = None) -> Dict:
         """
         Calculate comprehensive statistics
         
+        Results are memoized, so repeated requests for the same window skip
+        the aggregation entirely. With a version the key is that version
+        plus the frame's bounds and resolution, which costs nothing to
+        compute; without one it is a hash of the frame's contents, so a
+        modified copy never picks up stale results.
+        
         Args:
             df: Market data DataFrame
             current_data: Current token data from API
+            version: Version of the data df was cut from, computed once
+                upstream (e.g. the build graph key of the processed frame)
             
         Returns:
             Dictionary with calculated statistics
         """
-        stats = {
+        if version is not None:
+            bounds = (df['timestamp'].iloc[0], df['timestamp'].iloc[-1]) if len(df) else (None, None)
+            key = (version, *bounds, len(df), df.attrs.get('resolution'))
+        else:
+            # Only the columns the statistics read, so unrelated columns cost nothing to hash
+            key = dataset_version(df, ['timestamp', 'date', 'price', 'volume'] + list(config.CORRELATION_COLUMNS))
+        cached = self._stats_cache.get(key)
+        CACHE_REQUESTS.inc(cache='statistics', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            self._stats_cache.move_to_end(key)
+            stats = copy.deepcopy(cached)
+        else:
+            stats = self.build_statistics(df, aggregate_series(df['price'].to_numpy()),
+                                           aggregate_series(df['volume'].to_numpy()))
+            if self.correlations is not None:
+                stats['correlation'] = self.correlations.update(df).summary()
+            else:
+                stats['correlation'] = correlation_summary(df)
+            self._stats_cache[key] = copy.deepcopy(stats)
+            if len(self._stats_cache) > config.STATS_CACHE_SIZE:
+                self._stats_cache.popitem(last=False)
+        
+        # Add current market data if available
+        current_market = self.current_market(current_data)
+        if current_market is not None:
+            stats['current_market'] = current_market
+        
+        logger.info("✓ Calculated comprehensive statistics")
+        return stats
+    
+    @staticmethod
+    def current_market(current_data: Dict = None) -> Optional[Dict]:
+        """
+        Market snapshot fields from a /coins/{id} payload
+        
+        Args:
+            current_data: Current token data from API
+            
+        Returns:
+            Dictionary of USD market figures and changes, or None without market data
+        """
+        if not current_data or 'market_data' not in current_data:
+            return None
+        md = current_data['market_data']
+        return {
+            'market_cap': md.get('market_cap', {}).get('usd', 0),
+            'fully_diluted_valuation': md.get('fully_diluted_valuation', {}).get('usd', 0),
+            'circulating_supply': md.get('circulating_supply', 0),
+            'total_supply': md.get('total_supply', 0),
+            'max_supply': md.get('max_supply', 0),
+            '24h_change': md.get('price_change_percentage_24h', 0),
+            '7d_change': md.get('price_change_percentage_7d', 0),
+            '14d_change': md.get('price_change_percentage_14d', 0),
+            '30d_change': md.get('price_change_percentage_30d', 0),
+            '1y_change': md.get('price_change_percentage_1y', 0)
+        }
+    
+    def build_statistics(self, df: pd.DataFrame, price: Dict, volume: Dict) -> Dict:
+        """
+        Assemble the statistics layout from precomputed aggregates
+        
+        Args:
+            df: Market data DataFrame the aggregates were computed over
+            price: aggregate_series result for the price column
+            volume: aggregate_series result for the volume column
+            
+        Returns:
+            Dictionary with period, price and volume statistics
+        """
+        start, end = pd.Timestamp(df['date'].iloc[0]), pd.Timestamp(df['date'].iloc[-1])
+        stats_resolution = df.attrs.get('resolution', '1d')
+        return {
             'period': {
-                'start_date': df['timestamp'].min().strftime('%Y-%m-%d'),
-                'end_date': df['timestamp'].max().strftime('%Y-%m-%d'),
-                'days': len(df)
+                'start_date': start.strftime('%Y-%m-%d'),
+                'end_date': end.strftime('%Y-%m-%d'),
+                'days': (end - start).days + 1,
+                'rows': len(df),
+                'resolution': stats_resolution
             },
             'price': {
-                'current': df['price'].iloc[-1],
-                'high': df['price'].max(),
-                'low': df['price'].min(),
-                'average': df['price'].mean(),
-                'median': df['price'].median(),
-                'std_dev': df['price'].std(),
-                'volatility': (df['price'].std() / df['price'].mean() * 100),
-                'change_30d': ((df['price'].iloc[-1] - df['price'].iloc[0]) / df['price'].iloc[0] * 100),
-                'change_30d_usd': (df['price'].iloc[-1] - df['price'].iloc[0])
+                'current': price['last'],
+                'high': price['max'],
+                'low': price['min'],
+                'average': price['mean'],
+                'median': price['median'],
+                'std_dev': price['std'],
+                'volatility': price['std'] / price['mean'] * 100,
+                'change_30d': (price['last'] - price['first']) / price['first'] * 100,
+                'change_30d_usd': price['last'] - price['first']
             },
             'volume': {
-                'total_30d': df['volume'].sum(),
-                'average_daily': df['volume'].mean(),
-                'median_daily': df['volume'].median(),
-                'highest': df['volume'].max(),
-                'lowest': df['volume'].min(),
-                'highest_date': df.loc[df['volume'].idxmax(), 'date'].strftime('%Y-%m-%d')
+                # Volumes are rolling 24h figures, so scale the sum by bar width
+                'total_30d': volume['sum'] * LEVEL_MS.get(stats_resolution, LEVEL_MS['1d']) / LEVEL_MS['1d'],
+                'average_daily': volume['mean'],
+                'median_daily': volume['median'],
+                'highest': volume['max'],
+                'lowest': volume['min'],
+                'highest_date': pd.Timestamp(df['date'].iloc[volume['argmax']]).strftime('%Y-%m-%d')
             }
-        }
-        
-        # Add current market data if available
-        if current_data and 'market_data' in current_data:
-            md = current_data['market_data']
-            stats['current_market'] = {
-                'market_cap': md.get('market_cap', {}).get('usd', 0),
-                'fully_diluted_valuation': md.get('fully_diluted_valuation', {}).get('usd', 0),
-                'circulating_supply': md.get('circulating_supply', 0),
-                'total_supply': md.get('total_supply', 0),
-                'max_supply': md.get('max_supply', 0),
-                '24h_change': md.get('price_change_percentage_24h', 0),
-                '7d_change': md.get('price_change_percentage_7d', 0),
-                '14d_change': md.get('price_change_percentage_14d', 0),
-                '30d_change': md.get('price_change_percentage_30d', 0),
-                '1y_change': md.get('price_change_percentage_1y', 0)
-            }
-        
-        print("✓ Calculated comprehensive statistics")
-        return stats
\ No newline at end of file
+        }
\ No newline at end of file
@@ -0,0 +1,502 @@
+# data_service.py - Local HTTP service holding the latest dataset for dashboard clients
+
+import glob
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import pandas as pd
+import requests
+import config
+from data_processor import DataProcessor
+from market_series import day_dates
+from shared_frame import attach_frame
+from rollup import RollupPyramid
+from spike_store import SpikeStore, spike_frame
+from snapshot import ARROW_AVAILABLE, freeze_frame
+from logs import get_logger
+from metrics import CACHE_REQUESTS, DATA_SERVICE_REQUESTS
+
+if ARROW_AVAILABLE:
+    import pyarrow as pa
+
+logger = get_logger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+JSON_TYPE = 'application/json'
+# Loads of a dataset before serving one whose files changed during the load
+LOAD_ATTEMPTS = 3
+TOKEN_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]*$')
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def resolve_dir(path: str) -> str:
+    """A relative output directory, found from the working directory or else from the repo root"""
+    if os.path.isabs(path) or os.path.isdir(path):
+        return path
+    return os.path.join(ROOT, path)
+
+
+def dataset_files(token_id: str = None, data_dir: str = None, reports_dir: str = None) -> List[str]:
+    """Backend output files a token's dashboard dataset is read from"""
+    prefix = (token_id or config.TOKEN_ID).lower()
+    data_dir = resolve_dir(data_dir or config.DATA_DIR)
+    reports_dir = resolve_dir(reports_dir or config.REPORTS_DIR)
+    return ([os.path.join(data_dir, f'{prefix}_market_data.csv'),
+             os.path.join(data_dir, f'{prefix}_spikes.csv'),
+             os.path.join(reports_dir, f'{prefix}_analysis.json')] +
+            [os.path.join(data_dir, f'{prefix}_rollup_{level}.csv') for level in config.ROLLUP_LEVELS] +
+            sorted(glob.glob(os.path.join(data_dir, f'{prefix}_rollup_*', '*.csv'))) +
+            [os.path.join(data_dir, f'{prefix}_market_data.mmap')])
+
+
+def files_version(paths: List[str]) -> str:
+    """Fingerprint of files' sizes and modification times"""
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return digest.hexdigest()
+
+
+def load_dataset(token_id: str = None, data_dir: str = None, reports_dir: str = None) -> Optional[Dict]:
+    """
+    Read a token's backend outputs into frozen frames
+
+    Args:
+        token_id: Token (default: config.TOKEN_ID)
+        data_dir: Directory with the CSV data (default: config.DATA_DIR)
+        reports_dir: Directory with the JSON report (default: config.REPORTS_DIR)
+
+    Returns:
+        Dict with 'market', 'spikes', 'rollups' and 'report' ({} when the
+        report is missing), or None without market data
+    """
+    token_id = token_id or config.TOKEN_ID
+    files = dataset_files(token_id, data_dir, reports_dir)
+    market_path, spikes_path, report_path, shared_path = files[0], files[1], files[2], files[-1]
+    if not os.path.exists(market_path):
+        return None
+
+    if (config.SHARED_FRAME and os.path.exists(shared_path)
+            and os.path.getmtime(shared_path) >= os.path.getmtime(market_path)):
+        # Map the published frame: every process reading it shares one copy, read-only already
+        market = attach_frame(shared_path)
+    else:
+        market = pd.read_csv(market_path)
+        market['timestamp'] = pd.to_datetime(market['timestamp'])
+        # The date follows from the integer day key; only older files parse it from text
+        market['date'] = (day_dates(market['day_key'].to_numpy()) if 'day_key' in market.columns
+                          else pd.to_datetime(market['date']))
+        market = freeze_frame(market)
+    # Spikes go into the indexed store once; every view slices it
+    spikes = pd.read_csv(spikes_path) if os.path.exists(spikes_path) else None
+    report = {}
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            report = json.load(f)
+    return {
+        'market': market,
+        'spikes': SpikeStore(freeze_frame(spike_frame(spikes))),
+        'rollups': RollupPyramid.load(resolve_dir(data_dir or config.DATA_DIR), token_id),
+        'report': report
+    }
+
+
+def encode_frame(df: pd.DataFrame, fmt: str = 'arrow') -> Tuple[bytes, str]:
+    """
+    Serialize a frame as an Arrow IPC stream, or as JSON without pyarrow
+
+    Returns:
+        (body, content type)
+    """
+    if fmt == 'arrow' and ARROW_AVAILABLE:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # attrs (e.g. the bar resolution) travel in the schema metadata
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'kaito.attrs'] = json.dumps(df.attrs, default=str).encode()
+        table = table.replace_schema_metadata(metadata)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW_TYPE
+    payload = {'attrs': df.attrs, 'columns': list(df.columns),
+               'datetime': [name for name in df.columns if pd.api.types.is_datetime64_any_dtype(df[name])],
+               'data': json.loads(df.to_json(orient='values', date_format='iso', date_unit='ms'))}
+    return json.dumps(payload, default=str).encode(), JSON_TYPE
+
+
+def decode_frame(body: bytes, content_type: str) -> pd.DataFrame:
+    """Inverse of encode_frame"""
+    if content_type.startswith(ARROW_TYPE):
+        table = pa.ipc.open_stream(body).read_all()
+        df = table.to_pandas()
+        attrs = (table.schema.metadata or {}).get(b'kaito.attrs')
+        if attrs:
+            df.attrs.update(json.loads(attrs))
+        return df
+    payload = json.loads(body)
+    df = pd.DataFrame(payload['data'], columns=payload['columns'])
+    for name in payload['datetime']:
+        df[name] = pd.to_datetime(df[name]).dt.tz_localize(None)
+    df.attrs.update(payload['attrs'])
+    return df
+
+
+def _timestamp(value) -> Optional[pd.Timestamp]:
+    return pd.Timestamp(value) if value else None
+
+
+class Dataset:
+    """One token's loaded outputs plus the processed bars of each level, built once"""
+
+    def __init__(self, token_id: str, data_dir: str = None, reports_dir: str = None):
+        self.token_id = token_id
+        # The version is taken on both sides of the load; a pipeline run
+        # writing in between would otherwise tag new files' version on old data
+        for attempt in range(LOAD_ATTEMPTS):
+            self.paths = dataset_files(token_id, data_dir, reports_dir)
+            version = files_version(self.paths)
+            self.data = load_dataset(token_id, data_dir, reports_dir)
+            self.paths = dataset_files(token_id, data_dir, reports_dir)
+            self.version = files_version(self.paths)
+            if self.version == version:
+                break
+            logger.warning(f"⚠️ {token_id} files changed while loading, reloading", extra={'token': token_id})
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    def level_frame(self, resolution: str = None) -> pd.DataFrame:
+        """Processed bars of a pyramid level, or the last run's frame without one"""
+        pyramid = self.data['rollups']
+        if not resolution or not pyramid.span():
+            return self.data['market']
+        with self._lock:
+            if resolution not in self._levels:
+                self._levels[resolution] = freeze_frame(DataProcessor().process_rollup(pyramid.level(resolution)))
+            return self._levels[resolution]
+
+    def bars(self, resolution: str = None, start=None, end=None) -> pd.DataFrame:
+        pyramid = self.data['rollups']
+        if start is None and end is None:
+            return self.level_frame(resolution)
+        if resolution and pyramid.span():
+            # Only the partitions covering the range are read and processed
+            with self._lock:
+                return DataProcessor().process_level_range(pyramid, resolution, start, end)
+        df = self.level_frame(resolution)
+        if df.empty:
+            return df
+        timestamps = df['timestamp'].to_numpy()
+        lo = 0 if start is None else np.searchsorted(timestamps, np.datetime64(start), side='left')
+        hi = len(df) if end is None else np.searchsorted(timestamps, np.datetime64(end), side='right')
+        return df.iloc[lo:hi]
+
+    def meta(self) -> Dict:
+        pyramid = self.data['rollups']
+        span = pyramid.span()
+        return {
+            'token': self.token_id,
+            'version': self.version,
+            'span': [span[0].isoformat(), span[1].isoformat()] if span else None,
+            'levels': pyramid.levels,
+            'rows': {level: pyramid.row_count(level) for level in pyramid.levels},
+            'market_rows': len(self.data['market']),
+            'spikes': len(self.data['spikes'])
+        }
+
+
+class DataService:
+    """
+    Serve the latest dataset of each token over HTTP from one process
+
+    Datasets are loaded on first request and reloaded when the backend
+    files change (checked at most every config.DATA_SERVICE_POLL_SECONDS),
+    so every dashboard replica shares one parse and one copy in memory.
+
+    Routes (GET):
+        /health
+        /v1/<token>/meta                                   JSON
+        /v1/<token>/report                                 JSON
+        /v1/<token>/select?start=&end=                     JSON, level for a range
+        /v1/<token>/bars?resolution=&start=&end=&format=   frame
+        /v1/<token>/spikes?start=&end=&format=             frame
+
+    Frames are Arrow IPC streams, or JSON with format=json or without
+    pyarrow. Every response carries an ETag derived from the dataset
+    version and the query; a matching If-None-Match gets a 304 before
+    anything is sliced or serialized. Serialized bodies are kept in an LRU
+    of config.DATA_SERVICE_CACHE_ENTRIES entries.
+    """
+
+    def __init__(self, host: str = None, port: int = None, data_dir: str = None, reports_dir: str = None):
+        self.host = host or config.DATA_SERVICE_HOST
+        self.port = config.DATA_SERVICE_PORT if port is None else port
+        self.data_dir = data_dir
+        self.reports_dir = reports_dir
+        self.datasets = {}
+        self._checked = {}
+        self._locks = {}
+        self._bodies = OrderedDict()
+        self.server = None
+
+    async def dataset(self, token_id: str) -> Optional[Dataset]:
+        """A token's dataset, reloaded off the event loop when its files changed"""
+        lock = self._locks.setdefault(token_id, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            current = self.datasets.get(token_id)
+            if current is not None and now - self._checked.get(token_id, 0) < config.DATA_SERVICE_POLL_SECONDS:
+                return current
+            self._checked[token_id] = now
+            paths = dataset_files(token_id, self.data_dir, self.reports_dir)
+            if current is None or files_version(paths) != current.version:
+                dataset = await asyncio.to_thread(Dataset, token_id, self.data_dir, self.reports_dir)
+                if dataset.data is None:
+                    return None
+                logger.info(f"✓ Loaded {token_id.upper()} dataset {dataset.version} "
+                            f"({len(dataset.data['market'])} rows, {len(dataset.data['spikes'])} spikes)")
+                self.datasets[token_id] = current = dataset
+            return current
+
+    def _render(self, dataset: Dataset, route: str, query: Dict) -> Tuple[bytes, str]:
+        """Response body of a route; runs in a worker thread"""
+        if route == 'meta':
+            return json.dumps(dataset.meta()).encode(), JSON_TYPE
+        if route == 'report':
+            return json.dumps(dataset.data['report'], default=str).encode(), JSON_TYPE
+        start, end = _timestamp(query.get('start')), _timestamp(query.get('end'))
+        if route == 'select':
+            pyramid = dataset.data['rollups']
+            level = pyramid.select_level(start, end) if pyramid.span() else None
+            return json.dumps({'resolution': level}).encode(), JSON_TYPE
+        fmt = query.get('format', 'arrow')
+        if route == 'bars':
+            resolution = query.get('resolution')
+            if resolution and resolution not in dataset.data['rollups'].levels:
+                raise ValueError(f"unknown resolution {resolution!r}")
+            return encode_frame(dataset.bars(resolution, start, end), fmt)
+        return encode_frame(dataset.data['spikes'].select(start=start, end=end), fmt)
+
+    async def respond(self, method: str, target: str, headers: Dict) -> Tuple[int, Dict, bytes]:
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        if parts == ['health']:
+            body = json.dumps({'status': 'ok', 'datasets': {token: dataset.version
+                                                            for token, dataset in self.datasets.items()}})
+            return 200, {'Content-Type': JSON_TYPE}, body.encode()
+        if len(parts) != 3 or parts[0] != 'v1' or parts[2] not in ('meta', 'report', 'select', 'bars', 'spikes'):
+            return 404, {}, b''
+        token_id, route = parts[1].lower(), parts[2]
+        if not TOKEN_PATTERN.match(token_id):
+            return 404, {}, b''
+        dataset = await self.dataset(token_id)
+        if dataset is None:
+            return 404, {'Content-Type': JSON_TYPE}, b'{"error": "no dataset for this token"}'
+
+        key = (token_id, dataset.version, route, tuple(sorted(query.items())))
+        etag = '"' + hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest() + '"'
+        response_headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+            return 304, response_headers, b''
+        cached = self._bodies.get(key)
+        CACHE_REQUESTS.inc(cache='data_service', result='miss' if cached is None else 'hit')
+        if cached is None:
+            try:
+                cached = await asyncio.to_thread(self._render, dataset, route, query)
+            except ValueError as e:
+                return 400, {'Content-Type': JSON_TYPE}, json.dumps({'error': str(e)}).encode()
+            self._bodies[key] = cached
+            if len(self._bodies) > config.DATA_SERVICE_CACHE_ENTRIES:
+                self._bodies.popitem(last=False)
+        else:
+            self._bodies.move_to_end(key)
+        body, content_type = cached
+        response_headers['Content-Type'] = content_type
+        return 200, response_headers, body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """One connection; keep-alive requests are answered in order"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    status, response_headers, body = await self.respond(method, target, headers)
+                except Exception as e:
+                    logger.exception(f"❌ Data service error on {target}: {e}")
+                    status, response_headers, body = 500, {}, b''
+                DATA_SERVICE_REQUESTS.inc(route=urlsplit(target).path.rsplit('/', 1)[-1], status=status)
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                response_headers.update({'Content-Length': str(len(body)),
+                                         'Connection': 'keep-alive' if keep_alive else 'close'})
+                head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n" + ''.join(
+                    f"{name}: {value}\r\n" for name, value in response_headers.items()) + "\r\n"
+                writer.write(head.encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> 'DataService':
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    @property
+    def address(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        logger.info(f"📡 Serving dashboard data at {self.address} "
+                    f"({'Arrow IPC' if ARROW_AVAILABLE else 'JSON'} frames)")
+        async with self.server:
+            await self.server.serve_forever()
+
+
+class DataServiceClient:
+    """
+    Conditional-GET client for a DataService
+
+    Decoded responses are kept with their ETags, so re-reading unchanged
+    data costs one 304 round trip and no parsing. Safe to share between
+    threads: each thread has its own HTTP session, and the lock covers only
+    the cache, so one session's slow request never queues the others.
+    """
+
+    def __init__(self, base_url: str = None, token_id: str = None, timeout: float = None):
+        self.base_url = (base_url or config.DATA_SERVICE_URL).rstrip('/')
+        self.token_id = (token_id or config.TOKEN_ID).lower()
+        self.timeout = timeout or config.DATA_SERVICE_TIMEOUT
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """This thread's HTTP session; requests.Session is not thread-safe"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _get(self, route: str, **query):
+        query = {key: (value.isoformat() if isinstance(value, pd.Timestamp) else value)
+                 for key, value in query.items() if value is not None}
+        if route in ('bars', 'spikes') and not ARROW_AVAILABLE:
+            query['format'] = 'json'
+        key = (route, tuple(sorted(query.items())))
+        with self._lock:
+            cached = self._cache.get(key)
+        response = self.session.get(f'{self.base_url}/v1/{self.token_id}/{route}', params=query,
+                                    headers={'If-None-Match': cached[0]} if cached else {},
+                                    timeout=self.timeout)
+        if response.status_code == 304 and cached:
+            CACHE_REQUESTS.inc(cache='data_client', result='hit')
+            with self._lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+            return cached[1]
+        CACHE_REQUESTS.inc(cache='data_client', result='miss')
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', JSON_TYPE)
+        value = (response.json() if content_type.startswith(JSON_TYPE) and route not in ('bars', 'spikes')
+                 else decode_frame(response.content, content_type))
+        with self._lock:
+            self._cache[key] = (response.headers.get('ETag'), value)
+            if len(self._cache) > config.DATA_SERVICE_CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        return value
+
+    def meta(self) -> Dict:
+        return self._get('meta')
+
+    def report(self) -> Dict:
+        return self._get('report')
+
+    def select_level(self, start=None, end=None) -> Optional[str]:
+        return self._get('select', start=start, end=end)['resolution']
+
+    def bars(self, resolution: str = None, start=None, end=None) -> pd.DataFrame:
+        return self._get('bars', resolution=resolution, start=start, end=end)
+
+    def spikes(self, start=None, end=None) -> pd.DataFrame:
+        return self._get('spikes', start=start, end=end)
+
+
+class RemotePyramid:
+    """The parts of RollupPyramid the dashboard uses, answered by a DataService"""
+
+    nbytes = 0
+
+    def __init__(self, client: DataServiceClient, meta: Dict):
+        self.client = client
+        self.levels = meta['levels']
+        self._span = tuple(pd.Timestamp(value) for value in meta['span']) if meta['span'] else None
+
+    def span(self) -> Optional[tuple]:
+        return self._span
+
+    def select_level(self, start=None, end=None, max_rows: int = None) -> str:
+        return self.client.select_level(start, end)
+
+
+def remote_dataset(client: DataServiceClient) -> Optional[Dict]:
+    """
+    The dashboard dataset, read from a DataService instead of files
+
+    Returns:
+        Dict shaped like load_dataset's, plus the client, or None when the
+        service has no data for the token
+    """
+    try:
+        meta = client.meta()
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return None
+        raise
+    return {
+        'market': freeze_frame(client.bars()),
+        'spikes': SpikeStore(freeze_frame(spike_frame(client.spikes()))),
+        'rollups': RemotePyramid(client, meta),
+        'report': client.report(),
+        'client': client
+    }
+
+
+def run_data_service(host: str = None, port: int = None) -> None:
+    """Serve until interrupted"""
+    service = DataService(host, port)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("\n🛑 Data service stopped")
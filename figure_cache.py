@@ -0,0 +1,152 @@
+# figure_cache.py - LRU cache of rendered dashboard figures
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Tuple
+import numpy as np
+import config
+from metrics import CACHE_REQUESTS
+
+
+def _freeze(options: Dict) -> Tuple:
+    """Hashable, order-independent form of a chart options dict"""
+    return tuple(sorted((key, _freeze(value) if isinstance(value, dict) else value)
+                        for key, value in (options or {}).items()))
+
+
+def _value_size(value: Any) -> int:
+    """Bytes of a trace property: array buffers exactly, other sequences at one word per item"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_value_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return 8 * len(value)
+    return 0
+
+
+def estimate_figure_size(fig: Any) -> int:
+    """
+    Approximate memory held by a figure
+
+    Sized from the data arrays of its traces, which hold nearly all of
+    it, so caching a figure never serializes it.
+
+    Args:
+        fig: Plotly figure
+
+    Returns:
+        Bytes of the traces' data arrays
+    """
+    # _props holds only the properties that were set, without copying them
+    return sum(_value_size(getattr(trace, '_props', None) or {}) for trace in getattr(fig, 'data', ()))
+
+
+class FigureCache:
+    """
+    Figures keyed on (dataset version, date range, chart id, options)
+
+    Entries are evicted least-recently-used first once either the entry
+    count or the estimated byte total exceeds its cap. The cache is shared
+    across dashboard sessions, so access is serialized with a lock.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None):
+        self.max_entries = max_entries or config.FIGURE_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or config.FIGURE_CACHE_MAX_MB * 1024 * 1024
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(chart_id: str, version: Hashable, date_range: Hashable, options: Dict = None) -> Tuple:
+        return (version, date_range, chart_id, _freeze(options))
+
+    def get(self, key: Tuple) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache='figures', result='miss')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache='figures', result='hit')
+            return entry[0]
+
+    def put(self, key: Tuple, fig: Any) -> None:
+        size = estimate_figure_size(fig)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._entries[key] = (fig, size)
+            self.total_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     self.total_bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_build(self, chart_id: str, version: Hashable, date_range: Hashable,
+                     options: Dict, builder: Callable[[], Any]) -> Any:
+        """
+        Return a cached figure, building and storing it on a miss
+
+        Args:
+            chart_id: Chart identifier
+            version: Dataset version the figure was built from
+            date_range: Range (and resolution) the figure covers
+            options: Chart options that change the rendered output
+            builder: Zero-argument callable producing the figure
+
+        Returns:
+            Plotly figure
+        """
+        key = self.make_key(chart_id, version, date_range, options)
+        fig = self.get(key)
+        if fig is None:
+            fig = builder()
+            self.put(key, fig)
+        return fig
+
+    def prewarm(self, specs: Iterable[Tuple[str, Hashable, Hashable, Dict, Callable[[], Any]]]) -> int:
+        """
+        Build figures ahead of the first request for them
+
+        Args:
+            specs: (chart_id, version, date_range, options, builder) tuples
+
+        Returns:
+            Number of figures built
+        """
+        built = 0
+        for chart_id, version, date_range, options, builder in specs:
+            key = self.make_key(chart_id, version, date_range, options)
+            with self._lock:
+                present = key in self._entries
+            if not present:
+                self.put(key, builder())
+                built += 1
+        return built
+
+    def invalidate(self, version: Hashable = None) -> None:
+        """Drop every entry, or only those built from one dataset version"""
+        with self._lock:
+            for key in [k for k in self._entries if version is None or k[0] == version]:
+                self.total_bytes -= self._entries.pop(key)[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
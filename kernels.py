@@ -0,0 +1,399 @@
+# kernels.py - Fused numeric kernels for the per-bar columns, spike flags and rolling bands
+
+import math
+import time
+from typing import Dict, Tuple
+import numpy as np
+import config
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _jit(function):
+    """Compile a loop kernel with numba when it is installed; the plain function otherwise"""
+    return numba.njit(cache=True, nogil=True, error_model='numpy')(function) if NUMBA_AVAILABLE else function
+
+
+# Loop kernels: one pass over the bars, written for numba's nopython mode.
+# Window statistics are recomputed from the window's own values rather than
+# updated by adding and removing terms, so they do not drift; windows are a
+# handful of bars, so that costs little.
+
+@_jit
+def _bar_changes_loop(price, volume, window):
+    n = len(price)
+    price_change = np.empty(n)
+    price_change_pct = np.empty(n)
+    volume_change_pct = np.empty(n)
+    price_ma = np.empty(n)
+    volume_ma = np.empty(n)
+    for i in range(n):
+        if i == 0:
+            price_change[i] = np.nan
+            price_change_pct[i] = np.nan
+            volume_change_pct[i] = np.nan
+        else:
+            price_change[i] = price[i] - price[i - 1]
+            price_change_pct[i] = (price[i] / price[i - 1] - 1.0) * 100.0
+            volume_change_pct[i] = (volume[i] / volume[i - 1] - 1.0) * 100.0
+        price_total = 0.0
+        price_count = 0
+        volume_total = 0.0
+        volume_count = 0
+        for j in range(max(0, i - window + 1), i + 1):
+            if not math.isnan(price[j]):
+                price_total += price[j]
+                price_count += 1
+            if not math.isnan(volume[j]):
+                volume_total += volume[j]
+                volume_count += 1
+        price_ma[i] = price_total / price_count if price_count else np.nan
+        volume_ma[i] = volume_total / volume_count if volume_count else np.nan
+    return price_change, price_change_pct, volume_change_pct, price_ma, volume_ma
+
+
+@_jit
+def _spike_flags_loop(price_change_pct, volume_change_pct, price_threshold, volume_threshold):
+    n = len(price_change_pct)
+    price_flags = np.zeros(n, dtype=np.bool_)
+    volume_flags = np.zeros(n, dtype=np.bool_)
+    for i in range(n):
+        # NaN compares False, so the first bar never flags
+        price_flags[i] = abs(price_change_pct[i]) > price_threshold
+        volume_flags[i] = volume_change_pct[i] > volume_threshold
+    return price_flags, volume_flags
+
+
+@_jit
+def _rolling_moments_loop(values, window, min_periods):
+    n = len(values)
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    for i in range(n):
+        start = max(0, i - window + 1)
+        total = 0.0
+        count = 0
+        for j in range(start, i + 1):
+            if not math.isnan(values[j]):
+                total += values[j]
+                count += 1
+        if count < min_periods or count == 0:
+            continue
+        mean[i] = total / count
+        if count > 1:
+            squares = 0.0
+            for j in range(start, i + 1):
+                if not math.isnan(values[j]):
+                    squares += (values[j] - mean[i]) ** 2
+            std[i] = math.sqrt(squares / (count - 1))
+    return mean, std
+
+
+@_jit
+def _bar_features_loop(price, volume, window, band_window, min_periods, price_threshold, volume_threshold):
+    # Everything the three kernels above compute, reading each bar once
+    n = len(price)
+    price_change = np.full(n, np.nan)
+    price_change_pct = np.full(n, np.nan)
+    volume_change_pct = np.full(n, np.nan)
+    price_ma = np.empty(n)
+    volume_ma = np.empty(n)
+    price_flags = np.zeros(n, dtype=np.bool_)
+    volume_flags = np.zeros(n, dtype=np.bool_)
+    band_mean = np.full(n, np.nan)
+    band_std = np.full(n, np.nan)
+    for i in range(n):
+        if i > 0:
+            price_change[i] = price[i] - price[i - 1]
+            price_change_pct[i] = (price[i] / price[i - 1] - 1.0) * 100.0
+            volume_change_pct[i] = (volume[i] / volume[i - 1] - 1.0) * 100.0
+            price_flags[i] = abs(price_change_pct[i]) > price_threshold
+            volume_flags[i] = volume_change_pct[i] > volume_threshold
+        price_total = 0.0
+        price_count = 0
+        volume_total = 0.0
+        volume_count = 0
+        for j in range(max(0, i - window + 1), i + 1):
+            if not math.isnan(price[j]):
+                price_total += price[j]
+                price_count += 1
+            if not math.isnan(volume[j]):
+                volume_total += volume[j]
+                volume_count += 1
+        price_ma[i] = price_total / price_count if price_count else np.nan
+        volume_ma[i] = volume_total / volume_count if volume_count else np.nan
+        start = max(0, i - band_window + 1)
+        total = 0.0
+        count = 0
+        for j in range(start, i + 1):
+            if not math.isnan(price[j]):
+                total += price[j]
+                count += 1
+        if count < min_periods or count == 0:
+            continue
+        band_mean[i] = total / count
+        if count > 1:
+            squares = 0.0
+            for j in range(start, i + 1):
+                if not math.isnan(price[j]):
+                    squares += (price[j] - band_mean[i]) ** 2
+            band_std[i] = math.sqrt(squares / (count - 1))
+    return (price_change, price_change_pct, volume_change_pct, price_ma, volume_ma,
+            price_flags, volume_flags, band_mean, band_std)
+
+
+# NumPy kernels: the same results from whole-array operations, used when
+# numba is not installed
+
+def _pct_change(values: np.ndarray) -> np.ndarray:
+    result = np.empty(len(values))
+    result[:1] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(values[1:], values[:-1], out=result[1:])
+    result[1:] -= 1.0
+    result[1:] *= 100.0
+    return result
+
+
+def _window_sums(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum and count of the non-NaN values in the trailing window ending at each bar"""
+    n = len(values)
+    lags = range(1, min(window, n))
+    valid = ~np.isnan(values)
+    if valid.all():
+        total = values.copy()
+        # One shifted add per lag keeps every temporary n long
+        for lag in lags:
+            total[lag:] += values[:-lag]
+        return total, np.minimum(np.arange(1, n + 1), window)
+    filled = np.where(valid, values, 0.0)
+    total = filled.copy()
+    count = valid.astype('int64')
+    for lag in lags:
+        total[lag:] += filled[:-lag]
+        count[lag:] += valid[:-lag]
+    return total, count
+
+
+def _rolling_mean_numpy(values: np.ndarray, window: int, min_periods: int) -> Tuple[np.ndarray, np.ndarray]:
+    total, count = _window_sums(values, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+    mean[(count < min_periods) | (count == 0)] = np.nan
+    return mean, count
+
+
+def _bar_changes_numpy(price, volume, window):
+    price_change = np.empty(len(price))
+    price_change[:1] = np.nan
+    np.subtract(price[1:], price[:-1], out=price_change[1:])
+    return (price_change, _pct_change(price), _pct_change(volume),
+            _rolling_mean_numpy(price, window, 1)[0], _rolling_mean_numpy(volume, window, 1)[0])
+
+
+def _spike_flags_numpy(price_change_pct, volume_change_pct, price_threshold, volume_threshold):
+    with np.errstate(invalid='ignore'):
+        return np.abs(price_change_pct) > price_threshold, volume_change_pct > volume_threshold
+
+
+def _rolling_moments_numpy(values, window, min_periods):
+    mean, count = _rolling_mean_numpy(values, window, min_periods)
+    n = len(values)
+    squares = np.zeros(n)
+    deviation = np.empty(n)
+    has_nan = np.isnan(values).any()
+    for lag in range(min(window, n)):
+        np.subtract(values[:n - lag], mean[lag:], out=deviation[lag:])
+        np.multiply(deviation[lag:], deviation[lag:], out=deviation[lag:])
+        if has_nan:
+            deviation[lag:][np.isnan(deviation[lag:])] = 0.0
+        squares[lag:] += deviation[lag:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(squares / (count - 1))
+    std[np.isnan(mean) | (count < 2)] = np.nan
+    return mean, std
+
+
+def _bar_features_numpy(price, volume, window, band_window, min_periods, price_threshold, volume_threshold):
+    # Whole-array passes cannot share a loop; the fusion here is that the
+    # flags reuse the change arrays and nothing is converted twice
+    columns = _bar_changes_numpy(price, volume, window)
+    flags = _spike_flags_numpy(columns[1], columns[2], price_threshold, volume_threshold)
+    return columns + flags + _rolling_moments_numpy(price, band_window, min_periods)
+
+
+BACKENDS = {
+    'numba': (_bar_changes_loop, _spike_flags_loop, _rolling_moments_loop, _bar_features_loop),
+    'numpy': (_bar_changes_numpy, _spike_flags_numpy, _rolling_moments_numpy, _bar_features_numpy)
+}
+
+
+def backend() -> str:
+    """Kernel set in use: config.KERNEL_BACKEND, or 'numba' when installed and 'numpy' otherwise"""
+    if config.KERNEL_BACKEND != 'auto':
+        return config.KERNEL_BACKEND
+    return 'numba' if NUMBA_AVAILABLE else 'numpy'
+
+
+def _float_array(values) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype='float64')
+
+
+def bar_changes(price, volume, window: int = 7, kernels: str = None) -> Dict[str, np.ndarray]:
+    """
+    Per-bar changes and trailing means of price and volume in one pass
+
+    Matches pandas' diff(), pct_change() * 100 and
+    rolling(window, min_periods=1).mean().
+
+    Args:
+        price: Price per bar
+        volume: Volume per bar
+        window: Moving average length in bars
+        kernels: 'numba' or 'numpy' (default: backend())
+
+    Returns:
+        Dict of price_change, price_change_pct, volume_change_pct,
+        price_ma and volume_ma arrays
+    """
+    columns = BACKENDS[kernels or backend()][0](_float_array(price), _float_array(volume), int(window))
+    return dict(zip(('price_change', 'price_change_pct', 'volume_change_pct', 'price_ma', 'volume_ma'), columns))
+
+
+def spike_flags(price_change_pct, volume_change_pct, price_threshold: float, volume_threshold: float,
+                kernels: str = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bars whose move crosses the spike thresholds
+
+    Args:
+        price_change_pct: Per-bar price change in percent
+        volume_change_pct: Per-bar volume change in percent
+        price_threshold: Absolute price move that counts as a spike
+        volume_threshold: Volume increase that counts as a spike
+        kernels: 'numba' or 'numpy' (default: backend())
+
+    Returns:
+        (price spike, volume spike) boolean arrays
+    """
+    return BACKENDS[kernels or backend()][1](_float_array(price_change_pct), _float_array(volume_change_pct),
+                                             float(price_threshold), float(volume_threshold))
+
+
+def rolling_moments(values, window: int, min_periods: int = None,
+                    kernels: str = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trailing mean and sample standard deviation in one pass
+
+    Matches pandas' rolling(window, min_periods).mean() and .std(): NaNs are
+    skipped, and a bar with fewer than min_periods values is NaN.
+
+    Args:
+        values: Series values
+        window: Window length in bars
+        min_periods: Values needed for a result (default: window)
+        kernels: 'numba' or 'numpy' (default: backend())
+
+    Returns:
+        (mean, std) arrays
+    """
+    min_periods = window if min_periods is None else min_periods
+    return BACKENDS[kernels or backend()][2](_float_array(values), int(window), int(min_periods))
+
+
+def bar_features(price, volume, price_threshold: float, volume_threshold: float, window: int = 7,
+                 band_window: int = 20, min_periods: int = None, kernels: str = None) -> Dict[str, np.ndarray]:
+    """
+    bar_changes, spike_flags and rolling_moments of price in one pass
+
+    The pipeline still calls the three separately: it needs them at
+    different stages (processing, spike detection with the run's
+    thresholds, the dashboard's band), and benchmark() shows the separate
+    calls are no slower on the numpy backend.
+
+    Args:
+        price: Price per bar
+        volume: Volume per bar
+        price_threshold: Absolute price move that counts as a spike
+        volume_threshold: Volume increase that counts as a spike
+        window: Moving average length in bars
+        band_window: Window of the price mean and standard deviation
+        min_periods: Values needed for a band value (default: band_window)
+        kernels: 'numba' or 'numpy' (default: backend())
+
+    Returns:
+        Dict of the bar_changes arrays plus price_spike, volume_spike,
+        band_mean and band_std
+    """
+    min_periods = band_window if min_periods is None else min_periods
+    columns = BACKENDS[kernels or backend()][3](_float_array(price), _float_array(volume), int(window),
+                                                int(band_window), int(min_periods), float(price_threshold),
+                                                float(volume_threshold))
+    names = ('price_change', 'price_change_pct', 'volume_change_pct', 'price_ma', 'volume_ma',
+             'price_spike', 'volume_spike', 'band_mean', 'band_std')
+    return dict(zip(names, columns))
+
+
+def benchmark(n: int = 100_000, repeat: int = 5) -> Dict[str, float]:
+    """
+    Best-of-repeat milliseconds for the pandas calls and each kernel set
+
+    Each kernel set is timed as three separate calls and as the fused
+    bar_features pass ('<name> fused').
+
+    Returns:
+        Dict of name -> milliseconds for the derived columns, spike flags
+        and Bollinger band of n bars
+    """
+    import pandas as pd
+    rng = np.random.default_rng(1)
+    price = 1.5 * np.exp(np.cumsum(rng.normal(0, 0.03, n)))
+    volume = 1e8 * np.exp(np.cumsum(rng.normal(0, 0.2, n)))
+
+    def with_pandas():
+        df = pd.DataFrame({'price': price, 'volume': volume})
+        df['price_change'] = df['price'].diff()
+        df['price_change_pct'] = df['price'].pct_change() * 100
+        df['volume_change_pct'] = df['volume'].pct_change() * 100
+        df['price_ma7'] = df['price'].rolling(window=7, min_periods=1).mean()
+        df['volume_ma7'] = df['volume'].rolling(window=7, min_periods=1).mean()
+        flags = (df['price_change_pct'].abs() > 5, df['volume_change_pct'] > 50)
+        band = (df['price'].rolling(window=20).mean(), df['price'].rolling(window=20).std())
+        return flags, band
+
+    def with_kernels(name):
+        columns = bar_changes(price, volume, 7, kernels=name)
+        flags = spike_flags(columns['price_change_pct'], columns['volume_change_pct'], 5, 50, kernels=name)
+        return flags, rolling_moments(price, 20, kernels=name)
+
+    def with_fused_kernel(name):
+        return bar_features(price, volume, 5, 50, 7, 20, kernels=name)
+
+    def best(function, *args):
+        # The first call compiles the numba kernels
+        function(*args)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function(*args)
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000
+
+    timings = {'pandas': best(with_pandas)}
+    for name in BACKENDS:
+        # Without numba the loop kernels are plain Python; only correctness matters then
+        if name == 'numba' and not NUMBA_AVAILABLE:
+            continue
+        timings[name] = best(with_kernels, name)
+        timings[f'{name} fused'] = best(with_fused_kernel, name)
+    return timings
+
+
+if __name__ == "__main__":
+    # Agreement with pandas is checked by test_kernels.py
+    print(f"Kernel backend: {backend()} (numba {'installed' if NUMBA_AVAILABLE else 'not installed'})")
+    for name, ms in benchmark().items():
+        print(f"  {name:<12} {ms:8.2f} ms per 100k bars")
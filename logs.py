@@ -0,0 +1,74 @@
+# logs.py - Leveled console logging for the pipeline, as plain text or JSON lines
+
+import json
+import logging
+import sys
+from datetime import datetime
+import config
+
+ROOT_LOGGER = 'kaito'
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_FIELDS = set(logging.LogRecord('', 0, '', 0, '', None, None).__dict__) | {'message', 'asctime', 'taskName'}
+
+
+class StdoutHandler(logging.StreamHandler):
+    """
+    Write to whatever sys.stdout is when a record is emitted
+
+    A plain StreamHandler keeps the stream it was created with, which
+    would bypass contextlib.redirect_stdout (used for batch job logs).
+    """
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; fields passed via `extra` are included"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage().strip()
+        }
+        entry.update({key: value for key, value in record.__dict__.items() if key not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(level: str = None, fmt: str = None) -> logging.Logger:
+    """
+    Install the console handler on the pipeline's root logger
+
+    Args:
+        level: Minimum level name, e.g. 'INFO' or 'WARNING' (default: config.LOG_LEVEL)
+        fmt: 'text' for the bare messages or 'json' for JSON lines (default: config.LOG_FORMAT)
+
+    Returns:
+        The root pipeline logger
+    """
+    logger = logging.getLogger(ROOT_LOGGER)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = StdoutHandler()
+    handler.setFormatter(JsonFormatter() if (fmt or config.LOG_FORMAT) == 'json' else logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel((level or config.LOG_LEVEL).upper())
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for one module, configured with the defaults on first use"""
+    if not logging.getLogger(ROOT_LOGGER).handlers:
+        configure()
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
@@ -1,16 +1,38 @@
+import os
 import sys
+import math
+import shutil
 import argparse
 import getpass
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, TimeoutError as FuturesTimeout
 from datetime import datetime
+from typing import Dict, Optional, Tuple
+import pandas as pd
 import config
 from data_fetcher import DataFetcher
 from data_processor import DataProcessor
-from visualizer import Visualizer
+from visualizer import Visualizer, benchmark_render as benchmark_tiers
 from report_generator import ReportGenerator
+from rollup import RollupPyramid, LEVEL_LABELS
+from correlation import CorrelationTracker, basket_frame, correlation_summary
+from spike_store import SpikeStore
+from build_graph import BuildGraph, fingerprint
+from payload_archive import PayloadArchive
+from data_service import run_data_service
+import batch
+from backfill import run_backfill
+from alerts import AlertEngine
+import chart_exporter
+import logs
+from logs import get_logger
+from metrics import REGISTRY, RUNS, STAGE_SECONDS, MetricsServer
 
 # Import authentication configuration
 from auth_config import ADMIN_PASSWORD
 
+logger = get_logger('main')
+
 def print_header():
     """Print application header"""
     print("\n" + "=" * 60)
@@ -40,7 +62,10 @@ def authenticate():
     print("\n🛑 Authentication failed. Access denied.")
     return False
 
-def main(days: int = None, price_threshold: float = None, volume_threshold: float = None):
+def main(days: int = None, price_threshold: float = None, volume_threshold: float = None,
+         resolution: str = None, alerts: bool = None, render_tier: str = None,
+         chart_format: str = None, benchmark_render: bool = False, export_charts: bool = False,
+         rebuild: bool = False):
     """
     Main execution function
     
@@ -48,6 +73,13 @@ def main(days: int = None, price_threshold: float = None, volume_threshold: floa
         days: Number of days to analyze
         price_threshold: Price spike threshold percentage
         volume_threshold: Volume spike threshold percentage
+        resolution: Rollup level to analyze ('5m', '1h', '1d', '1w' or 'auto')
+        alerts: Raise alerts on new spikes (default: config.ALERTS_ENABLED)
+        render_tier: Chart render tier from config.RENDER_TIERS
+        chart_format: Chart file format overriding the tier's own
+        benchmark_render: Time every render tier on this run's data
+        export_charts: Export the dashboard's charts as standalone HTML/JSON
+        rebuild: Regenerate every chart and report even when its inputs are unchanged
     """
     # Authenticate user before proceeding
     if not authenticate():
@@ -56,71 +88,554 @@ def main(days: int = None, price_threshold: float = None, volume_threshold: floa
     days = days or config.DEFAULT_DAYS
     price_threshold = price_threshold or config.PRICE_SPIKE_THRESHOLD
     volume_threshold = volume_threshold or config.VOLUME_SPIKE_THRESHOLD
+    resolution = resolution or config.DEFAULT_RESOLUTION
+    alerts = config.ALERTS_ENABLED if alerts is None else alerts
     
     print_header()
     
     # Step 1: Initialize components
-    print("🔧 Initializing components...")
+    logger.info("🔧 Initializing components...")
     fetcher = DataFetcher()
-    processor = DataProcessor()
+    
+    # Steps 2-8: Fetch, process, analyze and write outputs
+    result = fetch_and_analyze(fetcher, days, price_threshold, volume_threshold, resolution,
+                               render_tier=render_tier, chart_format=chart_format, export_charts=export_charts,
+                               force=rebuild)
+    if result is None:
+        dump_metrics()
+        return 1
+    df, spikes_df, stats = result
+    
+    if benchmark_render:
+        logger.info("\n⏱️  Benchmarking chart render tiers...")
+        timings = benchmark_tiers(df, spikes_df, stats, os.path.join(config.VISUALIZATIONS_DIR, 'benchmark'))
+        print(timings.to_string(index=False, float_format='{:.1f}'.format))
+    
+    if alerts:
+        logger.info("\n🚨 Evaluating alert rules...")
+        with STAGE_SECONDS.time(stage='alerts'):
+            raise_alerts(spikes_df)
+    dump_metrics()
+    
+    # Step 9: Display summary
+    ReportGenerator().generate_summary(stats, spikes_df)
+    
+    print("✅ Analysis complete!\n")
+    print("📁 Output files:")
+    print(f"   • Data: {config.DATA_DIR}/")
+    print(f"   • Reports: {config.REPORTS_DIR}/")
+    print(f"   • Charts: {config.VISUALIZATIONS_DIR}/")
+    if export_charts:
+        print(f"   • Interactive charts: {config.CHART_EXPORT_DIR}/")
+    print("\n" + "=" * 60 + "\n")
+    
+    return 0
+
+def fetch_and_analyze(fetcher: DataFetcher, days: int, price_threshold: float, volume_threshold: float,
+                      resolution: str, **options) -> Optional[Tuple[pd.DataFrame, SpikeStore, Dict]]:
+    """
+    Fetch the token's and the basket's market data, then run the analysis
+    
+    Args:
+        fetcher: DataFetcher for the analyzed token
+        days: Number of days to analyze
+        price_threshold: Price spike threshold percentage
+        volume_threshold: Volume spike threshold percentage
+        resolution: Rollup level to analyze
+        **options: Passed on to run_analysis
+        
+    Returns:
+        run_analysis result, or None if the fetch failed or there was nothing to process
+    """
+    # Steps 2-3: Fetch market data, current data and the basket concurrently
+    logger.info(f"\n📊 Fetching {days}-day market data...")
+    with STAGE_SECONDS.time(stage='fetch'):
+        market_data, current_data, basket = fetch_inputs(fetcher, days)
+        if not market_data:
+            logger.error("❌ Failed to fetch market data. Please check your internet connection.")
+            RUNS.inc(status='failed')
+            return None
+    
+    # Steps 4-8
+    return run_analysis(market_data, current_data, days, price_threshold, volume_threshold, resolution,
+                        basket=basket, **options)
+
+def dump_metrics(token_id: str = None):
+    """Write this process's metrics next to the reports (config.METRICS_DUMP)"""
+    if config.METRICS_DUMP:
+        json_path, _ = REGISTRY.dump(config.REPORTS_DIR, token_id or config.TOKEN_ID)
+        logger.info(f"✓ Metrics saved to {json_path}")
+
+def raise_alerts(spikes_df: SpikeStore, token_id: str = None) -> Dict:
+    """
+    Alert on spikes not seen by earlier runs and report delivery latency
+    
+    Args:
+        spikes_df: Spike events
+        token_id: Token the spikes belong to
+        
+    Returns:
+        Alert engine metrics
+    """
+    engine = AlertEngine(token_id=token_id)
+    raised = engine.process(spikes_df)
+    metrics = engine.close()
+    
+    logger.info(f"✓ {len(raised)} alerts from {metrics['evaluated']} new spike events "
+                f"({metrics['suppressed']} suppressed by cooldown)")
+    for name, sink in metrics['sinks'].items():
+        latency = (f", latency p50 {sink['latency_ms_p50']:.1f} ms / p95 {sink['latency_ms_p95']:.1f} ms"
+                   if sink['delivered'] else "")
+        logger.info(f"  - {name}: {sink['delivered']} delivered, {sink['failed']} failed, "
+                    f"{sink['dropped']} dropped{latency}")
+    return metrics
+
+def fetch_inputs(fetcher: DataFetcher, days: int) -> Tuple[Optional[Dict], Optional[Dict], Optional[Dict]]:
+    """
+    Fetch the market chart, current data and basket charts in parallel
+    
+    The market chart doubles as the connection check. Current data is
+    optional: it gets config.CURRENT_DATA_TIMEOUT seconds from the start of
+    the stage and is dropped if it is not back by the time the charts are.
+    Peak memory is not traced here: tracemalloc counts every thread's
+    allocations, so no one request's peak can be told apart.
+    
+    Args:
+        fetcher: DataFetcher for the analyzed token
+        days: Number of days to fetch
+        
+    Returns:
+        (market data, current data, basket payloads); market data is None if
+        its fetch failed, in which case nothing else is waited for
+    """
+    deadline = time.monotonic() + config.CURRENT_DATA_TIMEOUT
+    # One worker per request plus one for fetch_basket, which waits on its tokens
+    pool = ThreadPoolExecutor(max_workers=3 + len(config.BASKET_TOKENS))
+    tracing, fetcher.trace_memory = fetcher.trace_memory, False
+    try:
+        current = pool.submit(fetcher.fetch_current_data)
+        market = pool.submit(fetcher.fetch_market_chart, days)
+        basket = None
+        if config.BASKET_TOKENS:
+            logger.info(f"🧺 Fetching basket tokens ({', '.join(config.BASKET_TOKENS)})...")
+            basket = pool.submit(fetch_basket, config.BASKET_TOKENS, days, pool)
+        market_data = market.result()
+        if not market_data:
+            return None, None, None
+        basket = basket.result() if basket else None
+        
+        try:
+            current_data = current.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FuturesTimeout:
+            logger.warning(f"⚠️  Current data not back within {config.CURRENT_DATA_TIMEOUT}s; "
+                           f"continuing without it")
+            current_data = None
+        return market_data, current_data, basket
+    finally:
+        # Never join a straggling detail request; its own timeout ends it
+        pool.shutdown(wait=False, cancel_futures=True)
+        fetcher.trace_memory = tracing
+
+def fetch_basket(tokens, days: int, pool: Executor = None) -> Dict[str, Dict]:
+    """
+    Fetch market data for the basket tokens correlated with the main token
+    
+    Args:
+        tokens: CoinGecko token ids
+        days: Number of days to fetch
+        pool: Executor fetching the tokens in parallel (default: one at a time)
+        
+    Returns:
+        Raw market_chart payloads keyed by token id; failed fetches are left out
+    """
+    tokens = [token_id for token_id in tokens if token_id != config.TOKEN_ID]
+    if pool is None:
+        results = (DataFetcher(token_id).fetch_market_chart(days) for token_id in tokens)
+    else:
+        fetchers = [DataFetcher(token_id) for token_id in tokens]
+        for basket_fetcher in fetchers:
+            # Parallel parses would only void each other's peak memory
+            basket_fetcher.trace_memory = False
+        futures = [pool.submit(basket_fetcher.fetch_market_chart, days) for basket_fetcher in fetchers]
+        results = (future.result() for future in futures)
+    
+    payloads = {}
+    for token_id, payload in zip(tokens, results):
+        if payload:
+            payloads[token_id] = payload
+        else:
+            logger.warning(f"⚠️  Skipping {token_id.upper()} in the basket correlation")
+    return payloads
+
+def basket_correlation(df: pd.DataFrame, basket: Dict[str, Dict], resolution: str,
+                       start: pd.Timestamp, end: pd.Timestamp, processor: DataProcessor,
+                       reporter: ReportGenerator, token_id: str = None) -> Optional[Dict]:
+    """
+    Correlate the analyzed token's returns and volumes with the basket's
+    
+    Each basket token's payload goes into its own rollup pyramid, so its
+    bars line up with the analyzed level and accumulate across runs.
+    
+    Args:
+        df: Processed market data of the analyzed token
+        basket: Raw market_chart payloads keyed by token id
+        resolution: Rollup level of df
+        start: Range start
+        end: Range end
+        processor: DataProcessor used for df
+        reporter: ReportGenerator whose data directory holds the pyramids
+        token_id: Analyzed token
+        
+    Returns:
+        correlation_summary of the aligned basket, or None without basket data
+    """
+    frames = {token_id or config.TOKEN_ID: df}
+    for basket_token, payload in basket.items():
+        pyramid = RollupPyramid.load(reporter.data_dir, basket_token)
+        pyramid.append(payload)
+        reporter.save_rollups(pyramid)
+        bars = processor.process_rollup(pyramid.level(resolution, start, end))
+        if not bars.empty:
+            frames[basket_token] = bars
+    if len(frames) < 2:
+        return None
+    aligned = basket_frame(frames)
+    logger.info(f"✓ Correlated {len(frames)} tokens over {len(aligned)} aligned bars")
+    return correlation_summary(aligned, list(aligned.columns))
+
+def run_analysis(market_data: Dict, current_data: Optional[Dict], days: int,
+                 price_threshold: float, volume_threshold: float, resolution: str,
+                 token_id: str = None, data_dir: str = None, reports_dir: str = None,
+                 charts_dir: str = None, render_tier: str = None,
+                 chart_format: str = None, export_charts: bool = False,
+                 export_workers: int = None, basket: Dict[str, Dict] = None,
+                 force: bool = False, end: pd.Timestamp = None,
+                 correlations: CorrelationTracker = None) -> Optional[Tuple[pd.DataFrame, SpikeStore, Dict]]:
+    """
+    Process fetched data and write charts and reports
+    
+    Args:
+        market_data: Raw market_chart payload
+        current_data: Current token data, or None
+        days: Number of days to analyze
+        price_threshold: Price spike threshold percentage
+        volume_threshold: Volume spike threshold percentage
+        resolution: Rollup level to analyze ('5m', '1h', '1d', '1w' or 'auto')
+        token_id: Token the data belongs to
+        data_dir: Output directory for CSV data
+        reports_dir: Output directory for reports
+        charts_dir: Output directory for charts
+        render_tier: Chart render tier from config.RENDER_TIERS
+        chart_format: Chart file format overriding the tier's own
+        export_charts: Also export the dashboard's interactive charts
+        export_workers: Worker processes for the chart export
+        basket: Raw market_chart payloads of tokens to correlate with this one
+        force: Rebuild every derived file even when its inputs are unchanged
+        end: End of the analyzed window (default: now)
+        correlations: Running correlation moments carried over from the previous run
+        
+    Returns:
+        (market data, spike events, statistics) or None if there was nothing to process
+    """
+    data_dir = data_dir or config.DATA_DIR
+    token_id = token_id or config.TOKEN_ID
+    processor = DataProcessor(correlations)
     processor.price_threshold = price_threshold
     processor.volume_threshold = volume_threshold
-    visualizer = Visualizer()
-    reporter = ReportGenerator()
+    visualizer = Visualizer(charts_dir, token_id, render_tier, chart_format)
+    reporter = ReportGenerator(data_dir, reports_dir, token_id)
     
-    # Step 2: Test API connection
-    print("\n📡 Testing API connection...")
-    if not fetcher.test_connection():
-        print("❌ Failed to connect to CoinGecko API. Please check your internet connection.")
-        return 1
+    # Step 4: Update rollup pyramid and select the matching level
+    logger.info("\n🔍 Processing market data...")
+    with STAGE_SECONDS.time(stage='process'):
+        pyramid = RollupPyramid.load(data_dir, token_id)
+        touched = pyramid.append(market_data)
+        
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.now(tz='UTC').tz_localize(None)
+        start = end - pd.Timedelta(days=days)
+        if resolution == 'auto':
+            resolution = pyramid.select_level(start, end)
+        logger.info(f"  - Resolution: {LEVEL_LABELS.get(resolution, resolution)} "
+                    f"({pyramid.row_count(resolution, start, end)} bars)")
+        bars = pyramid.level(resolution, start, end)
+    if bars.empty:
+        logger.error("❌ No data to process.")
+        RUNS.inc(status='empty')
+        return None
+    if any(touched.values()) or force:
+        reporter.save_rollups(pyramid)
     
-    # Step 3: Fetch market data
-    print(f"\n📊 Fetching {days}-day market data...")
-    market_data = fetcher.fetch_market_chart(days)
-    if not market_data:
-        print("❌ Failed to fetch market data.")
-        return 1
+    # Every later step is a node keyed on the content of what it reads, so
+    # only the steps downstream of a change run again
+    graph = BuildGraph(os.path.join(data_dir, config.BUILD_DIR), token_id.lower(),
+                       force=force or not config.BUILD_CACHE)
+    # Stored bars only change when samples with new timestamps arrive, so the
+    # payload and the window's bar layout identify them; the float values
+    # read back from disk never enter the key
+    layout = bars[['timestamp', 'samples', 'first_ts', 'last_ts']]
+    graph.source('bars', bars, key=fingerprint([fingerprint(market_data), fingerprint(layout), resolution]))
+    graph.source('current_market', processor.current_market(current_data))
+    graph.source('basket', basket or {})
     
-    current_data = fetcher.fetch_current_data()
+    def build_market(bars):
+        return processor.process_rollup(bars)
     
-    # Step 4: Process data
-    print("\n🔍 Processing market data...")
-    df = processor.process_market_data(market_data)
-    if df.empty:
-        print("❌ No data to process.")
-        return 1
+    def build_spikes(df):
+        return processor.identify_spikes(df)
+    
+    def build_statistics(df, basket):
+        # The market node's key already identifies df, so the memo never hashes it
+        stats = processor.calculate_statistics(df, version=graph.key('market'))
+        if basket:
+            # The frame's own span rather than "now", so the result depends only on the inputs
+            first, last = df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
+            summary = basket_correlation(df, basket, resolution, first, last, processor, reporter, token_id)
+            if summary:
+                stats['basket_correlation'] = summary
+        return stats
+    
+    def build_report_statistics(stats, current_market):
+        return stats if current_market is None else dict(stats, current_market=current_market)
+    
+    def build_spike_chart(spikes_df):
+        return visualizer.create_spike_distribution_chart(spikes_df) if not spikes_df.empty else None
+    
+    thresholds = {'price_threshold': price_threshold, 'volume_threshold': volume_threshold}
+    chart_params = {'dir': visualizer.output_dir, 'tier': visualizer.tier_name, 'format': visualizer.format}
+    report_params = {'data_dir': reporter.data_dir, 'reports_dir': reporter.reports_dir}
+    graph.node('market', build_market, ['bars'], {'timezone': config.EXCHANGE_TIMEZONE})
+    graph.node('spikes', build_spikes, ['market'], thresholds)
+    graph.node('statistics', build_statistics, ['market', 'basket'])
+    graph.node('report_statistics', build_report_statistics, ['statistics', 'current_market'])
+    graph.node('market_chart', visualizer.create_market_charts, ['market', 'spikes', 'statistics'], chart_params,
+               artifact=True)
+    graph.node('spike_chart', build_spike_chart, ['spikes'], chart_params, artifact=True)
+    graph.node('market_csv', reporter.save_market_data, ['market'], report_params, artifact=True)
+    graph.node('shared_frame', reporter.publish_market_data, ['market'], report_params, artifact=True)
+    shared = ['shared_frame'] if config.SHARED_FRAME else []
+    graph.node('spikes_csv', reporter.save_spike_data, ['spikes'], report_params, artifact=True)
+    graph.node('json_report', reporter.save_json_report, ['report_statistics', 'spikes'], report_params,
+               artifact=True)
+    graph.node('text_report', reporter.generate_text_report, ['report_statistics', 'spikes'], report_params,
+               artifact=True)
     
     # Step 5: Identify spikes
-    print(f"\n🎯 Identifying spikes (price: >{price_threshold}%, volume: >{volume_threshold}%)...")
-    spikes_df = processor.identify_spikes(df)
+    logger.info(f"\n🎯 Identifying spikes (price: >{price_threshold}%, volume: >{volume_threshold}%)...")
+    with STAGE_SECONDS.time(stage='spikes'):
+        graph.build(['spikes'])
     
     # Step 6: Calculate statistics
-    print("\n📈 Calculating statistics...")
-    stats = processor.calculate_statistics(df, current_data)
+    logger.info("\n📈 Calculating statistics...")
+    with STAGE_SECONDS.time(stage='statistics'):
+        graph.build(['report_statistics'])
     
     # Step 7: Generate visualizations
-    print("\n🎨 Creating visualizations...")
-    visualizer.create_market_charts(df, spikes_df, stats)
-    if not spikes_df.empty:
-        visualizer.create_spike_distribution_chart(spikes_df)
+    logger.info("\n🎨 Creating visualizations...")
+    with STAGE_SECONDS.time(stage='visualize'):
+        graph.build(['market_chart', 'spike_chart'])
     
     # Step 8: Generate reports
-    print("\n📝 Generating reports...")
-    reporter.save_market_data(df)
-    reporter.save_spike_data(spikes_df)
-    reporter.save_json_report(stats, spikes_df)
-    reporter.generate_text_report(stats, spikes_df)
+    logger.info("\n📝 Generating reports...")
+    with STAGE_SECONDS.time(stage='reports'):
+        graph.build(['market_csv', 'spikes_csv', 'json_report', 'text_report'] + shared)
+    if export_charts:
+        export_dir = os.path.join(reports_dir, 'charts') if reports_dir else config.CHART_EXPORT_DIR
+        
+        def build_export(df, spikes_df, *published):
+            # Workers attach to the published frame rather than receiving a pickled copy
+            frame_path = None
+            if published:
+                frame_path = published[0] if isinstance(published[0], str) else published[0][0]
+            return chart_exporter.export_charts(df, spikes_df, export_dir, workers=export_workers, token_id=token_id,
+                                                frame_path=frame_path)
+        
+        graph.node('chart_export', build_export, ['market', 'spikes'] + shared, {'dir': export_dir}, artifact=True)
+        with STAGE_SECONDS.time(stage='export'):
+            graph.build(['chart_export'])
     
-    # Step 9: Display summary
-    reporter.generate_summary(stats, spikes_df)
+    build = graph.summary()
+    logger.info(f"\n♻️  Rebuilt: {', '.join(build['built']) or 'nothing'}")
+    if build['cached']:
+        logger.info(f"  - Cached: {', '.join(build['cached'])}")
     
-    print("✅ Analysis complete!\n")
-    print("📁 Output files:")
-    print(f"   • Data: {config.DATA_DIR}/")
-    print(f"   • Reports: {config.REPORTS_DIR}/")
-    print(f"   • Charts: {config.VISUALIZATIONS_DIR}/")
-    print("\n" + "=" * 60 + "\n")
+    RUNS.inc(status='ok')
+    stats = dict(graph.get('report_statistics'), build=build)
+    return graph.get('market'), graph.get('spikes'), stats
+
+def run_batch_main(grid_path: str, output_dir: str = None, workers: int = None):
+    """
+    Batch execution function
+    
+    Args:
+        grid_path: JSON grid of tokens, day windows and thresholds
+        output_dir: Root directory for per-job outputs
+        workers: Number of worker processes
+    """
+    if not authenticate():
+        return 1
+    
+    print_header()
+    jobs = batch.load_grid(grid_path)
+    if not jobs:
+        logger.error("❌ Batch grid is empty.")
+        return 1
     
+    summary = batch.run_batch(jobs, output_dir, workers)
+    batch.print_summary(summary)
+    return 0 if (summary['status'] == 'ok').all() else 1
+
+def run_backfill_main(start: str, end: str = None, resolution: str = None, workers: int = None):
+    """
+    Backfill execution function
+    
+    Args:
+        start: First date to download
+        end: Last date to download (default: now)
+        resolution: Target granularity, which sets the chunk length
+        workers: Concurrent downloads
+    """
+    if not authenticate():
+        return 1
+    
+    print_header()
+    summary = run_backfill(start, end, resolution, workers=workers)
+    return 0 if summary['failed'] == 0 else 1
+
+def run_replay_main(start: str, end: str = None, price_threshold: float = None,
+                    volume_threshold: float = None, resolution: str = None, output_dir: str = None):
+    """
+    Reprocess an archived window without touching the network
+    
+    The window's data, reports and charts go to their own directory, built
+    from scratch, so a replay after a processing change shows that change
+    alone.
+    
+    Args:
+        start: Window start
+        end: Window end (default: now)
+        price_threshold: Price spike threshold percentage
+        volume_threshold: Volume spike threshold percentage
+        resolution: Rollup level to analyze ('5m', '1h', '1d', '1w' or 'auto')
+        output_dir: Root directory for replay outputs (default: config.REPLAY_OUTPUT_DIR)
+    """
+    if not authenticate():
+        return 1
+    price_threshold = price_threshold or config.PRICE_SPIKE_THRESHOLD
+    volume_threshold = volume_threshold or config.VOLUME_SPIKE_THRESHOLD
+    resolution = resolution or config.DEFAULT_RESOLUTION
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end) if end else pd.Timestamp.now(tz='UTC').tz_localize(None)
+    start_ms, end_ms = start.value // 1_000_000, end.value // 1_000_000
+    
+    print_header()
+    archive = PayloadArchive()
+    logger.info(f"📼 Replaying {config.TOKEN_ID.upper()} {start:%Y-%m-%d %H:%M} → {end:%Y-%m-%d %H:%M} "
+                f"from {archive.directory}")
+    with STAGE_SECONDS.time(stage='replay'):
+        market_data = archive.market_series(config.TOKEN_ID, start_ms, end_ms)
+        if market_data is None:
+            logger.error("❌ No archived market data in this window.")
+            return 1
+        current_data = archive.current_data(config.TOKEN_ID, end_ms)
+        basket = {}
+        for basket_token in config.BASKET_TOKENS:
+            if basket_token != config.TOKEN_ID:
+                series = archive.market_series(basket_token, start_ms, end_ms)
+                if series is not None:
+                    basket[basket_token] = series
+    logger.info(f"✓ Read {len(market_data)} archived samples")
+    
+    directory = os.path.join(output_dir or config.REPLAY_OUTPUT_DIR,
+                             f"{config.TOKEN_ID}_{start:%Y%m%dT%H%M}_{end:%Y%m%dT%H%M}")
+    # Rollups left by an earlier replay would hide a change to the bucketing
+    shutil.rmtree(os.path.join(directory, 'data'), ignore_errors=True)
+    days = max(1, math.ceil((end - start) / pd.Timedelta(days=1)))
+    result = run_analysis(market_data, current_data, days, price_threshold, volume_threshold, resolution,
+                          data_dir=os.path.join(directory, 'data'),
+                          reports_dir=os.path.join(directory, 'reports'),
+                          charts_dir=os.path.join(directory, 'visualizations'),
+                          basket=basket, force=True, end=end)
+    if result is None:
+        return 1
+    df, spikes_df, stats = result
+    ReportGenerator(os.path.join(directory, 'data'), os.path.join(directory, 'reports')).generate_summary(
+        stats, spikes_df)
+    print(f"📁 Replay outputs: {directory}/\n")
+    return 0
+
+def run_data_service_main(port: int = None):
+    """
+    Serve the dashboard's data to thin-client dashboards until interrupted
+    
+    Args:
+        port: Service port (default: config.DATA_SERVICE_PORT)
+    """
+    if not authenticate():
+        return 1
+    
+    print_header()
+    run_data_service(port=port)
+    return 0
+
+def run_daemon(days: int = None, price_threshold: float = None, volume_threshold: float = None,
+               resolution: str = None, interval: float = None, port: int = None, alerts: bool = None):
+    """
+    Re-run fetch, analysis and alerts on a fixed interval until interrupted
+    
+    Metrics accumulate across cycles and are served at /metrics for a
+    Prometheus scraper; /health reports the last cycle's outcome.
+    
+    Args:
+        days: Number of days to analyze
+        price_threshold: Price spike threshold percentage
+        volume_threshold: Volume spike threshold percentage
+        resolution: Rollup level to analyze ('5m', '1h', '1d', '1w' or 'auto')
+        interval: Minutes between cycle starts (default: config.DAEMON_INTERVAL_MINUTES)
+        port: Metrics port (default: config.METRICS_PORT)
+        alerts: Raise alerts on new spikes (default: config.ALERTS_ENABLED)
+    """
+    if not authenticate():
+        return 1
+    days = days or config.DEFAULT_DAYS
+    price_threshold = price_threshold or config.PRICE_SPIKE_THRESHOLD
+    volume_threshold = volume_threshold or config.VOLUME_SPIKE_THRESHOLD
+    resolution = resolution or config.DEFAULT_RESOLUTION
+    interval = (interval or config.DAEMON_INTERVAL_MINUTES) * 60
+    alerts = config.ALERTS_ENABLED if alerts is None else alerts
+    
+    print_header()
+    server = MetricsServer(port).start()
+    logger.info(f"📡 Serving metrics at {server.address}/metrics (health at /health), "
+                f"running every {interval / 60:g} minutes")
+    fetcher = DataFetcher()
+    # Each cycle's frame mostly repeats the last one, so the correlations are
+    # updated with the changed rows instead of re-summed
+    correlations = CorrelationTracker()
+    cycles = 0
+    try:
+        while True:
+            started = time.monotonic()
+            cycles += 1
+            try:
+                result = fetch_and_analyze(fetcher, days, price_threshold, volume_threshold, resolution,
+                                           correlations=correlations)
+                if result is not None and alerts:
+                    with STAGE_SECONDS.time(stage='alerts'):
+                        raise_alerts(result[1])
+                status = 'ok' if result is not None else 'failed'
+            except Exception as e:
+                logger.exception(f"❌ Cycle {cycles} failed: {e}")
+                RUNS.inc(status='failed')
+                status = 'failed'
+            server.health = {'status': status, 'cycles': cycles,
+                             'last_run': datetime.now().isoformat(timespec='seconds'),
+                             'last_duration_s': round(time.monotonic() - started, 2)}
+            dump_metrics()
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        logger.info(f"\n🛑 Stopping after {cycles} cycles")
+    finally:
+        server.stop()
     return 0
 
 if __name__ == "__main__":
@@ -132,9 +647,76 @@ if __name__ == "__main__":
                        help=f'Price spike threshold %% (default: {config.PRICE_SPIKE_THRESHOLD})')
     parser.add_argument('-v', '--volume-threshold', type=float, default=config.VOLUME_SPIKE_THRESHOLD,
                        help=f'Volume spike threshold %% (default: {config.VOLUME_SPIKE_THRESHOLD})')
+    parser.add_argument('-r', '--resolution', choices=config.ROLLUP_LEVELS + ['auto'],
+                       default=config.DEFAULT_RESOLUTION,
+                       help=f'Bar resolution to analyze (default: {config.DEFAULT_RESOLUTION})')
+    
+    parser.add_argument('--render-tier', choices=list(config.RENDER_TIERS), default=config.RENDER_TIER,
+                       help=f'Chart DPI/format tier (default: {config.RENDER_TIER})')
+    parser.add_argument('--chart-format', choices=config.RENDER_FORMATS,
+                       help="Chart file format (default: the tier's own)")
+    parser.add_argument('--benchmark-render', action='store_true',
+                       help='Time chart rendering for every tier after the analysis')
+    parser.add_argument('--export-charts', action='store_true',
+                       help=f'Export interactive dashboard charts to {config.CHART_EXPORT_DIR}')
+    parser.add_argument('--rebuild', action='store_true',
+                       help='Regenerate every chart and report, ignoring the build cache')
+    parser.add_argument('--no-alerts', action='store_true',
+                       help='Do not raise alerts for new spikes')
+    parser.add_argument('--batch', metavar='GRID.json',
+                       help='Run every (token, days, threshold) job in a JSON grid across a process pool')
+    parser.add_argument('--batch-output', default=config.BATCH_OUTPUT_DIR,
+                       help=f'Root directory for batch job outputs (default: {config.BATCH_OUTPUT_DIR})')
+    parser.add_argument('-w', '--workers', type=int, default=config.BATCH_WORKERS,
+                       help='Number of batch worker processes or backfill downloads (default: CPU count / '
+                            f'{config.BACKFILL_WORKERS})')
+    parser.add_argument('--backfill', metavar='START_DATE',
+                       help='Download history from START_DATE into the rollup store in resumable chunks')
+    parser.add_argument('--backfill-end', metavar='END_DATE',
+                       help='Last date to backfill (default: now)')
+    parser.add_argument('--backfill-resolution', choices=list(config.BACKFILL_CHUNK_DAYS),
+                       default=config.BACKFILL_RESOLUTION,
+                       help=f'Granularity to backfill at (default: {config.BACKFILL_RESOLUTION})')
+    parser.add_argument('--replay', metavar='START_DATE',
+                       help='Reprocess the archived responses from START_DATE without fetching')
+    parser.add_argument('--replay-end', metavar='END_DATE',
+                       help='Last date to replay (default: now)')
+    parser.add_argument('--daemon', action='store_true',
+                       help='Re-run the analysis on an interval and serve Prometheus metrics')
+    parser.add_argument('--interval', type=float, default=config.DAEMON_INTERVAL_MINUTES,
+                       help=f'Minutes between daemon runs (default: {config.DAEMON_INTERVAL_MINUTES})')
+    parser.add_argument('--metrics-port', type=int, default=config.METRICS_PORT,
+                       help=f'Port of the daemon metrics endpoint (default: {config.METRICS_PORT})')
+    parser.add_argument('--serve-data', action='store_true',
+                       help='Serve the latest outputs to dashboards over HTTP (set config.DATA_SERVICE_URL in them)')
+    parser.add_argument('--data-port', type=int, default=config.DATA_SERVICE_PORT,
+                       help=f'Port of the dashboard data service (default: {config.DATA_SERVICE_PORT})')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default=config.LOG_LEVEL,
+                       help=f'Minimum level of progress messages (default: {config.LOG_LEVEL})')
+    parser.add_argument('--log-format', choices=['text', 'json'], default=config.LOG_FORMAT,
+                       help=f'Progress messages as plain text or JSON lines (default: {config.LOG_FORMAT})')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                       help='Only log warnings and errors (same as --log-level WARNING)')
     
     args = parser.parse_args()
+    logs.configure('WARNING' if args.quiet else args.log_level, args.log_format)
     
     # Run main function
-    exit_code = main(args.days, args.price_threshold, args.volume_threshold)
+    if args.batch:
+        exit_code = run_batch_main(args.batch, args.batch_output, args.workers)
+    elif args.daemon:
+        exit_code = run_daemon(args.days, args.price_threshold, args.volume_threshold, args.resolution,
+                               args.interval, args.metrics_port, alerts=not args.no_alerts)
+    elif args.serve_data:
+        exit_code = run_data_service_main(args.data_port)
+    elif args.replay:
+        exit_code = run_replay_main(args.replay, args.replay_end, args.price_threshold, args.volume_threshold,
+                                    args.resolution)
+    elif args.backfill:
+        exit_code = run_backfill_main(args.backfill, args.backfill_end, args.backfill_resolution, args.workers)
+    else:
+        exit_code = main(args.days, args.price_threshold, args.volume_threshold, args.resolution,
+                         alerts=not args.no_alerts, render_tier=args.render_tier,
+                         chart_format=args.chart_format, benchmark_render=args.benchmark_render,
+                         export_charts=args.export_charts, rebuild=args.rebuild)
     sys.exit(exit_code)
\ No newline at end of file
@@ -0,0 +1,273 @@
+# market_series.py - Compact columnar representation of market_chart data
+
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional, Tuple, Union
+import config
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+# Rough size of one "[1700000000000,0.1234567890]," pair, used to presize buffers
+BYTES_PER_PAIR = 32
+
+
+def day_keys(timestamps_ms: np.ndarray, timezone: str = None) -> np.ndarray:
+    """
+    Exchange-day number of every timestamp
+
+    Args:
+        timestamps_ms: UTC epoch-millisecond timestamps
+        timezone: IANA zone the trading day follows (default: config.EXCHANGE_TIMEZONE)
+
+    Returns:
+        int32 days since 1970-01-01 on the zone's calendar
+    """
+    timezone = timezone or config.EXCHANGE_TIMEZONE
+    timestamps_ms = np.asarray(timestamps_ms, dtype='int64')
+    if timezone != 'UTC':
+        # Shift each instant to local wall time; pandas looks the offsets up per DST transition
+        local = (pd.DatetimeIndex(timestamps_ms.astype('datetime64[ms]')).tz_localize('UTC')
+                 .tz_convert(timezone).tz_localize(None))
+        timestamps_ms = local.to_numpy().astype('datetime64[ms]').astype('int64')
+    return (timestamps_ms // MS_PER_DAY).astype('int32')
+
+
+def day_dates(keys: np.ndarray) -> np.ndarray:
+    """Calendar date (datetime64 midnight, no zone) of every day key"""
+    return np.asarray(keys).astype('datetime64[D]').astype('datetime64[ms]')
+
+
+def day_bounds(first, last, timezone: str = None) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """
+    UTC instants spanning whole exchange days, for filtering on timestamps
+
+    Args:
+        first: First calendar day (anything pd.Timestamp accepts)
+        last: Last calendar day, included
+        timezone: IANA zone the trading day follows (default: config.EXCHANGE_TIMEZONE)
+
+    Returns:
+        (first day's opening instant, last instant of the last day) as naive UTC timestamps
+    """
+    timezone = timezone or config.EXCHANGE_TIMEZONE
+    midnights = pd.DatetimeIndex([pd.Timestamp(first).normalize(),
+                                  pd.Timestamp(last).normalize() + pd.Timedelta(days=1)])
+    if timezone != 'UTC':
+        midnights = (midnights.tz_localize(timezone, ambiguous=np.ones(2, dtype=bool), nonexistent='shift_forward')
+                     .tz_convert('UTC').tz_localize(None))
+    return midnights[0], midnights[1] - pd.Timedelta(milliseconds=1)
+
+
+def _pairs(raw_data: Dict, key: str) -> np.ndarray:
+    """Convert a list of [ms, value] pairs to an (n, 2) float64 array"""
+    return np.asarray(raw_data.get(key) or [], dtype='float64').reshape(-1, 2)
+
+
+class MarketSeries:
+    """
+    Aligned int64 epoch-millisecond timestamps and float64 value arrays
+
+    CoinGecko returns prices, total_volumes and market_caps sampled at the
+    same instants, so the columns are aligned by construction and no join
+    is needed. Arrays that do not line up are matched by searchsorted.
+    """
+
+    __slots__ = ('timestamps', 'price', 'volume', 'market_cap')
+
+    def __init__(self, timestamps: np.ndarray, price: np.ndarray,
+                 volume: Optional[np.ndarray] = None, market_cap: Optional[np.ndarray] = None):
+        n = len(timestamps)
+        self.timestamps = np.asarray(timestamps, dtype='int64')
+        self.price = np.asarray(price, dtype='float64')
+        self.volume = np.full(n, np.nan) if volume is None else np.asarray(volume, dtype='float64')
+        self.market_cap = np.full(n, np.nan) if market_cap is None else np.asarray(market_cap, dtype='float64')
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @staticmethod
+    def _align(timestamps: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+        """Values of pairs at the given timestamps, NaN where missing"""
+        if len(pairs) == len(timestamps) and np.array_equal(pairs[:, 0].astype('int64'), timestamps):
+            return pairs[:, 1].copy()
+
+        result = np.full(len(timestamps), np.nan)
+        if len(pairs) == 0:
+            return result
+
+        source_ts = pairs[:, 0].astype('int64')
+        order = np.argsort(source_ts, kind='stable')
+        source_ts = source_ts[order]
+        source_values = pairs[order, 1]
+        # Last occurrence wins for duplicated timestamps
+        pos = np.searchsorted(source_ts, timestamps, side='right') - 1
+        valid = pos >= 0
+        valid[valid] = source_ts[pos[valid]] == timestamps[valid]
+        result[valid] = source_values[pos[valid]]
+        return result
+
+    @classmethod
+    def from_pairs(cls, prices: np.ndarray, volumes: np.ndarray, market_caps: np.ndarray) -> 'MarketSeries':
+        """Build a series from (n, 2) [ms, value] arrays, aligned on the price timestamps"""
+        timestamps = prices[:, 0].astype('int64')
+        return cls(timestamps, prices[:, 1], cls._align(timestamps, volumes), cls._align(timestamps, market_caps))
+
+    @classmethod
+    def from_market_chart(cls, raw_data: Union[Dict, 'MarketSeries']) -> 'MarketSeries':
+        """
+        Build a series from a raw market_chart payload
+
+        Args:
+            raw_data: Raw data from CoinGecko API, or a series already parsed from it
+
+        Returns:
+            MarketSeries aligned on the price timestamps
+        """
+        if isinstance(raw_data, MarketSeries):
+            return raw_data
+        return cls.from_pairs(_pairs(raw_data, 'prices'), _pairs(raw_data, 'total_volumes'),
+                              _pairs(raw_data, 'market_caps'))
+
+    @classmethod
+    def from_stream(cls, chunks: Iterable[bytes], size_hint: int = 0) -> 'MarketSeries':
+        """
+        Parse a market_chart JSON body chunk by chunk
+
+        Args:
+            chunks: Body bytes, e.g. response.iter_content()
+            size_hint: Expected body size in bytes, used to presize the buffers
+
+        Returns:
+            MarketSeries aligned on the price timestamps
+        """
+        parser = MarketChartParser(size_hint)
+        for chunk in chunks:
+            parser.feed(chunk)
+        return parser.close()
+
+    def day_keys(self, timezone: str = None) -> np.ndarray:
+        """Exchange-day number (days since epoch) of every sample"""
+        return day_keys(self.timestamps, timezone)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.timestamps.nbytes + self.price.nbytes +
+                self.volume.nbytes + self.market_cap.nbytes)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Materialize the series as a DataFrame
+
+        Returns:
+            DataFrame with timestamp, price, volume and market_cap columns
+        """
+        return pd.DataFrame({
+            'timestamp': self.timestamps.astype('datetime64[ms]'),
+            'price': self.price,
+            'volume': self.volume,
+            'market_cap': self.market_cap
+        })
+
+
+class _PairBuffer:
+    """Growable (n, 2) float64 buffer filled in place"""
+
+    def __init__(self, capacity: int):
+        self.data = np.empty((max(capacity, 16), 2))
+        self.size = 0
+
+    def extend(self, values: np.ndarray) -> None:
+        end = self.size + len(values)
+        if end > len(self.data):
+            grown = np.empty((max(end, 2 * len(self.data)), 2))
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:end] = values
+        self.size = end
+
+    def finish(self) -> np.ndarray:
+        # Shrink in place so the spare capacity is released without a copy
+        self.data.resize((self.size, 2), refcheck=False)
+        return self.data
+
+
+class MarketChartParser:
+    """
+    Incremental parser for market_chart JSON bodies
+
+    The body is a flat object of [[ms, value], ...] arrays, so the parser
+    only tracks which array it is in. Each chunk's complete pairs are
+    converted in one np.fromstring call into preallocated buffers;
+    no Python list per pair is ever created. Memory stays at the output
+    arrays plus one chunk, whatever the body size.
+    """
+
+    COLUMNS = ('prices', 'total_volumes', 'market_caps')
+    _ARRAY_KEY = re.compile(rb'"(\w+)"\s*:\s*\[')
+    _ARRAY_END = re.compile(rb'\]\s*\]')
+    _SEPARATORS = bytes.maketrans(b'[],', b'   ')
+
+    def __init__(self, size_hint: int = 0):
+        capacity = size_hint // (BYTES_PER_PAIR * len(self.COLUMNS))
+        self.buffers = {key: _PairBuffer(capacity) for key in self.COLUMNS}
+        self.pending = b''
+        self.key = None
+        self.at_start = False
+
+    def _parse_pairs(self, segment: bytes) -> None:
+        text = segment.translate(self._SEPARATORS).replace(b'null', b'nan').decode('ascii')
+        if text.isspace() or not text:
+            return
+        values = np.fromstring(text, sep=' ')
+        if len(values) % 2:
+            raise ValueError(f"Malformed market_chart pairs in '{self.key}'")
+        if self.key in self.buffers and len(values):
+            self.buffers[self.key].extend(values.reshape(-1, 2))
+
+    def feed(self, chunk: bytes) -> None:
+        data = self.pending + chunk
+        pos = 0
+        while True:
+            if self.key is None:
+                match = self._ARRAY_KEY.search(data, pos)
+                if not match:
+                    # Keep enough to complete a key split across chunks
+                    self.pending = data[max(pos, len(data) - 64):]
+                    return
+                self.key = match.group(1).decode('ascii')
+                self.at_start = True
+                pos = match.end()
+
+            if self.at_start:
+                rest = data[pos:].lstrip()
+                if not rest:
+                    self.pending = b''
+                    return
+                self.at_start = False
+                if rest[:1] == b']':
+                    self.key = None
+                    pos = data.index(b']', pos) + 1
+                    continue
+
+            match = self._ARRAY_END.search(data, pos)
+            if match:
+                self._parse_pairs(data[pos:match.start() + 1])
+                self.key = None
+                pos = match.end()
+                continue
+
+            # Parse the complete pairs; the last ']' stays pending so an
+            # array end split across chunks is still recognized
+            last = data.rfind(b']', pos)
+            if last < 0:
+                self.pending = data[pos:]
+                return
+            self._parse_pairs(data[pos:last + 1])
+            self.pending = data[last:]
+            return
+
+    def close(self) -> MarketSeries:
+        if self.key is not None:
+            raise ValueError(f"Truncated market_chart body inside '{self.key}'")
+        return MarketSeries.from_pairs(*(self.buffers[key].finish() for key in self.COLUMNS))
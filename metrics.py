@@ -0,0 +1,261 @@
+# metrics.py - Process-wide counters and histograms with a Prometheus text endpoint
+
+import os
+import json
+import math
+import threading
+import time
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+import config
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: Tuple, extra: Dict = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ''
+    escaped = ('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(_label_key(labels), 0)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.values.clear()
+
+    def samples(self):
+        with self.lock:
+            return [(f'{self.name}{_format_labels(key)}', value) for key, value in sorted(self.values.items())]
+
+    def snapshot(self) -> list:
+        with self.lock:
+            return [{'labels': dict(key), 'value': value} for key, value in sorted(self.values.items())]
+
+
+class _Timer(ContextDecorator):
+    """Observe the elapsed wall time of a block or a decorated call"""
+
+    def __init__(self, histogram: 'Histogram', labels: Dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def _recreate_cm(self):
+        # A fresh timer per decorated call, so concurrent calls do not share state
+        return _Timer(self.histogram, self.labels)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed, **self.labels)
+        return False
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['counts'][i] += 1
+                    break
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def time(self, **labels) -> _Timer:
+        """Context manager (or decorator) recording the block's duration in seconds"""
+        return _Timer(self, labels)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.values.clear()
+
+    def samples(self):
+        lines = []
+        with self.lock:
+            for key, entry in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry['counts']):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else f'{bound:g}'
+                    lines.append((f'{self.name}_bucket{_format_labels(key, {"le": le})}', cumulative))
+                lines.append((f'{self.name}_sum{_format_labels(key)}', entry['sum']))
+                lines.append((f'{self.name}_count{_format_labels(key)}', entry['count']))
+        return lines
+
+    def snapshot(self) -> list:
+        with self.lock:
+            return [{'labels': dict(key), 'count': entry['count'], 'sum': entry['sum'],
+                     'mean': entry['sum'] / entry['count'] if entry['count'] else None}
+                    for key, entry in sorted(self.values.items())]
+
+
+class Registry:
+    """Named metrics, rendered together"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.started = time.time()
+
+    def _get(self, cls, name: str, description: str, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, description, **kwargs)
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._get(Counter, name, description)
+
+    def histogram(self, name: str, description: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, description, buckets=buckets)
+
+    def reset(self) -> None:
+        """Zero every metric, e.g. between independent runs in one process"""
+        for metric in self.metrics.values():
+            metric.reset()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{sample} {value:g}' for sample, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        """All metrics as plain data, for the per-run dump"""
+        return {name: {'type': metric.kind, 'help': metric.description, 'samples': metric.snapshot()}
+                for name, metric in self.metrics.items()}
+
+    def dump(self, directory: str, prefix: str) -> Tuple[str, str]:
+        """
+        Write the current values as JSON and Prometheus text files
+
+        Args:
+            directory: Output directory
+            prefix: File name prefix (the token id)
+
+        Returns:
+            Paths of the JSON and .prom files
+        """
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, f'{prefix}_metrics.json')
+        with open(json_path, 'w') as f:
+            json.dump({'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'metrics': self.snapshot()}, f, indent=2)
+        prom_path = os.path.join(directory, f'{prefix}_metrics.prom')
+        with open(prom_path, 'w') as f:
+            f.write(self.render())
+        return json_path, prom_path
+
+
+REGISTRY = Registry()
+
+API_LATENCY = REGISTRY.histogram('kaito_api_request_seconds', 'CoinGecko request latency up to the response headers')
+API_REQUESTS = REGISTRY.counter('kaito_api_requests_total', 'CoinGecko requests by endpoint and outcome')
+API_RETRIES = REGISTRY.counter('kaito_api_retries_total', 'CoinGecko requests repeated after a failure')
+CACHE_REQUESTS = REGISTRY.counter('kaito_cache_requests_total', 'Cache lookups by cache and result')
+ROWS_PROCESSED = REGISTRY.counter('kaito_rows_processed_total', 'Rows turned into processed market data')
+SPIKES_DETECTED = REGISTRY.counter('kaito_spikes_detected_total', 'Spike events by type')
+ALERTS_RAISED = REGISTRY.counter('kaito_alerts_total', 'Alerts raised by rule and severity')
+STAGE_SECONDS = REGISTRY.histogram('kaito_stage_seconds', 'Pipeline stage durations')
+RENDER_SECONDS = REGISTRY.histogram('kaito_render_seconds', 'Static chart render and save time')
+REPORT_WRITE_SECONDS = REGISTRY.histogram('kaito_report_write_seconds', 'Data and report file write time')
+ARCHIVE_BYTES = REGISTRY.counter('kaito_archive_bytes_total', 'Raw and stored bytes written to the payload archive')
+DATA_SERVICE_REQUESTS = REGISTRY.counter('kaito_data_service_requests_total',
+                                         'Data service requests by route and status')
+RUNS = REGISTRY.counter('kaito_runs_total', 'Pipeline runs by outcome')
+
+
+class MetricsServer:
+    """
+    Serve /metrics (Prometheus text) and /health (JSON) from a daemon thread
+
+    Binds to localhost by default; the handler only reads the registry.
+    """
+
+    def __init__(self, port: int = None, host: str = None, registry: Registry = None):
+        self.registry = registry or REGISTRY
+        self.health = {'status': 'starting'}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] == '/metrics':
+                    body = server.registry.render().encode()
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path.split('?')[0] == '/health':
+                    body = json.dumps(dict(server.health, uptime_s=round(time.time() - server.registry.started, 1)),
+                                      default=str).encode()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host or config.METRICS_HOST, config.METRICS_PORT if port is None else port),
+                                         Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-server', daemon=True)
+
+    @property
+    def address(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'MetricsServer':
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,397 @@
+# payload_archive.py - Append-only compressed archive of raw CoinGecko responses
+
+import os
+import json
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+import config
+from market_series import MarketSeries
+from rollup import LEVEL_MS, infer_resolution
+from logs import get_logger
+from metrics import ARCHIVE_BYTES
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+# Every record starts with MAGIC and the lengths of its JSON header and of
+# its compressed body, so a segment can be scanned without the index
+MAGIC = b'KPA1'
+RECORD_HEADER = struct.Struct('<4sII')
+READ_BYTES = 1 << 20
+MARKET_CHART_ENDPOINTS = ('market_chart', 'market_chart_range')
+
+
+def _compressor(codec: str):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=config.ARCHIVE_LEVEL).compressobj()
+    return zlib.compressobj(config.ARCHIVE_LEVEL)
+
+
+def _decompressor(codec: str):
+    if codec == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Archive record is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj()
+
+
+class Recording:
+    """
+    One response body being compressed as it is read
+
+    tee() passes the body's chunks through unchanged, so a streamed parse
+    and the archive share a single read of the response. Nothing reaches
+    the archive until commit(); an abandoned recording leaves no trace.
+    """
+
+    def __init__(self, archive: 'PayloadArchive', token_id: str, endpoint: str, params: Dict = None):
+        self.archive = archive
+        self.header = {'token': token_id, 'endpoint': endpoint, 'params': params or {},
+                       'fetched_at': int(time.time() * 1000), 'codec': archive.codec}
+        self.compressor = _compressor(archive.codec)
+        self.parts = []
+        self.raw_bytes = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.raw_bytes += len(chunk)
+        compressed = self.compressor.compress(chunk)
+        if compressed:
+            self.parts.append(compressed)
+
+    def tee(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.feed(chunk)
+            yield chunk
+
+    def commit(self, start_ms: int = None, end_ms: int = None) -> Dict:
+        """
+        Append the body to the archive
+
+        Args:
+            start_ms: First sample time covered by the body (default: fetch time)
+            end_ms: Last sample time covered by the body (default: fetch time)
+
+        Returns:
+            Index entry of the record
+        """
+        self.parts.append(self.compressor.flush())
+        fetched_at = self.header['fetched_at']
+        self.header.update(start=int(fetched_at if start_ms is None else start_ms),
+                           end=int(fetched_at if end_ms is None else end_ms), raw_bytes=self.raw_bytes)
+        return self.archive._write(self.header, b''.join(self.parts))
+
+
+class PayloadArchive:
+    """
+    Raw response bodies in append-only, compressed segment files
+
+    Records are appended to `<token>-<n>.seg` under the archive directory,
+    each body compressed on its own (zstd when the zstandard package is
+    installed, zlib otherwise), and a new segment is started once the
+    current one passes config.ARCHIVE_SEGMENT_BYTES. Segments are never
+    rewritten. `<token>.idx` holds one JSON line per record with its
+    endpoint, fetch time, the time span its samples cover and where its
+    body sits, so a window is read by seeking straight to the bodies that
+    overlap it. The index is only a cache of the record headers: it is
+    rebuilt from the segments when missing.
+
+    One process appends to an archive at a time; threads share the
+    instance returned by default_archive().
+    """
+
+    def __init__(self, directory: str = None, codec: str = None):
+        """
+        Args:
+            directory: Archive directory (default: config.ARCHIVE_DIR)
+            codec: 'zstd' or 'zlib' (default: config.ARCHIVE_CODEC, zlib without zstandard)
+        """
+        self.directory = directory or config.ARCHIVE_DIR
+        codec = codec or config.ARCHIVE_CODEC
+        self.codec = codec if codec != 'zstd' or ZSTD_AVAILABLE else 'zlib'
+        self.lock = threading.Lock()
+        self._indexes = {}
+
+    def _segment_path(self, token_id: str, number: int) -> str:
+        return os.path.join(self.directory, f'{token_id}-{number:06d}.seg')
+
+    def _index_path(self, token_id: str) -> str:
+        return os.path.join(self.directory, f'{token_id}.idx')
+
+    def _segments(self, token_id: str) -> List[int]:
+        if not os.path.isdir(self.directory):
+            return []
+        prefix = f'{token_id}-'
+        return sorted(int(name[len(prefix):-4]) for name in os.listdir(self.directory)
+                      if name.startswith(prefix) and name.endswith('.seg') and name[len(prefix):-4].isdigit())
+
+    def recording(self, token_id: str, endpoint: str, params: Dict = None) -> Recording:
+        """Start archiving a streamed body; see Recording"""
+        return Recording(self, token_id, endpoint, params)
+
+    def append(self, token_id: str, endpoint: str, body: bytes, params: Dict = None,
+               start_ms: int = None, end_ms: int = None) -> Dict:
+        """
+        Archive a complete response body
+
+        Args:
+            token_id: Token the response belongs to
+            endpoint: Endpoint name ('market_chart', 'market_chart_range' or 'coin')
+            body: Raw response bytes
+            params: Request parameters
+            start_ms: First sample time covered by the body (default: fetch time)
+            end_ms: Last sample time covered by the body (default: fetch time)
+
+        Returns:
+            Index entry of the record
+        """
+        recording = self.recording(token_id, endpoint, params)
+        recording.feed(body)
+        return recording.commit(start_ms, end_ms)
+
+    def _write(self, header: Dict, body: bytes) -> Dict:
+        token_id = header['token']
+        header_bytes = json.dumps(header, separators=(',', ':')).encode()
+        # Recover a missing index before appending to it
+        self.index(token_id)
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            segments = self._segments(token_id)
+            number = segments[-1] if segments else 0
+            path = self._segment_path(token_id, number)
+            if os.path.exists(path) and os.path.getsize(path) >= config.ARCHIVE_SEGMENT_BYTES:
+                number += 1
+                path = self._segment_path(token_id, number)
+            with open(path, 'ab') as f:
+                offset = f.tell()
+                f.write(RECORD_HEADER.pack(MAGIC, len(header_bytes), len(body)))
+                f.write(header_bytes)
+                f.write(body)
+            entry = dict(header, segment=number, offset=offset + RECORD_HEADER.size + len(header_bytes),
+                         length=len(body))
+            # The index line goes last: a crash in between leaves a record the
+            # index does not know about, never an index line without its record
+            with open(self._index_path(token_id), 'a') as f:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            if token_id in self._indexes:
+                self._indexes[token_id].append(entry)
+        ARCHIVE_BYTES.inc(header['raw_bytes'], kind='raw')
+        ARCHIVE_BYTES.inc(len(body), kind='stored')
+        return entry
+
+    def _scan(self, token_id: str, number: int, start: int = 0) -> List[Dict]:
+        """Index entries of every complete record in one segment, from byte `start` on"""
+        entries = []
+        with open(self._segment_path(token_id, number), 'rb') as f:
+            f.seek(start)
+            while True:
+                prefix = f.read(RECORD_HEADER.size)
+                if len(prefix) < RECORD_HEADER.size:
+                    break
+                magic, header_length, body_length = RECORD_HEADER.unpack(prefix)
+                if magic != MAGIC:
+                    logger.warning(f"⚠️  Archive segment {number} of {token_id} is corrupt after "
+                                   f"{f.tell() - RECORD_HEADER.size} bytes")
+                    break
+                header_bytes = f.read(header_length)
+                offset = f.tell()
+                f.seek(body_length, os.SEEK_CUR)
+                if len(header_bytes) < header_length or f.tell() > os.fstat(f.fileno()).st_size:
+                    break
+                entries.append(dict(json.loads(header_bytes), segment=number, offset=offset, length=body_length))
+        return entries
+
+    def rebuild_index(self, token_id: str) -> List[Dict]:
+        """Rewrite a token's index from its segments"""
+        with self.lock:
+            entries = [entry for number in self._segments(token_id) for entry in self._scan(token_id, number)]
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f'{self._index_path(token_id)}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.writelines(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries)
+            os.replace(tmp_path, self._index_path(token_id))
+            self._indexes[token_id] = entries
+        return entries
+
+    def _unindexed(self, token_id: str, entries: List[Dict]) -> List[Dict]:
+        """Records past the index's last entry, left by a crash between the record and its index line"""
+        last = entries[-1] if entries else None
+        missing = []
+        for number in self._segments(token_id):
+            if last is not None and number < last['segment']:
+                continue
+            start = last['offset'] + last['length'] if last is not None and number == last['segment'] else 0
+            if os.path.getsize(self._segment_path(token_id, number)) > start:
+                missing.extend(self._scan(token_id, number, start))
+        return missing
+
+    def index(self, token_id: str) -> List[Dict]:
+        """Index entries of a token's records, in archive order"""
+        if token_id not in self._indexes:
+            path = self._index_path(token_id)
+            if not os.path.exists(path):
+                return self.rebuild_index(token_id) if self._segments(token_id) else []
+            entries = []
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # A line cut short by a crash; appending after it would corrupt the next one
+                        logger.warning(f"⚠️  Archive index of {token_id} is damaged; rebuilding it")
+                        return self.rebuild_index(token_id)
+            with self.lock:
+                # Only the tail past the last indexed record is scanned, not the whole archive
+                missing = self._unindexed(token_id, entries)
+                if missing:
+                    logger.warning(f"⚠️  Indexing {len(missing)} archived record(s) of {token_id} "
+                                   f"missing from the index")
+                    with open(path, 'a') as f:
+                        f.writelines(json.dumps(entry, separators=(',', ':')) + '\n' for entry in missing)
+                self._indexes[token_id] = entries + missing
+        return self._indexes[token_id]
+
+    def find(self, token_id: str, endpoints=None, start_ms: int = None, end_ms: int = None) -> List[Dict]:
+        """
+        Index entries whose samples overlap a time window
+
+        Args:
+            token_id: Token
+            endpoints: Endpoint name or names to include (default: all)
+            start_ms: Window start in epoch milliseconds
+            end_ms: Window end in epoch milliseconds
+
+        Returns:
+            Matching entries in archive (fetch) order
+        """
+        entries = self.index(token_id)
+        if isinstance(endpoints, str):
+            endpoints = (endpoints,)
+        return [entry for entry in entries
+                if (endpoints is None or entry['endpoint'] in endpoints)
+                and (start_ms is None or entry['end'] >= start_ms)
+                and (end_ms is None or entry['start'] <= end_ms)]
+
+    def chunks(self, entry: Dict) -> Iterator[bytes]:
+        """Decompressed body of a record, read and inflated piece by piece"""
+        decompressor = _decompressor(entry['codec'])
+        with open(self._segment_path(entry['token'], entry['segment']), 'rb') as f:
+            f.seek(entry['offset'])
+            remaining = entry['length']
+            while remaining:
+                piece = f.read(min(READ_BYTES, remaining))
+                if not piece:
+                    raise ValueError(f"Archive record of {entry['token']} at segment {entry['segment']} "
+                                     f"offset {entry['offset']} is truncated")
+                remaining -= len(piece)
+                data = decompressor.decompress(piece)
+                if data:
+                    yield data
+        if entry['codec'] == 'zlib':
+            tail = decompressor.flush()
+            if tail:
+                yield tail
+
+    def read(self, entry: Dict) -> bytes:
+        """Decompressed body of a record"""
+        return b''.join(self.chunks(entry))
+
+    def market_series(self, token_id: str, start_ms: int = None, end_ms: int = None) -> Optional[MarketSeries]:
+        """
+        Every archived market_chart sample of a token within a window
+
+        CoinGecko's granularity depends on the requested range, so the
+        archive holds 5-minute, hourly and daily responses side by side.
+        Only responses of one granularity are used: the finest whose
+        responses cover as much of the window as any other. Overlapping
+        responses are merged; where several fetches hold the same
+        timestamp, the latest fetch wins.
+
+        Args:
+            token_id: Token
+            start_ms: Window start in epoch milliseconds
+            end_ms: Window end in epoch milliseconds
+
+        Returns:
+            MarketSeries sorted by time, or None if nothing is archived for the window
+        """
+        records = {}
+        for entry in self.find(token_id, MARKET_CHART_ENDPOINTS, start_ms, end_ms):
+            series = MarketSeries.from_stream(self.chunks(entry), entry['raw_bytes'])
+            if len(series):
+                level = infer_resolution(pd.Series(series.timestamps.astype('datetime64[ms]')))
+                records.setdefault(level, []).append((entry, series))
+        if not records:
+            return None
+
+        entries = [entry for found in records.values() for entry, _ in found]
+        lo = min(entry['start'] for entry in entries) if start_ms is None else start_ms
+        hi = max(entry['end'] for entry in entries) if end_ms is None else end_ms
+        covered = {level: _covered_ms([entry for entry, _ in found], lo, hi, LEVEL_MS[level])
+                   for level, found in records.items()}
+        # A coarse response's first and last samples sit up to one of its steps inside the window
+        slack = max(LEVEL_MS[level] for level in records)
+        level = min((level for level in records if covered[level] >= max(covered.values()) - slack),
+                    key=LEVEL_MS.get)
+        parts = [series for _, series in records[level]]
+
+        columns = [np.concatenate([getattr(series, name) for series in parts])
+                   for name in ('timestamps', 'price', 'volume', 'market_cap')]
+        # Reverse before the stable sort so the newest fetch comes first per timestamp
+        order = np.argsort(columns[0][::-1], kind='stable')
+        columns = [column[::-1][order] for column in columns]
+        timestamps = columns[0]
+        keep = np.ones(len(timestamps), dtype=bool)
+        keep[1:] = timestamps[1:] != timestamps[:-1]
+        if start_ms is not None:
+            keep &= timestamps >= start_ms
+        if end_ms is not None:
+            keep &= timestamps <= end_ms
+        series = MarketSeries(*(column[keep] for column in columns))
+        return series if len(series) else None
+
+    def current_data(self, token_id: str, at_ms: int = None) -> Optional[Dict]:
+        """Latest archived /coins/{id} response fetched at or before a time"""
+        entries = [entry for entry in self.find(token_id, 'coin')
+                   if at_ms is None or entry['fetched_at'] <= at_ms]
+        if not entries:
+            return None
+        return json.loads(self.read(max(entries, key=lambda entry: entry['fetched_at'])))
+
+
+def _covered_ms(entries: List[Dict], lo: int, hi: int, step: int) -> int:
+    """Milliseconds of [lo, hi] spanned by the entries; gaps up to one sample step count as covered"""
+    spans = sorted((max(entry['start'], lo), min(entry['end'], hi)) for entry in entries)
+    covered, current = 0, None
+    for start, end in spans:
+        if current is not None and start <= current[1] + step:
+            current[1] = max(current[1], end)
+            continue
+        if current is not None:
+            covered += current[1] - current[0]
+        current = [start, end]
+    return covered + (current[1] - current[0] if current is not None else 0)
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def default_archive() -> Optional[PayloadArchive]:
+    """Process-wide archive in config.ARCHIVE_DIR, or None when archiving is off"""
+    if not config.ARCHIVE_ENABLED:
+        return None
+    with _archives_lock:
+        archive = _archives.get(config.ARCHIVE_DIR)
+        if archive is None:
+            archive = _archives[config.ARCHIVE_DIR] = PayloadArchive(config.ARCHIVE_DIR)
+        return archive
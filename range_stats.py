@@ -0,0 +1,133 @@
+# range_stats.py - Constant-time statistics over arbitrary ranges of a dataset
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+from data_processor import DataProcessor
+
+
+class SparseTable:
+    """
+    Range argmin/argmax in O(1) after an O(n log n) build
+
+    Level k holds, for every position i, the index of the extreme value in
+    values[i:i + 2**k]. A query covers its range with two overlapping blocks.
+    """
+
+    def __init__(self, values: np.ndarray, mode: str = 'max'):
+        self.values = values
+        self.mode = mode
+        n = len(values)
+        self.levels = [np.arange(n, dtype='int64')]
+        width = 1
+        while width * 2 <= n:
+            prev = self.levels[-1]
+            left, right = prev[:n - 2 * width + 1], prev[width:n - width + 1]
+            self.levels.append(np.where(self._better(values[right], values[left]), right, left))
+            width *= 2
+
+    def _better(self, a, b):
+        return a > b if self.mode == 'max' else a < b
+
+    def query(self, lo: int, hi: int) -> int:
+        """Index of the extreme value in values[lo:hi] (hi exclusive, non-empty)"""
+        k = (hi - lo).bit_length() - 1
+        left = self.levels[k][lo]
+        right = self.levels[k][hi - (1 << k)]
+        return int(right if self._better(self.values[right], self.values[left]) else left)
+
+
+class ColumnIndex:
+    """Prefix sums and sparse tables for one numeric column"""
+
+    def __init__(self, values: np.ndarray):
+        values = np.asarray(values, dtype='float64')
+        valid = ~np.isnan(values)
+        self.values = values
+        self.shift = values[valid][0] if valid.any() else 0.0
+        centered = np.where(valid, values - self.shift, 0.0)
+
+        # Prefix arrays are one longer than the data so range sums are p[hi] - p[lo]
+        self.count = np.concatenate(([0], np.cumsum(valid, dtype='int64')))
+        self.sum = np.concatenate(([0.0], np.cumsum(centered)))
+        self.sumsq = np.concatenate(([0.0], np.cumsum(centered * centered)))
+        self.max = SparseTable(np.where(valid, values, -np.inf), 'max')
+        self.min = SparseTable(np.where(valid, values, np.inf), 'min')
+
+    def aggregate(self, lo: int, hi: int) -> Dict:
+        """
+        Aggregates over rows [lo, hi) in the aggregate_series layout
+
+        Sums, extrema and moments are O(1); the median needs a partial
+        sort of the range and is O(hi - lo).
+        """
+        nan = float('nan')
+        count = int(self.count[hi] - self.count[lo])
+        if count == 0:
+            return {'count': 0, 'sum': 0.0, 'mean': nan, 'std': nan, 'min': nan, 'max': nan,
+                    'argmax': lo, 'median': nan, 'first': nan, 'last': nan}
+
+        total = self.sum[hi] - self.sum[lo]
+        sumsq = self.sumsq[hi] - self.sumsq[lo]
+        mean_offset = total / count
+        variance = (sumsq - total * mean_offset) / (count - 1) if count > 1 else nan
+        argmax = self.max.query(lo, hi)
+        window = self.values[lo:hi]
+        window = window[~np.isnan(window)]
+
+        return {
+            'count': count,
+            'sum': total + self.shift * count,
+            'mean': self.shift + mean_offset,
+            'std': float(np.sqrt(max(variance, 0.0))) if count > 1 else nan,
+            'min': float(self.values[self.min.query(lo, hi)]),
+            'max': float(self.values[argmax]),
+            'argmax': argmax,
+            'median': float(np.median(window)),
+            'first': float(window[0]),
+            'last': float(window[-1])
+        }
+
+
+class RangeStatistics:
+    """
+    DataProcessor.calculate_statistics over any time range of a dataset
+
+    The indexes are built once per dataset; each range query then costs a
+    binary search for the bounds plus O(1) aggregate lookups.
+    """
+
+    def __init__(self, df: pd.DataFrame, processor: DataProcessor = None):
+        self.df = df
+        self.processor = processor or DataProcessor()
+        self.timestamps = df['timestamp'].to_numpy()
+        self.columns = {column: ColumnIndex(df[column].to_numpy()) for column in ('price', 'volume')}
+
+    def bounds(self, start=None, end=None) -> Tuple[int, int]:
+        """Row positions [lo, hi) covering [start, end]"""
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, np.datetime64(pd.Timestamp(start)), side='left'))
+        hi = len(self.timestamps) if end is None else int(np.searchsorted(self.timestamps, np.datetime64(pd.Timestamp(end)), side='right'))
+        return lo, max(lo, hi)
+
+    def aggregate(self, column: str, start=None, end=None) -> Dict:
+        """Aggregates of one column over [start, end]"""
+        return self.columns[column].aggregate(*self.bounds(start, end))
+
+    def statistics(self, start=None, end=None) -> Dict:
+        """
+        Statistics for [start, end] in the calculate_statistics layout
+
+        Args:
+            start: Range start (inclusive)
+            end: Range end (inclusive)
+
+        Returns:
+            Dictionary with period, price and volume statistics, or {} for an empty range
+        """
+        lo, hi = self.bounds(start, end)
+        if hi == lo:
+            return {}
+        window = self.df.iloc[lo:hi]
+        volume = dict(self.columns['volume'].aggregate(lo, hi))
+        volume['argmax'] -= lo
+        return self.processor.build_statistics(window, self.columns['price'].aggregate(lo, hi), volume)
@@ -6,17 +6,28 @@ import pandas as pd
 from datetime import datetime
 from typing import Dict
 import config
+from rollup import LEVEL_LABELS
+from spike_store import SpikeStore
+from shared_frame import publish_frame
+from logs import get_logger
+from metrics import REPORT_WRITE_SECONDS
+
+logger = get_logger(__name__)
 
 class ReportGenerator:
-    def __init__(self):
-        self.data_dir = config.DATA_DIR
-        self.reports_dir = config.REPORTS_DIR
+    def __init__(self, data_dir: str = None, reports_dir: str = None, token_id: str = None):
+        self.data_dir = data_dir or config.DATA_DIR
+        self.reports_dir = reports_dir or config.REPORTS_DIR
+        self.token_id = token_id or config.TOKEN_ID
+        self.token_name = self.token_id.upper()
+        self.file_prefix = self.token_id.lower()
         
         # Create directories if they don't exist
         os.makedirs(self.data_dir, exist_ok=True)
         os.makedirs(self.reports_dir, exist_ok=True)
     
-    def save_market_data(self, df: pd.DataFrame, filename: str = 'kaito_market_data.csv') -> str:
+    @REPORT_WRITE_SECONDS.time(report='market_data')
+    def save_market_data(self, df: pd.DataFrame, filename: str = None) -> str:
         """
         Save market data to CSV
         
@@ -27,102 +38,151 @@ class ReportGenerator:
         Returns:
             Path to saved file
         """
+        filename = filename or f'{self.file_prefix}_market_data.csv'
         output_path = os.path.join(self.data_dir, filename)
         df.to_csv(output_path, index=False)
-        print(f"✓ Market data saved to {output_path}")
+        logger.info(f"✓ Market data saved to {output_path}")
+        return output_path
+    
+    @REPORT_WRITE_SECONDS.time(report='shared_frame')
+    def publish_market_data(self, df: pd.DataFrame, filename: str = None) -> str:
+        """
+        Publish market data as a memory-mapped column file
+        
+        Chart export workers, the data service and the dashboard attach to
+        it instead of each parsing or unpickling their own copy.
+        
+        Args:
+            df: Market data DataFrame
+            filename: Output filename
+            
+        Returns:
+            Path to published file
+        """
+        filename = filename or f'{self.file_prefix}_market_data.mmap'
+        output_path = publish_frame(df, os.path.join(self.data_dir, filename))
+        logger.info(f"✓ Market data published to {output_path}")
         return output_path
     
-    def save_spike_data(self, spikes_df: pd.DataFrame, filename: str = 'kaito_spikes.csv') -> str:
+    @REPORT_WRITE_SECONDS.time(report='rollups')
+    def save_rollups(self, pyramid) -> list:
+        """
+        Save the rollup pyramid partitions changed since it was loaded
+        
+        Args:
+            pyramid: RollupPyramid instance
+            
+        Returns:
+            Paths to written partition files
+        """
+        paths = pyramid.save(self.data_dir)
+        logger.info(f"✓ Rollup pyramid ({', '.join(pyramid.levels)}) saved to {self.data_dir}/")
+        return paths
+    
+    @REPORT_WRITE_SECONDS.time(report='spikes')
+    def save_spike_data(self, spikes_df: SpikeStore, filename: str = None) -> str:
         """
         Save spike events to CSV
         
         Args:
-            spikes_df: Spike events DataFrame
+            spikes_df: Spike events
             filename: Output filename
             
         Returns:
             Path to saved file
         """
-        if spikes_df.empty:
-            print("No spike data to save")
+        spikes = SpikeStore.of(spikes_df)
+        if spikes.empty:
+            logger.info("No spike data to save")
             return None
         
+        filename = filename or f'{self.file_prefix}_spikes.csv'
         output_path = os.path.join(self.data_dir, filename)
-        spikes_df.to_csv(output_path, index=False)
-        print(f"✓ Spike data saved to {output_path}")
+        spikes.frame.to_csv(output_path, index=False)
+        logger.info(f"✓ Spike data saved to {output_path}")
         return output_path
     
-    def save_json_report(self, stats: Dict, spikes_df: pd.DataFrame, 
-                        filename: str = 'kaito_analysis.json') -> str:
+    @REPORT_WRITE_SECONDS.time(report='json')
+    def save_json_report(self, stats: Dict, spikes_df: SpikeStore, 
+                        filename: str = None) -> str:
         """
         Save comprehensive JSON report
         
         Args:
             stats: Statistics dictionary
-            spikes_df: Spike events DataFrame
+            spikes_df: Spike events
             filename: Output filename
             
         Returns:
             Path to saved file
         """
+        spikes = SpikeStore.of(spikes_df)
+        price_up = spikes.select(metric='price', direction='up')['change_pct']
+        price_down = spikes.select(metric='price', direction='down')['change_pct']
         report = {
             'metadata': {
                 'generated_at': datetime.now().isoformat(),
-                'token': config.TOKEN_ID,
+                'token': self.token_id,
                 'currency': config.VS_CURRENCY,
                 'analysis_days': stats['period']['days']
             },
             'statistics': stats,
             'spike_summary': {
-                'total_spikes': len(spikes_df),
-                'price_spikes': len(spikes_df[spikes_df['metric'] == 'price']) if not spikes_df.empty else 0,
-                'volume_spikes': len(spikes_df[spikes_df['metric'] == 'volume']) if not spikes_df.empty else 0,
-                'largest_price_increase': spikes_df[spikes_df['direction'] == 'up']['change_pct'].max() if not spikes_df.empty else 0,
-                'largest_price_decrease': spikes_df[spikes_df['direction'] == 'down']['change_pct'].min() if not spikes_df.empty else 0
+                'total_spikes': len(spikes),
+                'price_spikes': spikes.count(metric='price'),
+                'volume_spikes': spikes.count(metric='volume'),
+                'largest_price_increase': price_up.max() if not price_up.empty else 0,
+                'largest_price_decrease': price_down.min() if not price_down.empty else 0
             }
         }
         
         # Add spike details
-        if not spikes_df.empty:
-            report['spikes'] = spikes_df.to_dict('records')
+        if not spikes.empty:
+            report['spikes'] = spikes.records()
         
+        filename = filename or f'{self.file_prefix}_analysis.json'
         output_path = os.path.join(self.reports_dir, filename)
         with open(output_path, 'w') as f:
             json.dump(report, f, indent=2, default=str)
         
-        print(f"✓ JSON report saved to {output_path}")
+        logger.info(f"✓ JSON report saved to {output_path}")
         return output_path
     
-    def generate_text_report(self, stats: Dict, spikes_df: pd.DataFrame, 
-                           filename: str = 'kaito_analysis_report.txt') -> str:
+    @REPORT_WRITE_SECONDS.time(report='text')
+    def generate_text_report(self, stats: Dict, spikes_df: SpikeStore, 
+                           filename: str = None) -> str:
         """
         Generate human-readable text report
         
         Args:
             stats: Statistics dictionary
-            spikes_df: Spike events DataFrame
+            spikes_df: Spike events
             filename: Output filename
             
         Returns:
             Path to saved file
         """
+        filename = filename or f'{self.file_prefix}_analysis_report.txt'
         output_path = os.path.join(self.reports_dir, filename)
+        period = stats['period']['days']
         
         with open(output_path, 'w') as f:
             # Header
             f.write("=" * 80 + "\n")
-            f.write(" " * 20 + "KAITO TOKEN MARKET ANALYSIS REPORT\n")
+            f.write(" " * 20 + f"{self.token_name} TOKEN MARKET ANALYSIS REPORT\n")
             f.write("=" * 80 + "\n\n")
             
             f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write(f"Analysis Period: {stats['period']['start_date']} to {stats['period']['end_date']}\n")
-            f.write(f"Duration: {stats['period']['days']} days\n\n")
+            f.write(f"Duration: {stats['period']['days']} days "
+                    f"({stats['period'].get('rows', stats['period']['days'])} "
+                    f"{LEVEL_LABELS.get(stats['period'].get('resolution', '1d'), '').lower()} bars)\n\n")
             
             # Executive Summary
             f.write("EXECUTIVE SUMMARY\n")
             f.write("-" * 40 + "\n")
             f.write(f"• Current Price: ${stats['price']['current']:.4f}\n")
-            f.write(f"• 30-Day Change: {stats['price']['change_30d']:+.2f}% (${stats['price']['change_30d_usd']:+.4f})\n")
+            f.write(f"• {period}-Day Change: {stats['price']['change_30d']:+.2f}% (${stats['price']['change_30d_usd']:+.4f})\n")
             f.write(f"• Total Volume: ${stats['volume']['total_30d']:,.0f}\n")
             f.write(f"• Volatility: {stats['price']['volatility']:.2f}%\n")
             f.write(f"• Spike Events: {len(spikes_df)}\n\n")
@@ -131,8 +191,8 @@ class ReportGenerator:
             f.write("PRICE ANALYSIS\n")
             f.write("-" * 40 + "\n")
             f.write(f"• Current: ${stats['price']['current']:.4f}\n")
-            f.write(f"• 30-Day High: ${stats['price']['high']:.4f}\n")
-            f.write(f"• 30-Day Low: ${stats['price']['low']:.4f}\n")
+            f.write(f"• {period}-Day High: ${stats['price']['high']:.4f}\n")
+            f.write(f"• {period}-Day Low: ${stats['price']['low']:.4f}\n")
             f.write(f"• Average: ${stats['price']['average']:.4f}\n")
             f.write(f"• Median: ${stats['price']['median']:.4f}\n")
             f.write(f"• Standard Deviation: ${stats['price']['std_dev']:.4f}\n")
@@ -141,12 +201,30 @@ class ReportGenerator:
             # Volume Analysis
             f.write("VOLUME ANALYSIS\n")
             f.write("-" * 40 + "\n")
-            f.write(f"• Total (30d): ${stats['volume']['total_30d']:,.0f}\n")
+            f.write(f"• Total ({period}d): ${stats['volume']['total_30d']:,.0f}\n")
             f.write(f"• Daily Average: ${stats['volume']['average_daily']:,.0f}\n")
             f.write(f"• Daily Median: ${stats['volume']['median_daily']:,.0f}\n")
             f.write(f"• Highest: ${stats['volume']['highest']:,.0f} on {stats['volume']['highest_date']}\n")
             f.write(f"• Lowest: ${stats['volume']['lowest']:,.0f}\n\n")
             
+            # Correlations
+            if 'correlation' in stats:
+                f.write("CORRELATIONS\n")
+                f.write("-" * 40 + "\n")
+                for label, key in (('Full period', 'full_period'),
+                                   (f"Last {stats['correlation']['window']} bars", 'rolling')):
+                    value = stats['correlation'][key]['price']['volume']
+                    f.write(f"• Price/Volume ({label}): {value:+.3f}\n" if value is not None
+                            else f"• Price/Volume ({label}): n/a\n")
+                if 'basket_correlation' in stats:
+                    basket = stats['basket_correlation']
+                    own = f"{self.token_id} return"
+                    for column in basket['columns']:
+                        value = basket['full_period'].get(own, {}).get(column)
+                        if column.endswith(' return') and column != own and value is not None:
+                            f.write(f"• Returns vs {column[:-len(' return')].upper()}: {value:+.3f}\n")
+                f.write("\n")
+            
             # Current Market Data
             if 'current_market' in stats:
                 f.write("CURRENT MARKET DATA\n")
@@ -154,24 +232,25 @@ class ReportGenerator:
                 cm = stats['current_market']
                 f.write(f"• Market Cap: ${cm['market_cap']:,.0f}\n")
                 f.write(f"• FDV: ${cm['fully_diluted_valuation']:,.0f}\n")
-                f.write(f"• Circulating Supply: {cm['circulating_supply']:,.0f} KAITO\n")
-                f.write(f"• Total Supply: {cm['total_supply']:,.0f} KAITO\n")
+                f.write(f"• Circulating Supply: {cm['circulating_supply']:,.0f} {self.token_name}\n")
+                f.write(f"• Total Supply: {cm['total_supply']:,.0f} {self.token_name}\n")
                 f.write(f"• 24h Change: {cm['24h_change']:+.2f}%\n")
                 f.write(f"• 7d Change: {cm['7d_change']:+.2f}%\n")
                 f.write(f"• 30d Change: {cm['30d_change']:+.2f}%\n\n")
             
             # Spike Events
-            if not spikes_df.empty:
+            spikes = SpikeStore.of(spikes_df)
+            if not spikes.empty:
                 f.write("SPIKE EVENTS TIMELINE\n")
                 f.write("-" * 40 + "\n")
-                f.write(f"Total Events: {len(spikes_df)}\n\n")
+                f.write(f"Total Events: {len(spikes)}\n\n")
                 
-                for _, spike in spikes_df.iterrows():
-                    f.write(f"📍 {spike['timestamp'].strftime('%Y-%m-%d %H:%M')}\n")
-                    f.write(f"   Type: {spike['type'].replace('_', ' & ').title()}\n")
-                    f.write(f"   Change: {spike['change_pct']:+.2f}%\n")
-                    f.write(f"   Price: ${spike.get('price', spike.get('value', 0)):.4f}\n")
-                    f.write(f"   Volume: ${spike.get('volume', 0):,.0f}\n\n")
+                for spike in spikes.frame.itertuples(index=False):
+                    f.write(f"📍 {spike.timestamp.strftime('%Y-%m-%d %H:%M')}\n")
+                    f.write(f"   Type: {spike.type.replace('_', ' & ').title()}\n")
+                    f.write(f"   Change: {spike.change_pct:+.2f}%\n")
+                    f.write(f"   Price: ${spike.price:.4f}\n")
+                    f.write(f"   Volume: ${spike.volume:,.0f}\n\n")
             else:
                 f.write("SPIKE EVENTS\n")
                 f.write("-" * 40 + "\n")
@@ -182,29 +261,34 @@ class ReportGenerator:
             f.write("END OF REPORT\n")
             f.write("=" * 80 + "\n")
         
-        print(f"✓ Text report saved to {output_path}")
+        logger.info(f"✓ Text report saved to {output_path}")
         return output_path
     
-    def generate_summary(self, stats: Dict, spikes_df: pd.DataFrame) -> None:
+    def generate_summary(self, stats: Dict, spikes_df: SpikeStore) -> None:
         """
         Print summary to console
         
         Args:
             stats: Statistics dictionary
-            spikes_df: Spike events DataFrame
+            spikes_df: Spike events
         """
         print("\n" + "=" * 60)
         print(" " * 15 + "ANALYSIS SUMMARY")
         print("=" * 60)
-        print(f"Token: KAITO")
+        print(f"Token: {self.token_name}")
         print(f"Period: {stats['period']['days']} days")
         print(f"Current Price: ${stats['price']['current']:.4f}")
-        print(f"30-Day Change: {stats['price']['change_30d']:+.2f}%")
+        print(f"{stats['period']['days']}-Day Change: {stats['price']['change_30d']:+.2f}%")
         print(f"Volatility: {stats['price']['volatility']:.2f}%")
         print(f"Total Volume: ${stats['volume']['total_30d']:,.0f}")
         print(f"Spike Events: {len(spikes_df)}")
         
         if not spikes_df.empty:
-            print(f"Largest Price Spike: {spikes_df['change_pct'].max():+.2f}%")
+            print(f"Largest Price Spike: {SpikeStore.of(spikes_df).frame['change_pct'].max():+.2f}%")
+        
+        if 'build' in stats:
+            print(f"Rebuilt: {', '.join(stats['build']['built']) or 'nothing (inputs unchanged)'}")
+            if stats['build']['cached']:
+                print(f"Cached: {', '.join(stats['build']['cached'])}")
         
         print("=" * 60 + "\n")
\ No newline at end of file
@@ -0,0 +1,530 @@
+# rollup.py - Multi-resolution OHLCV rollup pyramid
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union
+import config
+from market_series import MarketSeries
+
+# Bucket width of each level in milliseconds
+LEVEL_MS = {
+    '5m': 5 * 60 * 1000,
+    '1h': 60 * 60 * 1000,
+    '1d': 24 * 60 * 60 * 1000,
+    '1w': 7 * 24 * 60 * 60 * 1000
+}
+
+# Weeks start on Monday (1970-01-01 was a Thursday)
+LEVEL_OFFSET_MS = {
+    '5m': 0,
+    '1h': 0,
+    '1d': 0,
+    '1w': 4 * 24 * 60 * 60 * 1000
+}
+
+LEVEL_LABELS = {
+    '5m': '5-Minute',
+    '1h': 'Hourly',
+    '1d': 'Daily',
+    '1w': 'Weekly'
+}
+
+BAR_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume',
+               'market_cap', 'samples', 'first_ts', 'last_ts']
+
+# Each level is stored as one file per calendar month ('M') or year ('Y') of
+# its bucket starts. A bucket never spans more than two of its child level's
+# partitions, and an append rewrites only the partitions it touched.
+LEVEL_PARTITION = {
+    '5m': 'M',
+    '1h': 'M',
+    '1d': 'Y',
+    '1w': 'Y'
+}
+
+# Per-level file holding every partition's row count
+ROWS_INDEX = 'rows.json'
+
+TimeLike = Union[int, str, pd.Timestamp, None]
+
+
+def bucket_start(ts_ms: np.ndarray, level: str) -> np.ndarray:
+    """
+    Floor epoch-millisecond timestamps to the start of their bucket
+
+    Args:
+        ts_ms: Timestamps in epoch milliseconds
+        level: Rollup level name
+
+    Returns:
+        Bucket start timestamps in epoch milliseconds
+    """
+    width = LEVEL_MS[level]
+    offset = LEVEL_OFFSET_MS[level]
+    return (ts_ms - offset) // width * width + offset
+
+
+def partition_keys(ts_ms: np.ndarray, level: str) -> np.ndarray:
+    """
+    Partition key ('2026-01' or '2026') of bucket-start timestamps
+
+    Args:
+        ts_ms: Timestamps in epoch milliseconds
+        level: Rollup level name
+
+    Returns:
+        Array of key strings, ordered like the timestamps
+    """
+    ts = np.asarray(ts_ms, dtype='int64').astype('datetime64[ms]')
+    return np.datetime_as_string(ts.astype(f'datetime64[{LEVEL_PARTITION[level]}]'))
+
+
+def infer_resolution(timestamps: pd.Series) -> str:
+    """
+    Infer the rollup level closest to the median spacing of a series
+
+    Args:
+        timestamps: Datetime series
+
+    Returns:
+        Level name
+    """
+    if len(timestamps) < 2:
+        return '1d'
+
+    ts_ms = timestamps.astype('datetime64[ms]').astype('int64').to_numpy()
+    spacing = np.median(np.diff(ts_ms))
+    return min(LEVEL_MS, key=lambda level: abs(np.log(LEVEL_MS[level] / max(spacing, 1))))
+
+
+def period_label(resolution: str) -> str:
+    """Bar unit used in window labels, e.g. 'day' for a 7-day moving average"""
+    return {'5m': '5-min', '1h': 'hour', '1d': 'day', '1w': 'week'}.get(resolution, 'period')
+
+
+def _to_ms(value: TimeLike) -> Optional[int]:
+    """Convert a timestamp-like value to epoch milliseconds"""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return int(ts.value // 1_000_000)
+
+
+class RollupPyramid:
+    """
+    OHLCV bars at 5m, 1h, 1d and 1w resolution
+
+    The finest level is built from raw market_chart samples and every
+    coarser level is derived from the level directly below it. Appending
+    new samples only re-aggregates the buckets they touch at each level.
+
+    Each level is held as partitions (see LEVEL_PARTITION). A loaded
+    pyramid reads a partition from disk the first time it is needed,
+    save() writes only the partitions changed since, and release() drops
+    saved partitions from memory, so a long store is never held whole.
+    Next to each base-level partition the time of every sample it holds
+    is kept, so a sample fetched again is never counted twice.
+
+    CoinGecko's total_volumes are rolling 24h volumes sampled at each
+    point, so a bar's volume and market cap are the values at its close.
+    """
+
+    def __init__(self, token_id: str = None, levels: List[str] = None, directory: str = None):
+        """
+        Args:
+            token_id: Token the bars belong to (default: config.TOKEN_ID)
+            levels: Level names, finest first (default: config.ROLLUP_LEVELS)
+            directory: Directory saved partitions are read from; None holds everything in memory
+        """
+        self.token_id = token_id or config.TOKEN_ID
+        self.levels = levels or list(config.ROLLUP_LEVELS)
+        self.directory = directory
+        self._parts = {level: {} for level in self.levels}
+        self._stored = {level: set() for level in self.levels}
+        self._dirty = {level: set() for level in self.levels}
+        self._rows = {level: {} for level in self.levels}
+        self._samples = {}
+        self._migrated = set()
+
+    @staticmethod
+    def _empty_bars() -> pd.DataFrame:
+        df = pd.DataFrame({column: pd.Series(dtype='float64') for column in BAR_COLUMNS})
+        for column in ('timestamp', 'samples', 'first_ts', 'last_ts'):
+            df[column] = df[column].astype('int64')
+        return df
+
+    @classmethod
+    def _typed(cls, bars: pd.DataFrame) -> pd.DataFrame:
+        return bars[BAR_COLUMNS].astype(cls._empty_bars().dtypes.to_dict())
+
+    @staticmethod
+    def _samples_to_bars(raw_data: Union[Dict, MarketSeries]) -> pd.DataFrame:
+        """Turn raw market_chart arrays (or a parsed MarketSeries) into single-sample bars"""
+        series = MarketSeries.from_market_chart(raw_data)
+        ts_ms = series.timestamps
+        price = series.price
+
+        bars = pd.DataFrame({
+            'timestamp': ts_ms,
+            'open': price,
+            'high': price,
+            'low': price,
+            'close': price,
+            'volume': series.volume,
+            'market_cap': series.market_cap,
+            'samples': np.ones(len(ts_ms), dtype='int64'),
+            'first_ts': ts_ms,
+            'last_ts': ts_ms
+        })
+        return bars.drop_duplicates('first_ts', keep='last')
+
+    @staticmethod
+    def _aggregate(bars: pd.DataFrame, level: str) -> pd.DataFrame:
+        """Merge bars into buckets of the given level"""
+        if bars.empty:
+            return RollupPyramid._empty_bars()
+
+        bars = bars.assign(timestamp=bucket_start(bars['first_ts'].to_numpy(), level))
+
+        by_open = bars.sort_values('first_ts', kind='stable').groupby('timestamp', sort=True)
+        by_close = bars.sort_values('last_ts', kind='stable').groupby('timestamp', sort=True)
+
+        result = pd.DataFrame({
+            'open': by_open['open'].first(),
+            'high': by_open['high'].max(),
+            'low': by_open['low'].min(),
+            'close': by_close['close'].last(),
+            'volume': by_close['volume'].last(),
+            'market_cap': by_close['market_cap'].last(),
+            'samples': by_open['samples'].sum(),
+            'first_ts': by_open['first_ts'].min(),
+            'last_ts': by_close['last_ts'].max()
+        }).reset_index()
+        return result[BAR_COLUMNS]
+
+    @staticmethod
+    def _replace_buckets(existing: pd.DataFrame, updated: pd.DataFrame) -> pd.DataFrame:
+        """Swap the rows of touched buckets for their re-aggregated versions"""
+        if existing.empty:
+            return updated.reset_index(drop=True)
+        kept = existing[~existing['timestamp'].isin(updated['timestamp'])]
+        merged = pd.concat([kept, updated], ignore_index=True)
+        return merged.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+    def _level_dir(self, directory: str, level: str) -> str:
+        return os.path.join(directory, f"{self.token_id}_rollup_{level}")
+
+    def _legacy_path(self, directory: str, level: str) -> str:
+        """Single-file level written before levels were partitioned"""
+        return os.path.join(directory, f"{self.token_id}_rollup_{level}.csv")
+
+    def _keys(self, level: str) -> List[str]:
+        return sorted(self._stored[level].union(self._parts[level]))
+
+    def _part(self, level: str, key: str) -> pd.DataFrame:
+        """One partition's bars, read from disk on first use"""
+        bars = self._parts[level].get(key)
+        if bars is None:
+            if key not in self._stored[level]:
+                return self._empty_bars()
+            path = os.path.join(self._level_dir(self.directory, level), f"{key}.csv")
+            # round_trip parses every saved float back to the exact value written
+            bars = self._parts[level][key] = self._typed(pd.read_csv(path, float_precision='round_trip'))
+        return bars
+
+    def _samples_path(self, directory: str, key: str) -> str:
+        return os.path.join(self._level_dir(directory, self.levels[0]), f"{key}.samples.npy")
+
+    def _sample_times(self, key: str) -> np.ndarray:
+        """Sorted times of every sample a base-level partition holds"""
+        times = self._samples.get(key)
+        if times is None:
+            path = self._samples_path(self.directory, key) if self.directory is not None else None
+            if path is not None and os.path.exists(path):
+                times = np.load(path)
+            else:
+                # Stores written before sample times were kept only know each bar's edges
+                bars = self._part(self.levels[0], key)
+                times = np.union1d(bars['first_ts'].to_numpy(), bars['last_ts'].to_numpy())
+            self._samples[key] = times
+        return times
+
+    def _store_buckets(self, level: str, updated: pd.DataFrame) -> None:
+        """Merge re-aggregated buckets into the partitions they fall in"""
+        keys = partition_keys(updated['timestamp'].to_numpy(), level)
+        for key in np.unique(keys):
+            merged = self._replace_buckets(self._part(level, key), updated[keys == key])
+            self._parts[level][key] = merged
+            self._dirty[level].add(key)
+
+    def append(self, raw_data: Union[Dict, MarketSeries]) -> Dict[str, int]:
+        """
+        Ingest raw market_chart data and update every level incrementally
+
+        Only the partitions holding the touched buckets are read and
+        rebuilt, so appending to a long store costs the same as to a short one.
+
+        Args:
+            raw_data: Raw data from CoinGecko API, or a MarketSeries parsed from it
+
+        Returns:
+            Number of buckets touched per level
+        """
+        touched = {level: 0 for level in self.levels}
+        if not raw_data:
+            return touched
+
+        incoming = self._samples_to_bars(raw_data)
+        if incoming.empty:
+            return touched
+
+        base = self.levels[0]
+        keys = partition_keys(bucket_start(incoming['first_ts'].to_numpy(), base), base)
+        affected = []
+        for key in np.unique(keys):
+            existing = self._part(base, key)
+            rows = incoming[keys == key]
+            known = self._sample_times(key)
+            rows = rows[~np.isin(rows['first_ts'].to_numpy(), known)]
+            if rows.empty:
+                continue
+            self._samples[key] = np.union1d(known, rows['first_ts'].to_numpy())
+            buckets = np.unique(bucket_start(rows['first_ts'].to_numpy(), base))
+            current = existing[existing['timestamp'].isin(buckets)]
+            updated = self._aggregate(pd.concat([current, rows], ignore_index=True), base)
+            self._store_buckets(base, updated)
+            touched[base] += len(updated)
+            affected.append(buckets)
+        if not affected:
+            return touched
+
+        affected = np.concatenate(affected)
+        for child, level in zip(self.levels, self.levels[1:]):
+            affected = np.unique(bucket_start(affected, level))
+            # The child partitions holding each bucket's first and last instant
+            child_keys = np.union1d(partition_keys(affected, child),
+                                    partition_keys(affected + LEVEL_MS[level] - 1, child))
+            parts = [self._part(child, key) for key in child_keys]
+            child_bars = pd.concat([part for part in parts if not part.empty], ignore_index=True)
+            parents = bucket_start(child_bars['timestamp'].to_numpy(), level)
+            updated = self._aggregate(child_bars[np.isin(parents, affected)], level)
+            self._store_buckets(level, updated)
+            touched[level] = len(updated)
+
+        return touched
+
+    def _range(self, level: str, start: TimeLike, end: TimeLike, warmup: int = 0):
+        """
+        Bars of the partitions overlapping [start, end], with positional bounds of the range in them
+
+        With warmup, earlier partitions are added until up to that many
+        bars precede the range.
+        """
+        start_ms = _to_ms(start)
+        end_ms = _to_ms(end)
+        keys = self._keys(level)
+        first = 0
+        if start_ms is not None:
+            key = str(partition_keys(bucket_start(np.int64(start_ms), level), level))
+            first = int(np.searchsorted(keys, key, side='left'))
+        last = len(keys)
+        if end_ms is not None:
+            last = int(np.searchsorted(keys, str(partition_keys(np.int64(end_ms), level)), side='right'))
+        parts = [part for part in (self._part(level, key) for key in keys[first:max(first, last)]) if not part.empty]
+        bars = pd.concat(parts, ignore_index=True) if parts else self._empty_bars()
+
+        ts = bars['timestamp'].to_numpy()
+        lo = 0 if start_ms is None else int(np.searchsorted(ts, bucket_start(np.int64(start_ms), level), side='left'))
+        hi = len(ts) if end_ms is None else int(np.searchsorted(ts, end_ms, side='right'))
+        hi = max(lo, hi)
+        while lo < warmup and first > 0:
+            first -= 1
+            earlier = self._part(level, keys[first])
+            bars = pd.concat([earlier, bars], ignore_index=True) if not bars.empty else earlier
+            lo, hi = lo + len(earlier), hi + len(earlier)
+        return bars, lo, hi
+
+    def _partition_rows(self, level: str, key: str) -> int:
+        """Bars in one partition, from the saved row counts when it is not in memory"""
+        bars = self._parts[level].get(key)
+        if bars is None and key in self._rows[level]:
+            return self._rows[level][key]
+        return len(self._part(level, key)) if bars is None else len(bars)
+
+    def row_count(self, level: str, start: TimeLike = None, end: TimeLike = None) -> int:
+        """Number of bars a level holds inside [start, end]"""
+        if start is None and end is None:
+            # The whole level is counted without reading its partitions
+            return sum(self._partition_rows(level, key) for key in self._keys(level))
+        _, lo, hi = self._range(level, start, end)
+        return hi - lo
+
+    def select_level(self, start: TimeLike = None, end: TimeLike = None,
+                     max_rows: int = None) -> str:
+        """
+        Pick the finest level that covers a range within the row budget
+
+        Args:
+            start: Range start (inclusive)
+            end: Range end (inclusive)
+            max_rows: Row budget, defaults to config.ROLLUP_MAX_ROWS
+
+        Returns:
+            Level name
+        """
+        max_rows = max_rows or config.ROLLUP_MAX_ROWS
+        populated = [level for level in self.levels if self._keys(level)]
+        if not populated:
+            return self.levels[-1]
+
+        counts = [self.row_count(level, start, end) for level in populated]
+        for i, count in enumerate(counts):
+            if count <= max_rows:
+                # A level with no more bars than its parent adds no detail
+                # (e.g. the 5m level when only hourly samples were ingested)
+                while i + 1 < len(counts) and counts[i + 1] >= counts[i]:
+                    i += 1
+                return populated[i]
+        return populated[-1]
+
+    def level(self, level: str, start: TimeLike = None, end: TimeLike = None, warmup: int = 0) -> pd.DataFrame:
+        """
+        Bars of one level inside [start, end]
+
+        Only the partitions overlapping the range are read.
+
+        Args:
+            level: Level name
+            start: Range start (inclusive)
+            end: Range end (inclusive)
+            warmup: Also return up to this many bars before start, for
+                features that read earlier bars; the number returned is
+                kept in attrs['warmup']
+
+        Returns:
+            DataFrame with datetime timestamps and OHLCV columns
+        """
+        bars, lo, hi = self._range(level, start, end, warmup)
+        begin = max(0, lo - warmup)
+        bars = bars.iloc[begin:hi].copy()
+        bars['timestamp'] = pd.to_datetime(bars['timestamp'], unit='ms')
+        bars.attrs['resolution'] = level
+        bars.attrs['warmup'] = lo - begin
+        return bars.reset_index(drop=True)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the partitions currently in memory"""
+        return int(sum(bars.memory_usage(index=True).sum()
+                       for parts in self._parts.values() for bars in parts.values()))
+
+    def span(self) -> Optional[tuple]:
+        """First and last sample time held by the pyramid"""
+        base = self.levels[0]
+        keys = self._keys(base)
+        if not keys:
+            return None
+        return (pd.to_datetime(self._part(base, keys[0])['first_ts'].iloc[0], unit='ms'),
+                pd.to_datetime(self._part(base, keys[-1])['last_ts'].iloc[-1], unit='ms'))
+
+    def save(self, directory: str = None) -> List[str]:
+        """
+        Write the partitions changed since the last save or load
+
+        Args:
+            directory: Output directory, defaults to the directory loaded from or config.DATA_DIR
+
+        Returns:
+            Paths of written files
+        """
+        directory = directory or self.directory or config.DATA_DIR
+        if self.directory is not None and os.path.abspath(directory) != os.path.abspath(self.directory):
+            # A different directory gets the whole pyramid
+            for level in self.levels:
+                for key in self._keys(level):
+                    self._part(level, key)
+                    self._dirty[level].add(key)
+            for key in self._keys(self.levels[0]):
+                self._sample_times(key)
+        paths = []
+        for level in self.levels:
+            level_dir = self._level_dir(directory, level)
+            os.makedirs(level_dir, exist_ok=True)
+            for key in sorted(self._dirty[level]):
+                path = os.path.join(level_dir, f"{key}.csv")
+                # Written aside and renamed, so a crash never leaves half a partition
+                self._parts[level][key].to_csv(f"{path}.tmp", index=False)
+                os.replace(f"{path}.tmp", path)
+                paths.append(path)
+                if level == self.levels[0]:
+                    samples_path = self._samples_path(directory, key)
+                    with open(f"{samples_path}.tmp", 'wb') as f:
+                        np.save(f, self._sample_times(key))
+                    os.replace(f"{samples_path}.tmp", samples_path)
+            self._stored[level].update(self._dirty[level])
+            self._dirty[level].clear()
+            # Row counts of every partition, so counting a level reads no bars
+            rows = {key: self._partition_rows(level, key) for key in self._keys(level)}
+            index_path = os.path.join(level_dir, ROWS_INDEX)
+            with open(f"{index_path}.tmp", 'w') as f:
+                json.dump(rows, f, sort_keys=True)
+            os.replace(f"{index_path}.tmp", index_path)
+            self._rows[level] = rows
+            if level in self._migrated:
+                # Every bar of the old single file is now in a partition
+                legacy = self._legacy_path(directory, level)
+                if os.path.exists(legacy):
+                    os.remove(legacy)
+        self._migrated.clear()
+        self.directory = directory
+        return paths
+
+    def release(self) -> None:
+        """Drop saved partitions from memory; they are read back when next needed"""
+        if self.directory is None:
+            return
+        for level in self.levels:
+            for key in [key for key in self._parts[level] if key not in self._dirty[level]]:
+                del self._parts[level][key]
+        for key in [key for key in self._samples if key not in self._dirty[self.levels[0]]]:
+            del self._samples[key]
+
+    @classmethod
+    def load(cls, directory: str = None, token_id: str = None) -> 'RollupPyramid':
+        """
+        Open a pyramid saved with save(), or an empty one if none exists
+
+        Partitions are listed here and read on first use.
+
+        Args:
+            directory: Directory holding the level partitions
+            token_id: Token the pyramid belongs to
+
+        Returns:
+            RollupPyramid instance
+        """
+        directory = directory or config.DATA_DIR
+        pyramid = cls(token_id, directory=directory)
+        for level in pyramid.levels:
+            level_dir = pyramid._level_dir(directory, level)
+            if os.path.isdir(level_dir):
+                pyramid._stored[level] = {name[:-4] for name in os.listdir(level_dir) if name.endswith('.csv')}
+                index_path = os.path.join(level_dir, ROWS_INDEX)
+                if os.path.exists(index_path):
+                    with open(index_path) as f:
+                        pyramid._rows[level] = json.load(f)
+                continue
+            legacy = pyramid._legacy_path(directory, level)
+            if os.path.exists(legacy):
+                # A level saved as one file is split into partitions now and migrated on the next save
+                bars = pd.read_csv(legacy, float_precision='round_trip')
+                if not bars.empty:
+                    pyramid._store_buckets(level, pyramid._typed(bars))
+                pyramid._migrated.add(level)
+        return pyramid
@@ -0,0 +1,107 @@
+# shared_frame.py - Fixed-layout column files that processes memory-map and share
+
+import os
+import json
+import struct
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+# Layout: MAGIC, header length, JSON header (row count, columns with dtype and
+# offset, frame attrs), then each column's raw values starting on an
+# ALIGNMENT boundary so every column can be viewed in place
+MAGIC = b'KSF1'
+PREFIX = struct.Struct('<4sI')
+ALIGNMENT = 64
+
+# Bool, integer, float and naive datetime64 columns have a fixed width
+FIXED_KINDS = 'biufM'
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def publish_frame(df: pd.DataFrame, path: str) -> str:
+    """
+    Write a frame's columns to a memory-mappable file
+
+    The file is written next to its destination and renamed over it, so
+    processes attached to the previous version keep a consistent mapping
+    until they attach again.
+
+    Args:
+        df: Frame with fixed-width (numeric, bool or datetime64) columns
+        path: Destination file
+
+    Returns:
+        path
+
+    Raises:
+        ValueError: A column has no fixed-width layout (strings, categoricals)
+    """
+    arrays, columns, offset = [], [], 0
+    for name in df.columns:
+        values = np.ascontiguousarray(df[name].to_numpy())
+        if values.dtype.kind not in FIXED_KINDS:
+            raise ValueError(f"Column {name!r} has dtype {df[name].dtype}, which has no fixed-width layout")
+        columns.append({'name': str(name), 'dtype': values.dtype.str, 'offset': offset})
+        arrays.append(values)
+        offset = _aligned(offset + values.nbytes)
+    header = json.dumps({'rows': len(df), 'columns': columns, 'attrs': df.attrs},
+                        default=str).encode()
+    data_start = _aligned(PREFIX.size + len(header))
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        for column, values in zip(columns, arrays):
+            f.seek(data_start + column['offset'])
+            f.write(values.view('uint8'))
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_header(path: str) -> Dict:
+    """
+    Header of a shared frame file, with the byte offset its columns start at
+
+    Raises:
+        ValueError: Not a shared frame file
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(PREFIX.size)
+        if len(prefix) < PREFIX.size or prefix[:4] != MAGIC:
+            raise ValueError(f"{path} is not a shared frame file")
+        length = PREFIX.unpack(prefix)[1]
+        header = json.loads(f.read(length))
+    header['data_start'] = _aligned(PREFIX.size + length)
+    return header
+
+
+def attach_frame(path: str) -> pd.DataFrame:
+    """
+    Map a published frame without copying it
+
+    Every column is a read-only view into one shared mapping, so any number
+    of processes attached to the same file hold a single physical copy in
+    the page cache. Writes raise; pandas copies on its own where it needs to.
+
+    Args:
+        path: File written by publish_frame
+
+    Returns:
+        DataFrame with a RangeIndex and the published attrs
+    """
+    header = read_header(path)
+    rows = header['rows']
+    buffer = np.memmap(path, dtype='uint8', mode='r')
+    columns = {}
+    for column in header['columns']:
+        columns[column['name']] = np.ndarray((rows,), dtype=np.dtype(column['dtype']), buffer=buffer,
+                                             offset=header['data_start'] + column['offset'])
+    df = pd.DataFrame(columns, index=pd.RangeIndex(rows), copy=False)
+    df.attrs.update(header['attrs'])
+    return df
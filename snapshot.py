@@ -0,0 +1,108 @@
+# snapshot.py - Immutable dataset snapshots shared across dashboard sessions
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from typing import Dict
+import config
+
+try:
+    import pyarrow  # noqa: F401
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+
+def freeze_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rebuild a frame on read-only column arrays
+
+    In-place writes into a frozen frame raise instead of silently changing
+    data other sessions hold. Slices (iloc, boolean masks on columns) are
+    new frame objects over the same buffers, so adding a column to a
+    derived view never touches the snapshot. String columns move to Arrow
+    storage when pyarrow is installed and config.SNAPSHOT_ARROW_STRINGS is set.
+
+    Args:
+        df: DataFrame to freeze
+
+    Returns:
+        Frozen DataFrame with the same columns, index and attrs
+    """
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Codes and categories are immutable through the public API
+            columns[name] = series.array
+            continue
+        if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            if ARROW_AVAILABLE and config.SNAPSHOT_ARROW_STRINGS:
+                columns[name] = series.astype('string[pyarrow]').array
+            else:
+                columns[name] = series.array
+            continue
+        values = np.array(series.to_numpy(), copy=True)
+        values.setflags(write=False)
+        columns[name] = values
+    frozen = pd.DataFrame(columns, index=df.index, copy=False)
+    frozen.attrs.update(df.attrs)
+    return frozen
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """Bytes held by a frame's columns, including string payloads"""
+    if df is None or df.empty:
+        return 0
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def object_nbytes(value, _seen=None) -> int:
+    """
+    Approximate deep size of a session state value
+
+    Frames are measured by their buffers; containers are walked once per
+    object so shared references are not counted twice.
+    """
+    _seen = set() if _seen is None else _seen
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum() if isinstance(value, pd.DataFrame)
+                   else value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(object_nbytes(k, _seen) + object_nbytes(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(object_nbytes(item, _seen) for item in value)
+    return size
+
+
+def process_rss() -> int:
+    """Resident set size of this process in bytes, or 0 where unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return 0
+
+
+def snapshot_nbytes(data: Dict) -> Dict[str, int]:
+    """Bytes held by each part of a loaded dashboard dataset"""
+    pyramid = data.get('rollups')
+    return {
+        'market': frame_nbytes(data.get('market')),
+        'spikes': data['spikes'].nbytes if data.get('spikes') is not None else 0,
+        'rollups': pyramid.nbytes if pyramid else 0
+    }
@@ -0,0 +1,185 @@
+# spike_store.py - Fixed-schema spike events with type, metric, direction and time indexes
+
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+SPIKE_TYPES = ['price', 'volume', 'price_and_volume']
+SPIKE_METRICS = ['price', 'volume']
+SPIKE_DIRECTIONS = ['up', 'down']
+CATEGORIES = {'type': SPIKE_TYPES, 'metric': SPIKE_METRICS, 'direction': SPIKE_DIRECTIONS}
+FLOAT_COLUMNS = ['change_pct', 'absolute_change', 'value', 'price', 'volume', 'volume_change_pct']
+SPIKE_COLUMNS = ['timestamp', 'date', 'type', 'metric', 'direction'] + FLOAT_COLUMNS
+
+_EMPTY = np.empty(0, dtype='int64')
+
+
+def spike_frame(events=None) -> pd.DataFrame:
+    """
+    Coerce spike events to the fixed schema, sorted by timestamp
+
+    Every row has every column: `price` and `volume` are the bar's price
+    and volume whatever the spike type, and `volume_change_pct` is NaN on
+    price-only spikes. `type`, `metric` and `direction` are categoricals
+    with fixed categories, so frames from different runs share codes.
+
+    Args:
+        events: Spike records, a loosely typed frame (e.g. read back from
+            CSV) or None for an empty frame
+
+    Returns:
+        DataFrame with SPIKE_COLUMNS and a RangeIndex
+    """
+    df = pd.DataFrame(events if events is not None else [])
+    n = len(df)
+
+    def column(name):
+        return df[name] if name in df.columns else pd.Series(np.nan, index=df.index)
+
+    timestamp = pd.to_datetime(column('timestamp')).astype('datetime64[ns]')
+    date = pd.to_datetime(df['date']) if 'date' in df.columns else timestamp
+    columns = {
+        'timestamp': timestamp.to_numpy(),
+        'date': date.dt.normalize().astype('datetime64[ns]').to_numpy()
+    }
+    for name, categories in CATEGORIES.items():
+        columns[name] = pd.Categorical(column(name), categories=categories)
+    for name in FLOAT_COLUMNS:
+        columns[name] = pd.to_numeric(column(name), errors='coerce').to_numpy(dtype='float64', copy=True)
+    # Older spike files only carry the spiking metric's level in `value`
+    for name in SPIKE_METRICS:
+        missing = np.isnan(columns[name]) & (columns['metric'] == name)
+        columns[name][missing] = columns['value'][missing]
+
+    frame = pd.DataFrame(columns, index=pd.RangeIndex(n))
+    if n and not frame['timestamp'].is_monotonic_increasing:
+        frame = frame.sort_values('timestamp', kind='stable', ignore_index=True)
+    return frame
+
+
+class SpikeStore:
+    """
+    Spike events indexed by category and time
+
+    Rows are sorted by timestamp. The positions of each type, metric and
+    direction are taken from the category codes once; a combination such
+    as price spikes up is intersected on first use and memoized, together
+    with its timestamps. A query then narrows to its group and bisects the
+    group's timestamps, so "price spikes up between X and Y" is two
+    searchsorted calls rather than boolean scans over every row, however
+    many consumers ask.
+    """
+
+    def __init__(self, frame: pd.DataFrame = None):
+        """
+        Args:
+            frame: Events already in the spike_frame schema (default: empty)
+        """
+        self.frame = spike_frame() if frame is None else frame
+        self._ns = self.frame['timestamp'].to_numpy().view('int64')
+        all_positions = np.arange(len(self.frame))
+        self._groups = {(): (all_positions, self._ns)}
+        for name, categories in CATEGORIES.items():
+            codes = self.frame[name].cat.codes.to_numpy()
+            for code, category in enumerate(categories):
+                positions = np.flatnonzero(codes == code)
+                self._groups[((name, category),)] = (positions, self._ns[positions])
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'SpikeStore':
+        return cls(spike_frame(records))
+
+    @classmethod
+    def of(cls, spikes) -> 'SpikeStore':
+        """Pass a store through; build one from a DataFrame, records or None"""
+        if isinstance(spikes, SpikeStore):
+            return spikes
+        return cls(spike_frame(spikes))
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.frame) == 0
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the frame and the indexes built so far"""
+        index_bytes = sum(positions.nbytes + times.nbytes for key, (positions, times) in self._groups.items() if key)
+        return int(self.frame.memory_usage(index=True, deep=True).sum()) + index_bytes
+
+    def _group(self, filters: Tuple) -> Tuple[np.ndarray, np.ndarray]:
+        group = self._groups.get(filters)
+        if group is not None:
+            return group
+        if len(filters) == 1:
+            name, value = filters[0]
+            if isinstance(value, str):
+                # Not one of CATEGORIES[name]
+                positions = _EMPTY
+            else:
+                # A list of categories is the union of their groups
+                parts = [self._group(((name, category),))[0] for category in value]
+                positions = np.sort(np.concatenate(parts)) if parts else _EMPTY
+        else:
+            positions = self._group(filters[:1])[0]
+            for single in filters[1:]:
+                positions = np.intersect1d(positions, self._group((single,))[0], assume_unique=True)
+        group = self._groups[filters] = (positions, self._ns[positions])
+        return group
+
+    def positions(self, spike_type=None, metric=None, direction=None, start=None, end=None) -> np.ndarray:
+        """
+        Row positions of matching events, in time order
+
+        Args:
+            spike_type: 'price', 'volume' or 'price_and_volume', or a list of them
+            metric: 'price' or 'volume', or a list of them
+            direction: 'up' or 'down', or a list of them
+            start: Drop events before this time
+            end: Drop events after this time
+
+        Returns:
+            Positions into self.frame
+        """
+        filters = []
+        for name, value in (('type', spike_type), ('metric', metric), ('direction', direction)):
+            if value is None:
+                continue
+            if not isinstance(value, str):
+                value = tuple(sorted(set(value)))
+                if len(value) == 1:
+                    value = value[0]
+            filters.append((name, value))
+        positions, times = self._group(tuple(filters))
+        if start is None and end is None:
+            return positions
+        lo = 0 if start is None else np.searchsorted(times, pd.Timestamp(start).as_unit('ns').value, side='left')
+        hi = len(times) if end is None else np.searchsorted(times, pd.Timestamp(end).as_unit('ns').value, side='right')
+        return positions[lo:hi]
+
+    def count(self, **query) -> int:
+        """Number of events matching a positions() query"""
+        return len(self.positions(**query))
+
+    def select(self, **query) -> pd.DataFrame:
+        """
+        Events matching a positions() query
+
+        Returns:
+            The whole frame when nothing is filtered out, otherwise the
+            matching rows with their original index
+        """
+        positions = self.positions(**query)
+        if len(positions) == len(self.frame):
+            return self.frame
+        return self.frame.take(positions)
+
+    def counts(self, column: str) -> Dict[str, int]:
+        """Events per category of 'type', 'metric' or 'direction', including empty ones"""
+        return {category: len(self._groups[((column, category),)][0]) for category in CATEGORIES[column]}
+
+    def records(self) -> List[Dict]:
+        """Rows as dicts, with `date` as a calendar day, for JSON reports and alert rules"""
+        return self.frame.assign(date=self.frame['date'].dt.date).to_dict('records')
@@ -1,13 +1,9 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import json
 import os
-import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
-import numpy as np
 
 # Page configuration
 st.set_page_config(
@@ -22,6 +18,26 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from auth_config import ADMIN_PASSWORD 
+import config
+from data_processor import DataProcessor
+from market_series import day_bounds, day_dates, day_keys
+from figure_cache import FigureCache
+from range_stats import RangeStatistics
+from rollup import LEVEL_LABELS
+from dashboard_charts import (CHART_BUILDERS, DEFAULT_CHART_OPTIONS, SENSITIVITY_METRICS, create_correlation_matrix,
+                              create_matrix_heatmap)
+from correlation import CorrelationTracker, summary_frame
+from snapshot import freeze_frame, frame_nbytes, object_nbytes, process_rss, snapshot_nbytes
+from data_service import DataServiceClient, dataset_files, files_version, load_dataset, remote_dataset
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:
+    get_script_run_ctx = None
+
+# Fragments rerun on their own when a widget inside them changes;
+# older Streamlit releases without them fall back to full reruns
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
 
 # Custom CSS
 st.markdown("""
@@ -53,261 +69,491 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Load data function
-@st.cache_data
-def load_data():
-    """Load all data files generated by the backend"""
-    data = {}
-    
-    # Load market data
-    market_data_path = './data/kaito_market_data.csv'
-    if os.path.exists(market_data_path):
-        data['market'] = pd.read_csv(market_data_path)
-        data['market']['timestamp'] = pd.to_datetime(data['market']['timestamp'])
-        data['market']['date'] = pd.to_datetime(data['market']['date'])
-    else:
-        st.error(f"Market data not found at {market_data_path}. Please run the backend analysis first.")
+@st.cache_resource
+def get_data_client():
+    """Data service client shared by every session (config.DATA_SERVICE_URL)"""
+    return DataServiceClient(config.DATA_SERVICE_URL) if config.DATA_SERVICE_URL else None
+
+def data_version():
+    """Fingerprint of the backend output files, used to key cached data and figures"""
+    client = get_data_client()
+    if client is not None:
+        return client.meta()['version']
+    return files_version(dataset_files())
+
+def default_range(df):
+    """Range covered by the last backend run, the dashboard's default view"""
+    return day_bounds(df['date'].min(), df['date'].max())
+
+# Load data function. The snapshot is shared by every session: cache_resource
+# hands out the same object instead of a per-session copy, and its frames are
+# frozen so no session can change what the others see.
+@st.cache_resource(max_entries=config.SNAPSHOT_MAX_VERSIONS, show_spinner=False)
+def load_data(version=None):
+    """Load all data generated by the backend, from the data service when one is configured"""
+    client = get_data_client()
+    data = remote_dataset(client) if client is not None else load_dataset()
+    if data is None:
+        source = client.base_url if client is not None else dataset_files()[0]
+        st.error(f"Market data not found at {source}. Please run the backend analysis first.")
         return None
-    
-    # Load spike data
-    spike_data_path = './data/kaito_spikes.csv'
-    if os.path.exists(spike_data_path):
-        data['spikes'] = pd.read_csv(spike_data_path)
-        if not data['spikes'].empty:
-            data['spikes']['timestamp'] = pd.to_datetime(data['spikes']['timestamp'])
-            data['spikes']['date'] = pd.to_datetime(data['spikes']['date'])
-    else:
-        data['spikes'] = pd.DataFrame()
-    
-    # Load JSON report
-    report_path = './reports/kaito_analysis.json'
-    if os.path.exists(report_path):
-        with open(report_path, 'r') as f:
-            data['report'] = json.load(f)
-    else:
+    if not data['report']:
         st.warning("Analysis report not found. Some statistics may be unavailable.")
-        data['report'] = {}
-    
     return data
 
-# Create price chart with volume
-def create_price_volume_chart(df, spikes_df):
-    """Create interactive price and volume chart"""
-    fig = make_subplots(
-        rows=2, cols=1,
-        shared_xaxes=True,
-        vertical_spacing=0.05,
-        row_heights=[0.7, 0.3],
-        subplot_titles=('Price Movement', 'Trading Volume')
+@st.cache_resource(max_entries=config.SNAPSHOT_MAX_VERSIONS, show_spinner=False)
+def get_range_statistics(version, _data):
+    """Range statistics index over the last run's market frame, shared by all sessions"""
+    return RangeStatistics(_data['market'])
+
+@st.cache_resource(max_entries=config.RANGE_CACHE_ENTRIES, show_spinner=False)
+def get_range(version, resolution, start, end, _data):
+    """Range statistics index over the processed bars of one level inside [start, end]"""
+    if 'client' in _data:
+        bars = _data['client'].bars(resolution, start, end)
+    else:
+        bars = DataProcessor().process_level_range(_data['rollups'], resolution, start, end)
+    return RangeStatistics(freeze_frame(bars))
+
+def range_index(version, resolution, data, start, end):
+    """
+    Range statistics index covering [start, end]
+    
+    A pyramid level is only read, or requested from the data service, for
+    the selected range plus the warm-up its moving averages need, so a
+    narrow view never processes a whole level.
+    """
+    if resolution:
+        return get_range(version, resolution, start, end, data)
+    return get_range_statistics(version, data)
+
+def view_frame(version, resolution, data, start, end):
+    """
+    Rows of the level frame inside [start, end]
+    
+    The result is a positional slice: a new frame over the snapshot's
+    buffers, so selecting a range copies no data.
+    """
+    index = range_index(version, resolution, data, start, end)
+    lo, hi = index.bounds(start, end)
+    return index.df.iloc[lo:hi]
+
+def resolve_view(data, start, end, resolution_choice='auto'):
+    """Resolution for a range: the chosen level, or the finest one within the row budget"""
+    pyramid = data['rollups']
+    if not pyramid.span():
+        return None
+    return pyramid.select_level(start, end) if resolution_choice == 'auto' else resolution_choice
+
+@st.cache_resource
+def get_session_registry():
+    """Last-seen time and state size of every session, shared across sessions"""
+    return {'lock': threading.Lock(), 'sessions': {}}
+
+def touch_session():
+    """
+    Record this session in the registry
+    
+    Returns:
+        (this session's id, {session id: (last seen, session state bytes)} of active sessions)
+    """
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    session_id = ctx.session_id if ctx else 'local'
+    registry = get_session_registry()
+    now = time.time()
+    state_bytes = sum(object_nbytes(value) for value in st.session_state.to_dict().values())
+    with registry['lock']:
+        sessions = registry['sessions']
+        sessions[session_id] = (now, state_bytes)
+        for stale in [sid for sid, (seen, _) in sessions.items() if now - seen > config.SESSION_ACTIVE_SECONDS]:
+            del sessions[stale]
+        return session_id, dict(sessions)
+
+def memory_panel(data, version, range_frame, session_id, sessions):
+    """Sidebar panel: shared snapshot size against per-session overhead"""
+    mb = lambda n: f"{n / 1e6:,.1f} MB"
+    shared = snapshot_nbytes(data)
+    range_bytes = frame_nbytes(range_frame) if range_frame is not None else 0
+    figure_bytes = get_figure_cache().total_bytes
+    shared_total = sum(shared.values()) + range_bytes + figure_bytes
+    session_bytes = [state for _, state in sessions.values()]
+    rss = process_rss()
+    
+    with st.expander("🧠 Memory"):
+        st.caption(f"Shared snapshot (version {version[:8]})")
+        st.text(f"Market data     {mb(shared['market'])}\n"
+                f"Spikes          {mb(shared['spikes'])}\n"
+                f"Rollups         {mb(shared['rollups'])}\n"
+                f"Range frame     {mb(range_bytes)}\n"
+                f"Figure cache    {mb(figure_bytes)}\n"
+                f"Total shared    {mb(shared_total)}")
+        st.caption(f"{len(sessions)} active session(s)")
+        st.text(f"This session    {mb(sessions[session_id][1])}\n"
+                f"All sessions    {mb(sum(session_bytes))}\n"
+                f"Process RSS     {mb(rss)}\n"
+                f"RSS / session   {mb(rss / max(len(sessions), 1))}")
+
+@st.cache_resource
+def get_figure_cache():
+    """Figure cache shared by every session of this server process"""
+    return FigureCache()
+
+def chart(view, chart_id, df, spikes_df, **options):
+    """
+    Fetch a figure from the shared cache, building it only on a miss
+    
+    Args:
+        view: (dataset version, range start, range end, resolution)
+        chart_id: Key into CHART_BUILDERS
+        df: Market data for the view
+        spikes_df: Spike events
+        options: Chart options passed to the builder
+        
+    Returns:
+        Plotly figure
+    """
+    version, *date_range = view
+    return get_figure_cache().get_or_build(
+        chart_id, version, tuple(date_range), options,
+        lambda: CHART_BUILDERS[chart_id](df, spikes_df, **options)
     )
-    
-    # Price line
-    fig.add_trace(
-        go.Scatter(
-            x=df['timestamp'],
-            y=df['price'],
-            mode='lines',
-            name='Price',
-            line=dict(color='#1f77b4', width=2),
-            hovertemplate='Date: %{x}<br>Price: $%{y:.4f}<extra></extra>'
-        ),
-        row=1, col=1
+
+def _prewarm(cache, view, df, spikes_df):
+    version, *date_range = view
+    cache.prewarm(
+        (chart_id, version, tuple(date_range), DEFAULT_CHART_OPTIONS.get(chart_id, {}),
+         lambda builder=builder, chart_id=chart_id: builder(df, spikes_df, **DEFAULT_CHART_OPTIONS.get(chart_id, {})))
+        for chart_id, builder in CHART_BUILDERS.items()
+        if chart_id != 'spike_timeline' or not spikes_df.empty
     )
+
+@st.cache_resource(show_spinner=False)
+def prewarm_default_views(version, _data):
+    """
+    Build every chart of the default range in the background, once per dataset version
+    
+    Args:
+        version: Dataset version
+        _data: Loaded dashboard data (unhashed)
+        
+    Returns:
+        The background thread
+    """
+    range_start, range_end = default_range(_data['market'])
+    resolution = resolve_view(_data, range_start, range_end)
+    df_view = view_frame(version, resolution, _data, range_start, range_end)
+    
+    view = (version, range_start, range_end, resolution)
+    thread = threading.Thread(target=_prewarm, args=(get_figure_cache(), view, df_view, _data['spikes']),
+                              daemon=True)
+    thread.start()
+    return thread
+
+# Views and their sections. Each section is a fragment: a widget inside it
+# reruns only that section, and only the selected view's sections run.
+def render_overview(view, df_filtered, spikes_df, stats, period_days):
+    """Overview: key metrics, main chart, volatility and correlations"""
+    overview_metrics(df_filtered, spikes_df, stats, period_days)
+    
+    # Main chart
+    st.subheader("📈 Price & Volume Overview")
+    chart_section(view, 'price_volume', df_filtered, spikes_df)
+    
+    # Additional charts row
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("📊 Volatility Trend")
+        chart_section(view, 'volatility', df_filtered, spikes_df)
+    
+    with col2:
+        correlation_section(view, df_filtered, spikes_df)
+    
+    # Cross-token correlations from the last backend run
+    basket = stats.get('basket_correlation')
+    if basket:
+        st.subheader("🧺 Basket Correlations")
+        st.caption(f"Returns and volume changes over {basket['rows']:,} aligned bars "
+                   f"(rolling: last {basket['window']})")
+        tab_full, tab_rolling = st.tabs(["Full Period", "Rolling"])
+        with tab_full:
+            st.plotly_chart(create_matrix_heatmap(summary_frame(basket), 'Basket Correlation', 500),
+                            use_container_width=True)
+        with tab_rolling:
+            st.plotly_chart(create_matrix_heatmap(summary_frame(basket, 'rolling'),
+                                                  f"Basket Correlation (last {basket['window']} bars)", 500),
+                            use_container_width=True)
+
+def correlation_tracker(resolution):
+    """This session's running correlation moments for a resolution, kept across reruns"""
+    trackers = st.session_state.setdefault('correlation_trackers', {})
+    if resolution not in trackers:
+        trackers[resolution] = CorrelationTracker()
+    return trackers[resolution]
+
+@fragment
+def correlation_section(view, df_filtered, spikes_df):
+    """Correlation heatmap with its own window control"""
+    st.subheader("🔗 Correlations")
+    window = st.selectbox("Correlation window", [None, 7, 14, 30, 90],
+                          format_func=lambda bars: 'Full period' if bars is None else f'Last {bars} bars',
+                          key='correlation_window')
+    version, *date_range = view
+    tracker = correlation_tracker(view[-1])
+    fig = get_figure_cache().get_or_build(
+        'correlation', version, tuple(date_range), {'window': window},
+        lambda: create_correlation_matrix(df_filtered, window, tracker)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def overview_metrics(df_filtered, spikes_df, stats, period_days):
+    """Key metrics row"""
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        current_price = df_filtered['price'].iloc[-1]
+        price_change = stats.get('price', {}).get('change_30d', 0)
+        st.metric(
+            "Current Price",
+            f"${current_price:.4f}",
+            f"{price_change:+.2f}%"
+        )
     
-    # Moving average
-    if 'price_ma7' in df.columns:
-        fig.add_trace(
-            go.Scatter(
-                x=df['timestamp'],
-                y=df['price_ma7'],
-                mode='lines',
-                name='7-day MA',
-                line=dict(color='orange', width=1, dash='dash'),
-                hovertemplate='Date: %{x}<br>7-day MA: $%{y:.4f}<extra></extra>'
-            ),
-            row=1, col=1
+    with col2:
+        total_volume = stats.get('volume', {}).get('total_30d', 0)
+        st.metric(
+            "Total Volume",
+            f"${total_volume/1e9:.2f}B",
+            f"{period_days}-day period"
         )
     
-    # Add price spikes
-    if not spikes_df.empty:
-        price_spikes = spikes_df[spikes_df['metric'] == 'price']
-        
-        # Up spikes
-        up_spikes = price_spikes[price_spikes['direction'] == 'up']
-        if not up_spikes.empty:
-            fig.add_trace(
-                go.Scatter(
-                    x=up_spikes['timestamp'],
-                    y=up_spikes['value'],
-                    mode='markers',
-                    name='Price Spike Up',
-                    marker=dict(color='green', size=12, symbol='triangle-up'),
-                    hovertemplate='Date: %{x}<br>Price: $%{y:.4f}<br>Change: +%{text}<extra></extra>',
-                    text=[f"{x:.1f}%" for x in up_spikes['change_pct']]
-                ),
-                row=1, col=1
-            )
-        
-        # Down spikes
-        down_spikes = price_spikes[price_spikes['direction'] == 'down']
-        if not down_spikes.empty:
-            fig.add_trace(
-                go.Scatter(
-                    x=down_spikes['timestamp'],
-                    y=down_spikes['value'],
-                    mode='markers',
-                    name='Price Spike Down',
-                    marker=dict(color='red', size=12, symbol='triangle-down'),
-                    hovertemplate='Date: %{x}<br>Price: $%{y:.4f}<br>Change: %{text}<extra></extra>',
-                    text=[f"{x:.1f}%" for x in down_spikes['change_pct']]
-                ),
-                row=1, col=1
-            )
-    
-    # Volume bars
-    colors = ['green' if df['volume'].iloc[i] > df['volume'].iloc[i-1] else 'red' 
-              for i in range(1, len(df))]
-    colors = ['gray'] + colors
-    
-    fig.add_trace(
-        go.Bar(
-            x=df['timestamp'],
-            y=df['volume'],
-            name='Volume',
-            marker_color=colors,
-            opacity=0.7,
-            hovertemplate='Date: %{x}<br>Volume: $%{y:,.0f}<extra></extra>'
-        ),
-        row=2, col=1
-    )
+    with col3:
+        volatility = stats.get('price', {}).get('volatility', 0)
+        st.metric(
+            "Volatility",
+            f"{volatility:.2f}%",
+            "Price volatility"
+        )
     
-    # Update layout
-    fig.update_xaxes(title_text="Date", row=2, col=1)
-    fig.update_yaxes(title_text="Price (USD)", row=1, col=1)
-    fig.update_yaxes(title_text="Volume (USD)", row=2, col=1)
+    with col4:
+        spike_count = len(spikes_df) if not spikes_df.empty else 0
+        st.metric(
+            "Spike Events",
+            spike_count,
+            "Detected spikes"
+        )
+
+@fragment
+def chart_section(view, chart_id, df_filtered, spikes_df, **options):
+    """A chart with no controls of its own"""
+    st.plotly_chart(chart(view, chart_id, df_filtered, spikes_df, **options), use_container_width=True)
+
+def render_price_analysis(view, df_filtered, spikes_df, stats, period_days):
+    """Price Analysis: price metrics, Bollinger Bands and change distribution"""
+    st.header("💰 Price Analysis")
     
-    fig.update_layout(
-        height=700,
-        showlegend=True,
-        hovermode='x unified',
-        template='plotly_white'
-    )
+    # Price statistics
+    col1, col2, col3, col4 = st.columns(4)
     
-    return fig
-
-# Create volatility chart
-def create_volatility_chart(df):
-    """Create volatility analysis chart"""
-    # Calculate rolling volatility
-    df['returns'] = df['price'].pct_change()
-    df['volatility_7d'] = df['returns'].rolling(window=7).std() * np.sqrt(7) * 100
-    df['volatility_14d'] = df['returns'].rolling(window=14).std() * np.sqrt(14) * 100
-    
-    fig = go.Figure()
-    
-    fig.add_trace(
-        go.Scatter(
-            x=df['timestamp'],
-            y=df['volatility_7d'],
-            mode='lines',
-            name='7-day Volatility',
-            line=dict(color='blue', width=2),
-            hovertemplate='Date: %{x}<br>7-day Vol: %{y:.2f}%<extra></extra>'
-        )
-    )
+    price_stats = stats.get('price', {})
     
-    fig.add_trace(
-        go.Scatter(
-            x=df['timestamp'],
-            y=df['volatility_14d'],
-            mode='lines',
-            name='14-day Volatility',
-            line=dict(color='red', width=2),
-            hovertemplate='Date: %{x}<br>14-day Vol: %{y:.2f}%<extra></extra>'
-        )
-    )
+    with col1:
+        st.metric("High", f"${price_stats.get('high', 0):.4f}")
+    with col2:
+        st.metric("Low", f"${price_stats.get('low', 0):.4f}")
+    with col3:
+        st.metric("Average", f"${price_stats.get('average', 0):.4f}")
+    with col4:
+        st.metric("Std Dev", f"${price_stats.get('std_dev', 0):.4f}")
     
-    fig.update_layout(
-        title='Price Volatility Analysis',
-        xaxis_title='Date',
-        yaxis_title='Volatility (%)',
-        height=400,
-        template='plotly_white',
-        hovermode='x unified'
-    )
+    bollinger_section(view, df_filtered, spikes_df)
     
-    return fig
+    # Price change distribution
+    st.subheader("📊 Price Change Distribution")
+    chart_section(view, 'price_change_distribution', df_filtered, spikes_df)
 
-# Create distribution charts
-def create_distribution_charts(df):
-    """Create price and volume distribution charts"""
-    fig = make_subplots(
-        rows=1, cols=2,
-        subplot_titles=('Daily Price Changes Distribution', 'Daily Volume Distribution')
-    )
+@fragment
+def bollinger_section(view, df_filtered, spikes_df):
+    """Bollinger Bands chart with its own window control"""
+    window = st.slider("Bollinger window", 5, 60, DEFAULT_CHART_OPTIONS['bollinger']['window'],
+                       key='bollinger_window')
+    st.plotly_chart(chart(view, 'bollinger', df_filtered, spikes_df, window=window), use_container_width=True)
+
+def render_volume_analysis(view, df_filtered, spikes_df, stats, period_days):
+    """Volume Analysis: volume metrics, volume chart and volume/price scatter"""
+    st.header("📊 Volume Analysis")
     
-    # Price changes histogram
-    fig.add_trace(
-        go.Histogram(
-            x=df['price_change_pct'].dropna(),
-            nbinsx=20,
-            name='Price Changes',
-            marker_color='lightblue',
-            showlegend=False
-        ),
-        row=1, col=1
-    )
+    # Volume statistics
+    col1, col2, col3, col4 = st.columns(4)
     
-    # Volume histogram
-    fig.add_trace(
-        go.Histogram(
-            x=df['volume'] / 1e6,  # Convert to millions
-            nbinsx=20,
-            name='Volume',
-            marker_color='lightgreen',
-            showlegend=False
-        ),
-        row=1, col=2
-    )
+    volume_stats = stats.get('volume', {})
     
-    fig.update_xaxes(title_text="Daily Change (%)", row=1, col=1)
-    fig.update_xaxes(title_text="Volume (Million USD)", row=1, col=2)
-    fig.update_yaxes(title_text="Frequency", row=1, col=1)
-    fig.update_yaxes(title_text="Frequency", row=1, col=2)
+    with col1:
+        st.metric("Total Volume", f"${volume_stats.get('total_30d', 0)/1e9:.2f}B")
+    with col2:
+        st.metric("Daily Average", f"${volume_stats.get('average_daily', 0)/1e6:.2f}M")
+    with col3:
+        st.metric("Highest Day", f"${volume_stats.get('highest', 0)/1e6:.2f}M")
+    with col4:
+        st.metric("Lowest Day", f"${volume_stats.get('lowest', 0)/1e6:.2f}M")
     
-    fig.update_layout(
-        height=400,
-        template='plotly_white'
-    )
+    chart_section(view, 'volume', df_filtered, spikes_df)
+    
+    # Volume vs Price scatter
+    st.subheader("🔄 Volume vs Price Relationship")
+    chart_section(view, 'volume_price_scatter', df_filtered, spikes_df)
+
+def render_spike_detection(view, df_filtered, spikes_df, stats, period_days):
+    """Spike Detection: spike counts, timeline and details table"""
+    st.header("🎯 Spike Detection Analysis")
     
-    return fig
-
-# Create correlation heatmap
-def create_correlation_matrix(df):
-    """Create correlation matrix heatmap"""
-    # Select numerical columns
-    corr_columns = ['price', 'volume', 'price_change_pct', 'volume_change_pct']
-    corr_data = df[corr_columns].corr()
-    
-    fig = go.Figure(data=go.Heatmap(
-        z=corr_data,
-        x=corr_data.columns,
-        y=corr_data.columns,
-        colorscale='RdBu',
-        zmid=0,
-        text=corr_data.round(3),
-        texttemplate='%{text}',
-        textfont={"size": 12},
-        hoverongaps=False
-    ))
-    
-    fig.update_layout(
-        title='Correlation Matrix',
-        height=400,
-        template='plotly_white'
+    _, range_start, range_end, _ = view
+    if spikes_df.count(start=range_start, end=range_end) == 0:
+        st.info("No significant spikes detected in the selected period.")
+        sensitivity_section(view, df_filtered, spikes_df)
+        return
+    
+    # Spike summary
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        price_spikes = spikes_df.count(metric='price', start=range_start, end=range_end)
+        st.metric("Price Spikes", price_spikes)
+    
+    with col2:
+        volume_spikes = spikes_df.count(metric='volume', start=range_start, end=range_end)
+        st.metric("Volume Spikes", volume_spikes)
+    
+    with col3:
+        max_spike = spikes_df.select(start=range_start, end=range_end)['change_pct'].max()
+        st.metric("Largest Spike", f"{max_spike:.1f}%")
+    
+    # Spike timeline
+    st.subheader("📅 Spike Timeline")
+    chart_section(view, 'spike_timeline', df_filtered, spikes_df)
+    
+    spike_table_section(spikes_df, range_start, range_end)
+    sensitivity_section(view, df_filtered, spikes_df)
+
+@fragment
+def spike_table_section(spikes_df, range_start, range_end):
+    """Spike details table with its own type filter"""
+    st.subheader("📋 Spike Details")
+    
+    spike_types = sorted(spike_type for spike_type, count in spikes_df.counts('type').items() if count)
+    selected_types = st.multiselect("Spike types", spike_types, default=spike_types, key='spike_table_types')
+    
+    spike_display = spikes_df.select(spike_type=selected_types, start=range_start, end=range_end).copy()
+    spike_display['timestamp'] = spike_display['timestamp'].dt.strftime('%Y-%m-%d %H:%M')
+    spike_display['change_pct'] = spike_display['change_pct'].round(2)
+    spike_display['value'] = spike_display['value'].round(4)
+    
+    st.dataframe(
+        spike_display[['timestamp', 'type', 'direction', 'change_pct', 'value']],
+        use_container_width=True
     )
+
+@fragment
+def sensitivity_section(view, df_filtered, spikes_df):
+    """Threshold sensitivity heatmap with its own metric control"""
+    st.subheader("🎚️ Threshold Sensitivity")
+    metric = st.selectbox("Count", list(SENSITIVITY_METRICS), format_func=SENSITIVITY_METRICS.get,
+                          key='sensitivity_metric')
+    st.plotly_chart(chart(view, 'sensitivity', df_filtered, spikes_df, metric=metric), use_container_width=True)
+
+def render_statistics(view, df_filtered, spikes_df, stats, period_days):
+    """Statistics: price, volume and market tabs"""
+    st.header("📊 Detailed Statistics")
+    statistics_section(stats)
+
+@fragment
+def statistics_section(stats):
+    """Only the selected statistics tab is computed and sent to the browser"""
+    tab = st.radio("Statistics", list(STATISTICS_TABS), horizontal=True,
+                   label_visibility='collapsed', key='statistics_tab')
+    STATISTICS_TABS[tab](stats)
+
+def render_price_stats(stats):
+    """Price Stats tab"""
+    st.subheader("Price Statistics")
+    
+    price_stats = stats.get('price', {})
+    period_days = stats.get('period', {}).get('days', 0)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("**Basic Statistics**")
+        st.write(f"Current Price: ${price_stats.get('current', 0):.4f}")
+        st.write(f"{period_days}-Day High: ${price_stats.get('high', 0):.4f}")
+        st.write(f"{period_days}-Day Low: ${price_stats.get('low', 0):.4f}")
+        st.write(f"Average Price: ${price_stats.get('average', 0):.4f}")
+        st.write(f"Median Price: ${price_stats.get('median', 0):.4f}")
+    
+    with col2:
+        st.markdown("**Change Metrics**")
+        st.write(f"{period_days}-Day Change: {price_stats.get('change_30d', 0):.2f}%")
+        st.write(f"{period_days}-Day Change (USD): ${price_stats.get('change_30d_usd', 0):.4f}")
+        st.write(f"Standard Deviation: ${price_stats.get('std_dev', 0):.4f}")
+        st.write(f"Volatility: {price_stats.get('volatility', 0):.2f}%")
+
+def render_volume_stats(stats):
+    """Volume Stats tab"""
+    st.subheader("Volume Statistics")
+    
+    volume_stats = stats.get('volume', {})
+    period_days = stats.get('period', {}).get('days', 0)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("**Volume Metrics**")
+        st.write(f"Total Volume ({period_days}d): ${volume_stats.get('total_30d', 0):,.0f}")
+        st.write(f"Average Daily: ${volume_stats.get('average_daily', 0):,.0f}")
+        st.write(f"Median Daily: ${volume_stats.get('median_daily', 0):,.0f}")
+    
+    with col2:
+        st.markdown("**Extremes**")
+        st.write(f"Highest Volume: ${volume_stats.get('highest', 0):,.0f}")
+        st.write(f"Lowest Volume: ${volume_stats.get('lowest', 0):,.0f}")
+        st.write(f"Highest Volume Date: {volume_stats.get('highest_date', 'N/A')}")
+
+def render_market_stats(stats):
+    """Market Stats tab"""
+    st.subheader("Current Market Data")
     
-    return fig
+    market_data = stats.get('current_market', {})
+    
+    if market_data:
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown("**Market Metrics**")
+            st.write(f"Market Cap: ${market_data.get('market_cap', 0):,.0f}")
+            st.write(f"FDV: ${market_data.get('fully_diluted_valuation', 0):,.0f}")
+            st.write(f"Circulating Supply: {market_data.get('circulating_supply', 0):,.0f}")
+        
+        with col2:
+            st.markdown("**Price Changes**")
+            st.write(f"24h Change: {market_data.get('24h_change', 0):.2f}%")
+            st.write(f"7d Change: {market_data.get('7d_change', 0):.2f}%")
+            st.write(f"30d Change: {market_data.get('30d_change', 0):.2f}%")
+    else:
+        st.info("Current market data not available in the report.")
+
+STATISTICS_TABS = {
+    "Price Stats": render_price_stats,
+    "Volume Stats": render_volume_stats,
+    "Market Stats": render_market_stats
+}
+
+VIEWS = {
+    "Overview": render_overview,
+    "Price Analysis": render_price_analysis,
+    "Volume Analysis": render_volume_analysis,
+    "Spike Detection": render_spike_detection,
+    "Statistics": render_statistics
+}
 
 # Main app
 def main():
@@ -342,15 +588,20 @@ def main():
             st.experimental_rerun()
     
     # Load data
+    version = data_version()
     with st.spinner('Loading data...'):
-        data = load_data()
+        data = load_data(version)
     
     if data is None:
         st.stop()
     
+    prewarm_default_views(version, data)
+    
     df = data['market']
     spikes_df = data['spikes']
     report = data['report']
+    pyramid = data['rollups']
+    span = pyramid.span()
     
     # Sidebar
     with st.sidebar:
@@ -358,385 +609,74 @@ def main():
         
         # Date range filter
         st.subheader("Date Range")
+        first_date, last_date = df['date'].min().date(), df['date'].max().date()
+        if span:
+            # Exchange days the stored bars reach into
+            span_ms = pd.DatetimeIndex(span).as_unit('ms').asi8
+            span_first, span_last = day_dates(day_keys(span_ms)).astype('datetime64[D]').tolist()
+            first_date, last_date = min(first_date, span_first), max(last_date, span_last)
         date_range = st.date_input(
             "Select date range",
             value=(df['date'].min(), df['date'].max()),
-            min_value=df['date'].min(),
-            max_value=df['date'].max()
+            min_value=first_date,
+            max_value=last_date
         )
         
+        # Whole exchange days, as the UTC instants the timestamps are filtered on
         if len(date_range) == 2:
-            mask = (df['date'] >= pd.Timestamp(date_range[0])) & (df['date'] <= pd.Timestamp(date_range[1]))
-            df_filtered = df[mask]
+            range_start, range_end = day_bounds(date_range[0], date_range[1])
         else:
-            df_filtered = df
+            range_start, range_end = day_bounds(first_date, last_date)
+        
+        # Resolution follows the range so zoomed and wide views stay bounded
+        resolution_choice = st.selectbox(
+            "Resolution",
+            ['auto'] + pyramid.levels,
+            format_func=lambda level: 'Auto' if level == 'auto' else LEVEL_LABELS[level],
+            disabled=span is None
+        )
+        
+        resolution = resolve_view(data, range_start, range_end, resolution_choice)
+        df_filtered = view_frame(version, resolution, data, range_start, range_end)
+        if resolution:
+            st.caption(f"{LEVEL_LABELS[resolution]} bars · {len(df_filtered):,} rows")
+        
+        view = (version, range_start, range_end, resolution)
+        
+        if df_filtered.empty:
+            st.warning("No data in the selected range.")
+            st.stop()
+        
+        # Statistics for exactly the selected range, from the shared range index
+        stats = range_index(version, resolution, data, range_start, range_end).statistics(range_start, range_end)
+        if 'current_market' in report.get('statistics', {}):
+            stats['current_market'] = report['statistics']['current_market']
+        if 'basket_correlation' in report.get('statistics', {}):
+            stats['basket_correlation'] = report['statistics']['basket_correlation']
+        period_days = stats['period']['days']
         
         # View selector
         st.subheader("View Options")
         view_mode = st.radio(
             "Select View",
-            ["Overview", "Price Analysis", "Volume Analysis", "Spike Detection", "Statistics"]
+            list(VIEWS)
         )
         
         # Refresh button
         if st.button("🔄 Refresh Data", use_container_width=True):
             st.cache_data.clear()
+            load_data.clear()
+            get_range_statistics.clear()
+            get_range.clear()
+            get_figure_cache().invalidate()
             st.rerun()
-    
-    # Main content based on view mode
-    if view_mode == "Overview":
-        # Key metrics row
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            current_price = df_filtered['price'].iloc[-1]
-            price_change = report.get('statistics', {}).get('price', {}).get('change_30d', 0)
-            st.metric(
-                "Current Price",
-                f"${current_price:.4f}",
-                f"{price_change:+.2f}%"
-            )
-        
-        with col2:
-            total_volume = df_filtered['volume'].sum()
-            st.metric(
-                "Total Volume",
-                f"${total_volume/1e9:.2f}B",
-                "30-day period"
-            )
-        
-        with col3:
-            volatility = report.get('statistics', {}).get('price', {}).get('volatility', 0)
-            st.metric(
-                "Volatility",
-                f"{volatility:.2f}%",
-                "Price volatility"
-            )
-        
-        with col4:
-            spike_count = len(spikes_df) if not spikes_df.empty else 0
-            st.metric(
-                "Spike Events",
-                spike_count,
-                "Detected spikes"
-            )
-        
-        # Main chart
-        st.subheader("📈 Price & Volume Overview")
-        fig_main = create_price_volume_chart(df_filtered, spikes_df)
-        st.plotly_chart(fig_main, use_container_width=True)
-        
-        # Additional charts row
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("📊 Volatility Trend")
-            fig_vol = create_volatility_chart(df_filtered)
-            st.plotly_chart(fig_vol, use_container_width=True)
-        
-        with col2:
-            st.subheader("🔗 Correlations")
-            fig_corr = create_correlation_matrix(df_filtered)
-            st.plotly_chart(fig_corr, use_container_width=True)
-    
-    elif view_mode == "Price Analysis":
-        st.header("💰 Price Analysis")
-        
-        # Price statistics
-        col1, col2, col3, col4 = st.columns(4)
-        
-        price_stats = report.get('statistics', {}).get('price', {})
-        
-        with col1:
-            st.metric("High", f"${price_stats.get('high', 0):.4f}")
-        with col2:
-            st.metric("Low", f"${price_stats.get('low', 0):.4f}")
-        with col3:
-            st.metric("Average", f"${price_stats.get('average', 0):.4f}")
-        with col4:
-            st.metric("Std Dev", f"${price_stats.get('std_dev', 0):.4f}")
-        
-        # Price chart with indicators
-        fig_price = go.Figure()
-        
-        # Price line
-        fig_price.add_trace(
-            go.Scatter(
-                x=df_filtered['timestamp'],
-                y=df_filtered['price'],
-                mode='lines',
-                name='Price',
-                line=dict(color='blue', width=2)
-            )
-        )
-        
-        # Bollinger Bands
-        df_filtered['bb_middle'] = df_filtered['price'].rolling(window=20).mean()
-        df_filtered['bb_std'] = df_filtered['price'].rolling(window=20).std()
-        df_filtered['bb_upper'] = df_filtered['bb_middle'] + (2 * df_filtered['bb_std'])
-        df_filtered['bb_lower'] = df_filtered['bb_middle'] - (2 * df_filtered['bb_std'])
-        
-        fig_price.add_trace(
-            go.Scatter(
-                x=df_filtered['timestamp'],
-                y=df_filtered['bb_upper'],
-                mode='lines',
-                name='Upper Band',
-                line=dict(color='gray', width=1, dash='dash')
-            )
-        )
-        
-        fig_price.add_trace(
-            go.Scatter(
-                x=df_filtered['timestamp'],
-                y=df_filtered['bb_lower'],
-                mode='lines',
-                name='Lower Band',
-                line=dict(color='gray', width=1, dash='dash'),
-                fill='tonexty',
-                fillcolor='rgba(128, 128, 128, 0.2)'
-            )
-        )
-        
-        fig_price.update_layout(
-            title='Price with Bollinger Bands',
-            xaxis_title='Date',
-            yaxis_title='Price (USD)',
-            height=500,
-            template='plotly_white',
-            hovermode='x unified'
-        )
-        
-        st.plotly_chart(fig_price, use_container_width=True)
-        
-        # Price change distribution
-        st.subheader("📊 Price Change Distribution")
-        fig_dist = px.histogram(
-            df_filtered['price_change_pct'].dropna(),
-            nbins=30,
-            title='Daily Price Change Distribution',
-            labels={'value': 'Price Change (%)', 'count': 'Frequency'}
-        )
-        st.plotly_chart(fig_dist, use_container_width=True)
-    
-    elif view_mode == "Volume Analysis":
-        st.header("📊 Volume Analysis")
-        
-        # Volume statistics
-        col1, col2, col3, col4 = st.columns(4)
-        
-        volume_stats = report.get('statistics', {}).get('volume', {})
-        
-        with col1:
-            st.metric("Total Volume", f"${volume_stats.get('total_30d', 0)/1e9:.2f}B")
-        with col2:
-            st.metric("Daily Average", f"${volume_stats.get('average_daily', 0)/1e6:.2f}M")
-        with col3:
-            st.metric("Highest Day", f"${volume_stats.get('highest', 0)/1e6:.2f}M")
-        with col4:
-            st.metric("Lowest Day", f"${volume_stats.get('lowest', 0)/1e6:.2f}M")
         
-        # Volume chart
-        fig_volume = go.Figure()
-        
-        # Volume bars with color coding
-        colors = ['green' if df_filtered['volume'].iloc[i] > df_filtered['volume'].iloc[i-1] else 'red' 
-                  for i in range(1, len(df_filtered))]
-        colors = ['gray'] + colors
-        
-        fig_volume.add_trace(
-            go.Bar(
-                x=df_filtered['timestamp'],
-                y=df_filtered['volume'],
-                marker_color=colors,
-                name='Volume',
-                hovertemplate='Date: %{x}<br>Volume: $%{y:,.0f}<extra></extra>'
-            )
-        )
-        
-        # Add moving average
-        if 'volume_ma7' in df_filtered.columns:
-            fig_volume.add_trace(
-                go.Scatter(
-                    x=df_filtered['timestamp'],
-                    y=df_filtered['volume_ma7'],
-                    mode='lines',
-                    name='7-day MA',
-                    line=dict(color='orange', width=2)
-                )
-            )
-        
-        fig_volume.update_layout(
-            title='Trading Volume Analysis',
-            xaxis_title='Date',
-            yaxis_title='Volume (USD)',
-            height=500,
-            template='plotly_white',
-            hovermode='x unified'
-        )
-        
-        st.plotly_chart(fig_volume, use_container_width=True)
-        
-        # Volume vs Price scatter
-        st.subheader("🔄 Volume vs Price Relationship")
-        fig_scatter = px.scatter(
-            df_filtered,
-            x='volume',
-            y='price',
-            color='price_change_pct',
-            color_continuous_scale='RdYlGn',
-            title='Volume vs Price Correlation',
-            labels={'volume': 'Volume (USD)', 'price': 'Price (USD)', 'price_change_pct': 'Price Change %'}
-        )
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        session_id, sessions = touch_session()
+        range_frame = range_index(version, resolution, data, range_start, range_end).df if resolution else None
+        memory_panel(data, version, range_frame, session_id, sessions)
     
-    elif view_mode == "Spike Detection":
-        st.header("🎯 Spike Detection Analysis")
-        
-        if spikes_df.empty:
-            st.info("No significant spikes detected in the selected period.")
-        else:
-            # Spike summary
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                price_spikes = len(spikes_df[spikes_df['metric'] == 'price'])
-                st.metric("Price Spikes", price_spikes)
-            
-            with col2:
-                volume_spikes = len(spikes_df[spikes_df['metric'] == 'volume'])
-                st.metric("Volume Spikes", volume_spikes)
-            
-            with col3:
-                max_spike = spikes_df['change_pct'].max()
-                st.metric("Largest Spike", f"{max_spike:.1f}%")
-            
-            # Spike timeline
-            st.subheader("📅 Spike Timeline")
-            
-            fig_timeline = go.Figure()
-            
-            # Add price line as background
-            fig_timeline.add_trace(
-                go.Scatter(
-                    x=df_filtered['timestamp'],
-                    y=df_filtered['price'],
-                    mode='lines',
-                    name='Price',
-                    line=dict(color='lightgray', width=1),
-                    showlegend=False
-                )
-            )
-            
-            # Add spike markers
-            for _, spike in spikes_df.iterrows():
-                color = 'green' if spike['direction'] == 'up' else 'red'
-                symbol = 'triangle-up' if spike['direction'] == 'up' else 'triangle-down'
-                
-                fig_timeline.add_trace(
-                    go.Scatter(
-                        x=[spike['timestamp']],
-                        y=[spike.get('price', spike.get('value', 0))],
-                        mode='markers+text',
-                        marker=dict(color=color, size=15, symbol=symbol),
-                        text=[f"{spike['change_pct']:.1f}%"],
-                        textposition='top center',
-                        name=f"{spike['type']} spike",
-                        showlegend=False
-                    )
-                )
-            
-            fig_timeline.update_layout(
-                title='Spike Events on Price Timeline',
-                xaxis_title='Date',
-                yaxis_title='Price (USD)',
-                height=500,
-                template='plotly_white'
-            )
-            
-            st.plotly_chart(fig_timeline, use_container_width=True)
-            
-            # Spike details table
-            st.subheader("📋 Spike Details")
-            
-            spike_display = spikes_df.copy()
-            spike_display['timestamp'] = spike_display['timestamp'].dt.strftime('%Y-%m-%d %H:%M')
-            spike_display['change_pct'] = spike_display['change_pct'].round(2)
-            spike_display['value'] = spike_display['value'].round(4)
-            
-            st.dataframe(
-                spike_display[['timestamp', 'type', 'direction', 'change_pct', 'value']],
-                use_container_width=True
-            )
-    
-    elif view_mode == "Statistics":
-        st.header("📊 Detailed Statistics")
-        
-        # Create tabs for different statistics
-        tab1, tab2, tab3 = st.tabs(["Price Stats", "Volume Stats", "Market Stats"])
-        
-        with tab1:
-            st.subheader("Price Statistics")
-            
-            price_stats = report.get('statistics', {}).get('price', {})
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("**Basic Statistics**")
-                st.write(f"Current Price: ${price_stats.get('current', 0):.4f}")
-                st.write(f"30-Day High: ${price_stats.get('high', 0):.4f}")
-                st.write(f"30-Day Low: ${price_stats.get('low', 0):.4f}")
-                st.write(f"Average Price: ${price_stats.get('average', 0):.4f}")
-                st.write(f"Median Price: ${price_stats.get('median', 0):.4f}")
-            
-            with col2:
-                st.markdown("**Change Metrics**")
-                st.write(f"30-Day Change: {price_stats.get('change_30d', 0):.2f}%")
-                st.write(f"30-Day Change (USD): ${price_stats.get('change_30d_usd', 0):.4f}")
-                st.write(f"Standard Deviation: ${price_stats.get('std_dev', 0):.4f}")
-                st.write(f"Volatility: {price_stats.get('volatility', 0):.2f}%")
-        
-        with tab2:
-            st.subheader("Volume Statistics")
-            
-            volume_stats = report.get('statistics', {}).get('volume', {})
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("**Volume Metrics**")
-                st.write(f"Total Volume (30d): ${volume_stats.get('total_30d', 0):,.0f}")
-                st.write(f"Average Daily: ${volume_stats.get('average_daily', 0):,.0f}")
-                st.write(f"Median Daily: ${volume_stats.get('median_daily', 0):,.0f}")
-            
-            with col2:
-                st.markdown("**Extremes**")
-                st.write(f"Highest Volume: ${volume_stats.get('highest', 0):,.0f}")
-                st.write(f"Lowest Volume: ${volume_stats.get('lowest', 0):,.0f}")
-                st.write(f"Highest Volume Date: {volume_stats.get('highest_date', 'N/A')}")
-        
-        with tab3:
-            st.subheader("Current Market Data")
-            
-            market_data = report.get('statistics', {}).get('current_market', {})
-            
-            if market_data:
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown("**Market Metrics**")
-                    st.write(f"Market Cap: ${market_data.get('market_cap', 0):,.0f}")
-                    st.write(f"FDV: ${market_data.get('fully_diluted_valuation', 0):,.0f}")
-                    st.write(f"Circulating Supply: {market_data.get('circulating_supply', 0):,.0f}")
-                
-                with col2:
-                    st.markdown("**Price Changes**")
-                    st.write(f"24h Change: {market_data.get('24h_change', 0):.2f}%")
-                    st.write(f"7d Change: {market_data.get('7d_change', 0):.2f}%")
-                    st.write(f"30d Change: {market_data.get('30d_change', 0):.2f}%")
-            else:
-                st.info("Current market data not available in the report.")
+    # Main content based on view mode
+    VIEWS[view_mode](view, df_filtered, spikes_df, stats, period_days)
     
     # Footer
     st.markdown("---")
@@ -0,0 +1,50 @@
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import main
+from rollup import RollupPyramid
+
+END_MS = 1_790_000_000_000
+HOUR_MS = 60 * 60 * 1000
+
+
+def market_chart(days=30, seed=0, end_ms=END_MS):
+    """Synthetic hourly market_chart payload"""
+    rng = np.random.default_rng(seed)
+    ts = np.arange(end_ms - days * 24 * HOUR_MS, end_ms + 1, HOUR_MS)
+    price = 1.5 * np.exp(np.cumsum(rng.normal(0, 0.03, len(ts))))
+    volume = 1e8 * np.exp(np.cumsum(rng.normal(0, 0.2, len(ts))))
+    pairs = lambda values: [[int(t), float(v)] for t, v in zip(ts, values)]
+    return {'prices': pairs(price), 'total_volumes': pairs(volume), 'market_caps': pairs(price * 2.4e8)}
+
+
+def run(payload, directory, end_ms=END_MS):
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = main.run_analysis(payload, None, 30, 5, 50, '1h',
+                                   data_dir=str(directory / 'data'), reports_dir=str(directory / 'reports'),
+                                   charts_dir=str(directory / 'visualizations'),
+                                   end=pd.Timestamp(end_ms, unit='ms'))
+    return result[2]['build']
+
+
+def test_rollups_reload_exactly(tmp_path):
+    pyramid = RollupPyramid('kaito')
+    pyramid.append(market_chart())
+    pyramid.save(str(tmp_path))
+    reloaded = RollupPyramid.load(str(tmp_path), 'kaito')
+    for level in pyramid.levels:
+        pd.testing.assert_frame_equal(reloaded.level(level), pyramid.level(level), check_exact=True)
+
+
+def test_rerun_on_unchanged_inputs_builds_nothing(tmp_path):
+    payload = market_chart()
+    first = run(payload, tmp_path)
+    assert 'market' in first['built']
+    assert run(payload, tmp_path)['built'] == []
+
+
+def test_new_sample_rebuilds(tmp_path):
+    run(market_chart(), tmp_path)
+    build = run(market_chart(end_ms=END_MS + HOUR_MS), tmp_path, END_MS + HOUR_MS)
+    assert 'market' in build['built'] and 'spikes' in build['built']
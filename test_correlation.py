@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from correlation import (CorrelationTracker, RollingCorrelation, correlation_matrix, correlation_summary,
+                         rolling_correlation)
+
+COLUMNS = ['price', 'volume', 'price_change_pct', 'volume_change_pct']
+WINDOW = 30
+
+
+def drifting_frame(rows=3000, seed=0):
+    """Price climbing three orders of magnitude then holding with tiny moves, volume far from zero"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2026-01-01', periods=rows, freq='h'),
+        'price': np.geomspace(1, 1e4, rows).clip(max=1e3) * (1 + rng.normal(0, 1e-5, rows)),
+        'volume': 1e9 + np.cumsum(rng.normal(0, 1e5, rows))
+    })
+    df['price_change_pct'] = df['price'].pct_change() * 100
+    df['volume_change_pct'] = df['volume'].pct_change() * 100
+    df.loc[500:510, 'volume'] = np.nan
+    return df
+
+
+def pandas_rolling(df):
+    return df[COLUMNS].rolling(WINDOW).corr().to_numpy().reshape(len(df), len(COLUMNS), len(COLUMNS))
+
+
+def assert_matches(actual, expected):
+    # pandas masks windows short of min_periods; everywhere else the values must agree
+    known = ~np.isnan(expected)
+    assert not np.isnan(actual[known]).any()
+    # pandas' own rolling diagonal drifts from 1 on the flat stretch, so it is checked against 1
+    diagonal = np.broadcast_to(np.eye(expected.shape[-1], dtype=bool), expected.shape)
+    np.testing.assert_allclose(actual[known & diagonal], 1.0, atol=1e-12)
+    np.testing.assert_allclose(actual[known & ~diagonal], expected[known & ~diagonal], atol=1e-5)
+
+
+def test_full_period_matches_pandas():
+    df = drifting_frame()
+    assert_matches(correlation_matrix(df, COLUMNS).to_numpy(), df[COLUMNS].corr().to_numpy())
+
+
+def test_rolling_matches_pandas_on_drifting_series():
+    df = drifting_frame()
+    assert_matches(rolling_correlation(df, COLUMNS, WINDOW), pandas_rolling(df))
+
+
+def test_incremental_rolling_matches_pandas():
+    df = drifting_frame()
+    expected = pandas_rolling(df)
+    rolling = RollingCorrelation(COLUMNS, WINDOW)
+    for row, values in enumerate(df[COLUMNS].to_numpy()):
+        assert_matches(rolling.update(values), expected[row])
+
+
+def test_tracker_follows_refreshes():
+    df = drifting_frame()
+    tracker = CorrelationTracker(COLUMNS, WINDOW)
+    for end in range(1000, len(df), 37):
+        frame = df.iloc[end - 1000:end].copy()
+        # The newest bar is still filling and gets revised on the next refresh
+        frame.iloc[-1, frame.columns.get_loc('price')] *= 1.001
+        summary = tracker.update(frame).summary()
+        expected = correlation_summary(frame, COLUMNS, WINDOW)
+        for section in ('full_period', 'rolling'):
+            assert_matches(pd.DataFrame(summary[section]).to_numpy(dtype=float),
+                           pd.DataFrame(expected[section]).to_numpy(dtype=float))
+        assert_matches(tracker.frame(7).to_numpy(), correlation_matrix(frame.iloc[-7:], COLUMNS).to_numpy())
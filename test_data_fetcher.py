@@ -0,0 +1,26 @@
+import tracemalloc
+from data_fetcher import _MemoryTrace
+
+
+def test_peak_reported_when_tracing_was_already_on():
+    trace = _MemoryTrace()
+    tracemalloc.start()
+    try:
+        owner = trace.begin()
+        block = bytearray(10 ** 7)
+        peak = trace.end(owner)
+        assert owner and peak is not None and peak >= len(block)
+        # Tracing the caller started is left running
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_overlapped_measurement_is_discarded():
+    trace = _MemoryTrace()
+    owner = trace.begin()
+    other = trace.begin()
+    assert owner and not other
+    assert trace.end(other) is None
+    assert trace.end(owner) is None
+    assert not tracemalloc.is_tracing()
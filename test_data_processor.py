@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from data_processor import DataProcessor, dataset_version
+from rollup import RollupPyramid
+from test_rollup import START_MS, market_chart
+
+
+def market_frame(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    bars = pd.DataFrame({
+        'timestamp': pd.date_range('2026-01-01', periods=rows, freq='h'),
+        'close': 1.5 * np.exp(np.cumsum(rng.normal(0, 0.03, rows))),
+        'volume': 1e8 * np.exp(np.cumsum(rng.normal(0, 0.2, rows))),
+        'market_cap': np.full(rows, 3.6e8)
+    })
+    bars['open'] = bars['high'] = bars['low'] = bars['close']
+    bars.attrs['resolution'] = '1h'
+    return DataProcessor().process_rollup(bars)
+
+
+def test_modified_copy_misses_the_statistics_memo():
+    processor = DataProcessor()
+    df = market_frame()
+    first = processor.calculate_statistics(df)['price']['current']
+    scaled = df.copy()
+    scaled['price'] *= 10
+    assert processor.calculate_statistics(scaled)['price']['current'] == first * 10
+    assert processor.calculate_statistics(df)['price']['current'] == first
+
+
+def test_version_follows_content_not_attrs():
+    df = market_frame()
+    copy = df.copy()
+    assert dataset_version(copy) == dataset_version(df)
+    copy['volume'] += 1
+    assert dataset_version(copy) != dataset_version(df)
+    assert dataset_version(df.iloc[:100]) != dataset_version(df)
+
+
+def test_level_range_matches_slice_of_whole_level():
+    pyramid = RollupPyramid('kaito')
+    pyramid.append(market_chart(START_MS, 24 * 120))
+    processor = DataProcessor()
+    whole = processor.process_rollup(pyramid.level('1h'))
+    # The range starts right after a partition boundary, so warm-up comes from the previous month
+    start, end = pd.Timestamp('2026-02-01 02:00'), pd.Timestamp('2026-03-10')
+    ranged = processor.process_level_range(pyramid, '1h', start, end)
+    expected = whole[(whole['timestamp'] >= start) & (whole['timestamp'] <= end)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(ranged, expected)
+
+
+def test_versioned_statistics_hit_skips_recomputation(monkeypatch):
+    processor = DataProcessor()
+    df = market_frame()
+    calls = []
+    build = processor.build_statistics
+    monkeypatch.setattr(processor, 'build_statistics', lambda *args: calls.append(1) or build(*args))
+    first = processor.calculate_statistics(df, version='v1')
+    assert processor.calculate_statistics(df, version='v1') == first
+    assert len(calls) == 1
+    # Another range of the same version is a different entry
+    processor.calculate_statistics(df.iloc[:100], version='v1')
+    assert len(calls) == 2
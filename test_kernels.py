@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from kernels import BACKENDS, bar_changes, bar_features, rolling_moments, spike_flags
+
+ROWS = 5000
+
+
+@pytest.fixture(scope='module')
+def market():
+    """Price and volume with NaN gaps and a zero volume, so the edge cases are covered"""
+    rng = np.random.default_rng(0)
+    price = 1.5 * np.exp(np.cumsum(rng.normal(0, 0.03, ROWS)))
+    volume = 1e8 * np.exp(np.cumsum(rng.normal(0, 0.2, ROWS)))
+    price[rng.choice(ROWS, ROWS // 100, replace=False)] = np.nan
+    volume[rng.choice(ROWS, ROWS // 100, replace=False)] = np.nan
+    volume[ROWS // 2] = 0.0
+    return price, volume
+
+
+def expected_columns(price, volume):
+    price_series, volume_series = pd.Series(price), pd.Series(volume)
+    returns = price_series.pct_change()
+    return {
+        'price_change': price_series.diff(),
+        'price_change_pct': returns * 100,
+        'volume_change_pct': volume_series.pct_change() * 100,
+        'price_ma': price_series.rolling(window=7, min_periods=1).mean(),
+        'volume_ma': volume_series.rolling(window=7, min_periods=1).mean(),
+        'band_mean': price_series.rolling(window=20).mean(),
+        'band_std': price_series.rolling(window=20).std(),
+        'volatility': returns.rolling(window=7).std(),
+        'price_spike': (returns * 100).abs() > 5,
+        'volume_spike': volume_series.pct_change() * 100 > 50
+    }
+
+
+def kernel_columns(price, volume, name):
+    returns = pd.Series(price).pct_change().to_numpy()
+    # Without numba the loop kernels run as plain Python, dividing NumPy scalars
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns = bar_changes(price, volume, 7, kernels=name)
+        columns['band_mean'], columns['band_std'] = rolling_moments(price, 20, kernels=name)
+        columns['volatility'] = rolling_moments(returns, 7, kernels=name)[1]
+        columns['price_spike'], columns['volume_spike'] = spike_flags(
+            columns['price_change_pct'], columns['volume_change_pct'], 5, 50, kernels=name)
+    return columns
+
+
+@pytest.mark.parametrize('name', list(BACKENDS))
+def test_kernels_match_pandas(market, name):
+    columns = kernel_columns(*market, name)
+    for column, wanted in expected_columns(*market).items():
+        actual, wanted = np.asarray(columns[column], dtype='float64'), wanted.to_numpy(dtype='float64')
+        # NaN and infinities in the same places, finite values within rounding
+        np.testing.assert_array_equal(np.isfinite(actual), np.isfinite(wanted), err_msg=column)
+        np.testing.assert_array_equal(actual[~np.isfinite(wanted)], wanted[~np.isfinite(wanted)], err_msg=column)
+        np.testing.assert_allclose(actual[np.isfinite(wanted)], wanted[np.isfinite(wanted)],
+                                   rtol=1e-9, atol=0, err_msg=column)
+
+
+@pytest.mark.parametrize('name', list(BACKENDS))
+def test_fused_kernel_matches_separate_kernels(market, name):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fused = bar_features(*market, 5, 50, 7, 20, kernels=name)
+    separate = kernel_columns(*market, name)
+    for column, actual in fused.items():
+        np.testing.assert_array_equal(actual, separate[column], err_msg=column)
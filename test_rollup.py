@@ -0,0 +1,61 @@
+import os
+import numpy as np
+from rollup import RollupPyramid, partition_keys
+
+HOUR_MS = 60 * 60 * 1000
+START_MS = 1_767_225_600_000  # 2026-01-01
+
+
+def market_chart(start_ms, hours, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = start_ms + np.arange(hours) * HOUR_MS
+    price = 1.5 * np.exp(np.cumsum(rng.normal(0, 0.01, hours)))
+    pairs = lambda values: [[int(t), float(v)] for t, v in zip(ts, values)]
+    return {'prices': pairs(price), 'total_volumes': pairs(price * 1e8), 'market_caps': pairs(price * 2.4e8)}
+
+
+def test_save_rewrites_only_touched_partitions(tmp_path):
+    pyramid = RollupPyramid('kaito')
+    pyramid.append(market_chart(START_MS, 24 * 120))
+    pyramid.save(str(tmp_path))
+    hourly = tmp_path / 'kaito_rollup_1h'
+    assert len([name for name in os.listdir(hourly) if name.endswith('.csv')]) == 4
+
+    reopened = RollupPyramid.load(str(tmp_path), 'kaito')
+    last = int(reopened.span()[1].value // 1_000_000)
+    reopened.append(market_chart(last + HOUR_MS, 3, seed=1))
+    written = reopened.save()
+    month = str(partition_keys(np.int64(last + HOUR_MS), '1h'))
+    assert os.path.join(str(hourly), f'{month}.csv') in written
+    assert not any(path.startswith(str(hourly)) and month not in path for path in written)
+    # Only the partitions the append touched were read
+    assert len(reopened._parts['1h']) == 1
+
+
+def test_repeated_mid_bucket_sample_is_not_counted_twice(tmp_path):
+    minute = market_chart(START_MS, 30)
+    for series in minute.values():
+        for i, point in enumerate(series):
+            point[0] = START_MS + i * 60 * 1000
+    pyramid = RollupPyramid('kaito')
+    pyramid.append(minute)
+    assert pyramid.level('5m')['samples'].tolist() == [5] * 6
+
+    middle = {name: series[2:3] for name, series in minute.items()}
+    assert pyramid.append(middle)['5m'] == 0
+    pyramid.save(str(tmp_path))
+    reopened = RollupPyramid.load(str(tmp_path), 'kaito')
+    reopened.append(middle)
+    assert reopened.level('5m')['samples'].tolist() == [5] * 6
+    assert reopened.level('1h')['samples'].tolist() == [30]
+
+
+def test_level_row_counts_come_from_the_saved_index(tmp_path):
+    pyramid = RollupPyramid('kaito')
+    pyramid.append(market_chart(START_MS, 24 * 120))
+    pyramid.save(str(tmp_path))
+    expected = {level: len(pyramid.level(level)) for level in pyramid.levels}
+
+    reopened = RollupPyramid.load(str(tmp_path), 'kaito')
+    assert {level: reopened.row_count(level) for level in reopened.levels} == expected
+    assert not any(reopened._parts.values())
@@ -1,18 +1,224 @@
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import seaborn as sns
+import numpy as np
 import pandas as pd
+import time
+import contextlib
+import functools
+import io
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.figure import Figure
 from typing import Dict
 import os
 import config
+from rollup import LEVEL_LABELS, LEVEL_MS, period_label
+from correlation import correlation_matrix
+from spike_store import SpikeStore
+from logs import get_logger
+from metrics import RENDER_SECONDS
+
+logger = get_logger(__name__)
+
+_style_applied = False
+_templates = {}
+
+def _apply_style():
+    """Apply the chart style once per process rather than once per Visualizer"""
+    global _style_applied
+    if not _style_applied:
+        plt.style.use(config.CHART_STYLE)
+        _style_applied = True
+
+def _timed_render(chart: str):
+    """Record a Visualizer method's run time under its chart name and render tier"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with RENDER_SECONDS.time(chart=chart, tier=self.tier_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+def price_volume_correlation(df: pd.DataFrame, stats: Dict) -> float:
+    """Price/volume correlation from the statistics, computed only when they lack it"""
+    value = stats.get('correlation', {}).get('full_period', {}).get('price', {}).get('volume', np.nan)
+    if 'correlation' not in stats:
+        value = correlation_matrix(df, ['price', 'volume']).iloc[0, 1]
+    return np.nan if value is None else value
+
+class MarketChartTemplate:
+    """
+    Prebuilt 3-panel market figure whose artists are updated in place
+    
+    Axes, styling, locators and the subplot layout are created once; each
+    render only swaps line, bar and marker data. The figure lives outside
+    pyplot's figure manager and draws straight to an Agg canvas.
+    """
+    
+    def __init__(self, fig_size):
+        self.fig = Figure(figsize=fig_size)
+        FigureCanvasAgg(self.fig)
+        self.axes = self.fig.subplots(3, 1)
+        self.title = self.fig.suptitle('', fontsize=16, fontweight='bold')
+        ax1, ax2, ax3 = self.axes
+        
+        # 1. Price
+        self.price_line, = ax1.plot([], [], 'b-', linewidth=2, label='Price')
+        self.price_ma_line, = ax1.plot([], [], 'r--', alpha=0.7, label='7-Day MA')
+        self.price_spikes = ax1.scatter([], [], s=100, zorder=5, alpha=0.8)
+        self.annotations = []
+        ax1.set_ylabel('Price (USD)', fontsize=12)
+        ax1.grid(True, alpha=0.3)
+        # Fixed legend corners: loc='best' searches the data on every draw
+        self.price_legend = ax1.legend(loc='upper left')
+        
+        # 2. Volume
+        self.volume_bars = PolyCollection([], alpha=0.7)
+        self.volume_bars.sticky_edges.y.append(0)
+        ax2.add_collection(self.volume_bars)
+        self.volume_ma_line, = ax2.plot([], [], 'orange', linewidth=2, label='7-Day MA')
+        self.volume_spike_lines = LineCollection([], colors='red', linestyles='--', alpha=0.7,
+                                                 transform=ax2.get_xaxis_transform())
+        ax2.add_collection(self.volume_spike_lines)
+        ax2.set_ylabel('Volume (USD)', fontsize=12)
+        ax2.set_title('Trading Volume', fontsize=14)
+        ax2.grid(True, alpha=0.3, axis='y')
+        ax2.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x/1e6:.1f}M'))
+        self.volume_legend = ax2.legend(loc='upper left')
+        
+        # 3. Normalized price vs volume
+        self.price_norm_line, = ax3.plot([], [], 'b-', linewidth=2, label='Price (normalized)')
+        self.volume_norm_line, = ax3.plot([], [], 'orange', linewidth=2, alpha=0.7, label='Volume (normalized)')
+        self.correlation_text = ax3.text(0.02, 0.95, '', transform=ax3.transAxes, fontsize=10,
+                                         bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+        ax3.set_ylabel('Normalized Value', fontsize=12)
+        ax3.set_xlabel('Date', fontsize=12)
+        ax3.set_title('Price-Volume Correlation Analysis', fontsize=14)
+        ax3.legend(loc='upper right')
+        ax3.grid(True, alpha=0.3)
+        ax3.set_ylim(-0.1, 1.1)
+        
+        for ax in self.axes:
+            ax.xaxis_date()
+            ax.xaxis.set_major_locator(mdates.AutoDateLocator(minticks=5, maxticks=10))
+            ax.tick_params(axis='x', labelrotation=45)
+        self.laid_out = False
+    
+    def update(self, df: pd.DataFrame, spikes_df: SpikeStore, stats: Dict, title: str, resolution: str) -> None:
+        """Swap in a new dataset; the layout is computed on the first update only"""
+        ax1, ax2, ax3 = self.axes
+        unit = period_label(resolution)
+        x = mdates.date2num(df['timestamp'].to_numpy())
+        price = df['price'].to_numpy(dtype='float64')
+        volume = df['volume'].to_numpy(dtype='float64')
+        self.title.set_text(title)
+        
+        # 1. Price
+        self.price_line.set_data(x, price)
+        self.price_ma_line.set_data(x, df['price_ma7'].to_numpy())
+        self.price_legend.get_texts()[1].set_text(f'7-{unit} MA')
+        for annotation in self.annotations:
+            annotation.remove()
+        self.annotations = []
+        spikes = SpikeStore.of(spikes_df)
+        price_spikes = spikes.select(metric='price')
+        if not price_spikes.empty:
+            spike_x = mdates.date2num(price_spikes['timestamp'].to_numpy())
+            colors = np.where(price_spikes['direction'] == 'up', 'green', 'red')
+            self.price_spikes.set_offsets(np.column_stack([spike_x, price_spikes['value'].to_numpy()]))
+            self.price_spikes.set_facecolor(colors)
+            self.price_spikes.set_edgecolor(colors)
+            for sx, value, change, color in zip(spike_x, price_spikes['value'], price_spikes['change_pct'], colors):
+                self.annotations.append(ax1.annotate(f"{change:.1f}%", (sx, value), xytext=(5, 5),
+                                                     textcoords='offset points', fontsize=9, color=color))
+        else:
+            self.price_spikes.set_offsets(np.empty((0, 2)))
+        ax1.set_title(f'Price Movement (Current: ${stats["price"]["current"]:.4f})', fontsize=14)
+        ax1.relim()
+        ax1.autoscale_view()
+        
+        # 2. Volume bars as one polygon collection
+        width = LEVEL_MS.get(resolution, LEVEL_MS['1d']) / LEVEL_MS['1d'] * 0.8
+        left, right = x - width / 2, x + width / 2
+        heights = np.nan_to_num(volume)
+        zeros = np.zeros_like(heights)
+        self.volume_bars.set_verts(np.stack([np.column_stack([left, zeros]), np.column_stack([left, heights]),
+                                             np.column_stack([right, heights]), np.column_stack([right, zeros])], axis=1))
+        rising = np.concatenate([[False], volume[1:] > volume[:-1]])
+        colors = np.where(rising, 'green', 'red')
+        colors[:1] = 'gray'
+        self.volume_bars.set_facecolor(colors)
+        self.volume_ma_line.set_data(x, df['volume_ma7'].to_numpy())
+        self.volume_legend.get_texts()[0].set_text(f'7-{unit} MA')
+        volume_spikes = spikes.select(metric='volume')
+        spike_x = mdates.date2num(volume_spikes['timestamp'].to_numpy()) if not volume_spikes.empty else []
+        self.volume_spike_lines.set_segments([[(sx, 0), (sx, 1)] for sx in spike_x])
+        # relim() ignores collections, so the bar extent is added by hand
+        ax2.relim()
+        if len(x):
+            ax2.update_datalim([(left[0], 0), (right[-1], np.nanmax(heights))])
+        ax2.autoscale_view()
+        
+        # 3. Normalized price vs volume
+        self.price_norm_line.set_data(x, (price - np.nanmin(price)) / (np.nanmax(price) - np.nanmin(price)))
+        self.volume_norm_line.set_data(x, (volume - np.nanmin(volume)) / (np.nanmax(volume) - np.nanmin(volume)))
+        self.correlation_text.set_text(f"Correlation: {price_volume_correlation(df, stats):.3f}")
+        ax3.relim()
+        ax3.autoscale_view(scaley=False)
+        
+        date_format = '%m/%d %H:%M' if resolution in ('5m', '1h') else '%m/%d'
+        for ax in self.axes:
+            ax.xaxis.set_major_formatter(mdates.DateFormatter(date_format))
+        
+        if not self.laid_out:
+            self.fig.tight_layout()
+            # tight_layout leaves a placeholder engine behind, which makes
+            # savefig draw the figure twice; the computed margins are kept
+            self.fig.set_layout_engine(None)
+            self.laid_out = True
+    
+    def save(self, path: str, dpi: int, fmt: str) -> None:
+        self.fig.savefig(path, dpi=dpi, format=fmt)
 
 class Visualizer:
-    def __init__(self):
+    def __init__(self, output_dir: str = None, token_id: str = None, tier: str = None, fmt: str = None):
         self.fig_size = config.FIGURE_SIZE
-        self.dpi = config.DPI
-        plt.style.use(config.CHART_STYLE)
+        self.tier_name = tier or config.RENDER_TIER
+        self.tier = config.RENDER_TIERS[self.tier_name]
+        self.dpi = self.tier.get('dpi', config.DPI)
+        self.format = fmt or self.tier.get('format', 'png')
+        self.output_dir = output_dir or config.VISUALIZATIONS_DIR
+        self.token_id = token_id or config.TOKEN_ID
+        self.token_name = self.token_id.upper()
+        self.file_prefix = self.token_id.lower()
+        _apply_style()
+    
+    def _output_path(self, name: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, f'{self.file_prefix}_{name}.{self.format}')
+    
+    def _market_title(self, stats: Dict, resolution: str) -> str:
+        return (f"{self.token_name} Token Market Analysis ({stats['period']['days']}-Day Period, "
+                f"{LEVEL_LABELS.get(resolution, resolution)} Bars)")
+    
+    def _template(self, resolution: str) -> MarketChartTemplate:
+        """
+        Template shared by every Visualizer in the process
         
-    def create_market_charts(self, df: pd.DataFrame, spikes_df: pd.DataFrame, stats: Dict) -> str:
+        Intraday and daily tick labels differ in width, and the layout is
+        fixed when a template is first drawn, so each gets its own template.
+        """
+        key = (self.fig_size, resolution in ('5m', '1h'))
+        template = _templates.get(key)
+        if template is None:
+            template = _templates[key] = MarketChartTemplate(self.fig_size)
+        return template
+    
+
+    @_timed_render('market_analysis')
+    def create_market_charts(self, df: pd.DataFrame, spikes_df: SpikeStore, stats: Dict) -> str:
         """
         Create comprehensive market analysis charts
         
@@ -24,18 +230,29 @@ class Visualizer:
         Returns:
             Path to saved chart
         """
+        resolution = stats['period'].get('resolution', '1d')
+        unit = period_label(resolution)
+        
+        if self.tier.get('template'):
+            template = self._template(resolution)
+            template.update(df, spikes_df, stats, self._market_title(stats, resolution), resolution)
+            output_path = self._output_path('market_analysis')
+            template.save(output_path, self.dpi, self.format)
+            logger.info(f"✓ Chart saved to {output_path}")
+            return output_path
+        
         fig, axes = plt.subplots(3, 1, figsize=self.fig_size)
-        fig.suptitle('KAITO Token Market Analysis (30-Day Period)', fontsize=16, fontweight='bold')
+        fig.suptitle(self._market_title(stats, resolution), fontsize=16, fontweight='bold')
         
         # 1. Price Chart
         ax1 = axes[0]
         ax1.plot(df['timestamp'], df['price'], 'b-', linewidth=2, label='Price')
-        ax1.plot(df['timestamp'], df['price_ma7'], 'r--', alpha=0.7, label='7-day MA')
+        ax1.plot(df['timestamp'], df['price_ma7'], 'r--', alpha=0.7, label=f'7-{unit} MA')
         
         # Mark price spikes
-        if not spikes_df.empty:
-            price_spikes = spikes_df[spikes_df['metric'] == 'price']
-            for _, spike in price_spikes.iterrows():
+        spikes = SpikeStore.of(spikes_df)
+        if not spikes.empty:
+            for _, spike in spikes.select(metric='price').iterrows():
                 color = 'green' if spike['direction'] == 'up' else 'red'
                 ax1.scatter(spike['timestamp'], spike['value'], 
                            color=color, s=100, zorder=5, alpha=0.8)
@@ -55,13 +272,13 @@ class Visualizer:
                   for i in range(1, len(df))]
         colors = ['gray'] + colors  # First bar is gray
         
-        ax2.bar(df['timestamp'], df['volume'], color=colors, alpha=0.7, width=0.8)
-        ax2.plot(df['timestamp'], df['volume_ma7'], 'orange', linewidth=2, label='7-day MA')
+        bar_width = LEVEL_MS.get(resolution, LEVEL_MS['1d']) / LEVEL_MS['1d'] * 0.8
+        ax2.bar(df['timestamp'], df['volume'], color=colors, alpha=0.7, width=bar_width)
+        ax2.plot(df['timestamp'], df['volume_ma7'], 'orange', linewidth=2, label=f'7-{unit} MA')
         
         # Mark volume spikes
-        if not spikes_df.empty:
-            volume_spikes = spikes_df[spikes_df['metric'] == 'volume']
-            for _, spike in volume_spikes.iterrows():
+        if not spikes.empty:
+            for _, spike in spikes.select(metric='volume').iterrows():
                 ax2.axvline(spike['timestamp'], color='red', linestyle='--', alpha=0.7)
         
         ax2.set_ylabel('Volume (USD)', fontsize=12)
@@ -83,7 +300,7 @@ class Visualizer:
         ax3.plot(df['timestamp'], volume_norm, 'orange', linewidth=2, alpha=0.7, label='Volume (normalized)')
         
         # Add correlation coefficient
-        correlation = df['price'].corr(df['volume'])
+        correlation = price_volume_correlation(df, stats)
         ax3.text(0.02, 0.95, f'Correlation: {correlation:.3f}', 
                 transform=ax3.transAxes, fontsize=10,
                 bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
@@ -96,23 +313,24 @@ class Visualizer:
         ax3.set_ylim(-0.1, 1.1)
         
         # Format x-axis for all subplots
+        date_format = '%m/%d %H:%M' if resolution in ('5m', '1h') else '%m/%d'
         for ax in axes:
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-            ax.xaxis.set_major_locator(mdates.DayLocator(interval=5))
+            ax.xaxis.set_major_formatter(mdates.DateFormatter(date_format))
+            ax.xaxis.set_major_locator(mdates.AutoDateLocator(minticks=5, maxticks=10))
             plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
         
         plt.tight_layout()
         
         # Save
-        os.makedirs(config.VISUALIZATIONS_DIR, exist_ok=True)
-        output_path = os.path.join(config.VISUALIZATIONS_DIR, 'kaito_market_analysis.png')
-        plt.savefig(output_path, dpi=self.dpi, bbox_inches='tight')
+        output_path = self._output_path('market_analysis')
+        plt.savefig(output_path, dpi=self.dpi, format=self.format, bbox_inches='tight')
         plt.close()
         
-        print(f"✓ Chart saved to {output_path}")
+        logger.info(f"✓ Chart saved to {output_path}")
         return output_path
     
-    def create_spike_distribution_chart(self, spikes_df: pd.DataFrame) -> str:
+    @_timed_render('spike_analysis')
+    def create_spike_distribution_chart(self, spikes_df: SpikeStore) -> str:
         """
         Create spike distribution chart
         
@@ -122,22 +340,24 @@ class Visualizer:
         Returns:
             Path to saved chart
         """
-        if spikes_df.empty:
-            print("No spikes to visualize")
+        spikes = SpikeStore.of(spikes_df)
+        if spikes.empty:
+            logger.info("No spikes to visualize")
             return None
         
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-        fig.suptitle('KAITO Spike Event Analysis', fontsize=14, fontweight='bold')
+        fig.suptitle(f'{self.token_name} Spike Event Analysis', fontsize=14, fontweight='bold')
         
         # Spike types distribution
-        spike_types = spikes_df['type'].value_counts()
+        spike_types = pd.Series({spike_type: count for spike_type, count in spikes.counts('type').items() if count})
+        spike_types = spike_types.sort_values(ascending=False, kind='stable')
         colors = ['#ff9999', '#66b3ff', '#99ff99']
         ax1.pie(spike_types.values, labels=spike_types.index, autopct='%1.1f%%',
                 colors=colors, startangle=90)
         ax1.set_title('Spike Types Distribution')
         
         # Spike intensity distribution
-        ax2.hist(spikes_df['change_pct'], bins=10, color='skyblue', edgecolor='black', alpha=0.7)
+        ax2.hist(spikes.frame['change_pct'], bins=10, color='skyblue', edgecolor='black', alpha=0.7)
         ax2.set_xlabel('Change Percentage (%)')
         ax2.set_ylabel('Frequency')
         ax2.set_title('Spike Intensity Distribution')
@@ -145,9 +365,51 @@ class Visualizer:
         
         plt.tight_layout()
         
-        output_path = os.path.join(config.VISUALIZATIONS_DIR, 'kaito_spike_analysis.png')
-        plt.savefig(output_path, dpi=self.dpi, bbox_inches='tight')
+        output_path = self._output_path('spike_analysis')
+        plt.savefig(output_path, dpi=self.dpi, format=self.format,
+                    bbox_inches=None if self.tier.get('template') else 'tight')
         plt.close()
         
-        print(f"✓ Spike analysis chart saved to {output_path}")
-        return output_path
\ No newline at end of file
+        logger.info(f"✓ Spike analysis chart saved to {output_path}")
+        return output_path
+    
+def benchmark_render(df: pd.DataFrame, spikes_df: SpikeStore, stats: Dict, output_dir: str,
+                     tiers=None, formats=None, repeats: int = 3) -> pd.DataFrame:
+    """
+    Time the market chart for each render tier and output format
+    
+    The first template render includes building the template, so it is
+    reported separately from the steady-state (warm) renders.
+    
+    Args:
+        df: Market data
+        spikes_df: Spike events
+        stats: Calculated statistics
+        output_dir: Scratch directory for the rendered files
+        tiers: Tier names (default: all of config.RENDER_TIERS)
+        formats: Output formats (default: each tier's own format)
+        repeats: Warm renders per combination
+        
+    Returns:
+        DataFrame with tier, format, dpi, first and median warm render times (ms) and file size
+    """
+    rows = []
+    for tier in tiers or config.RENDER_TIERS:
+        for fmt in formats or [config.RENDER_TIERS[tier].get('format', 'png')]:
+            visualizer = Visualizer(output_dir, tier=tier, fmt=fmt)
+            _templates.clear()
+            timings = []
+            for _ in range(repeats + 1):
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    path = visualizer.create_market_charts(df, spikes_df, stats)
+                timings.append((time.perf_counter() - started) * 1000)
+            rows.append({
+                'tier': tier,
+                'format': fmt,
+                'dpi': visualizer.dpi,
+                'first_ms': timings[0],
+                'warm_ms': float(np.median(timings[1:])),
+                'bytes': os.path.getsize(path)
+            })
+    return pd.DataFrame(rows)